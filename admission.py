@@ -0,0 +1,266 @@
+import math
+import heapq
+import asyncio
+import itertools
+import logging
+from collections import Counter
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from metrics import REGISTRY
+
+# Priorités d'admission : plus la valeur est basse, plus la requête passe tôt
+PRIORITY_FOLLOW_UP = 0  # Conversation en cours
+PRIORITY_NEW = 1        # Première question d'une session
+
+SHED = REGISTRY.counter(
+    'chatbot_llm_shed_total', "Appels au LLM refusés faute de place (file pleine, attente trop longue, évincés)",
+    ('reason',)
+)
+COALESCED = REGISTRY.counter(
+    'chatbot_llm_coalesced_total', "Appels au LLM servis par un appel identique déjà en cours", ('mode',)
+)
+
+class Overloaded(Exception):
+    """Le service est saturé : la requête est refusée plutôt que mise en attente"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Admission des appels au LLM.
+
+    Au plus `max_concurrency` appels s'exécutent ; les suivants attendent dans
+    une file bornée à `max_queue` entrées, servie par priorité puis par ordre
+    d'arrivée. Une requête est refusée (Overloaded) si la file est pleine de
+    requêtes au moins aussi prioritaires, si elle attend plus de `max_wait`
+    secondes, ou si une requête plus prioritaire prend sa place.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, max_wait: float = 10.0):
+        self.setup_logging()
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.queue: List[list] = []  # Tas de [priorité, numéro d'arrivée, future]
+        self.sequence = itertools.count()
+
+        # Durée moyenne (glissante) d'occupation d'un créneau, pour estimer Retry-After
+        self.service_time = 1.0
+
+        self.admitted = 0
+        self.queued = 0
+        self.waited = 0
+        self.shed = Counter()
+        self.total_wait = 0.0
+        self.max_depth = 0
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('AdmissionController')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @property
+    def depth(self) -> int:
+        return len(self.queue)
+
+    def retry_after(self) -> int:
+        """Délai conseillé (secondes) : temps d'écoulement de la file au rythme actuel"""
+        estimate = self.service_time * (self.depth + 1) / self.max_concurrency
+        return max(1, min(60, math.ceil(estimate)))
+
+    def reject(self, reason: str, message: str) -> Overloaded:
+        self.shed[reason] += 1
+        SHED.inc(reason=reason)
+        retry_after = self.retry_after()
+        self.logger.warning(
+            f"Appel refusé ({reason}) : {self.active} en cours, {self.depth} en attente, "
+            f"Retry-After {retry_after}s"
+        )
+        return Overloaded(message, retry_after)
+
+    def discard(self, entry: list):
+        if entry in self.queue:
+            self.queue.remove(entry)
+            heapq.heapify(self.queue)
+
+    async def acquire(self, priority: int = PRIORITY_NEW, timeout: Optional[float] = None):
+        """Attend un créneau d'appel ; lève Overloaded si la requête doit être écartée"""
+        if self.active < self.max_concurrency and not self.queue:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if len(self.queue) >= self.max_queue:
+            # La requête la moins prioritaire (et la plus récente) cède sa place
+            worst = max(self.queue)
+            if worst[0] <= priority:
+                raise self.reject('queue_full', "File d'attente des appels au LLM pleine")
+            self.discard(worst)
+            # Requête déjà expirée ou annulée, en attente de son propre retrait de la file
+            if not worst[2].done():
+                worst[2].set_exception(self.reject('evicted', "Place cédée à une requête prioritaire"))
+
+        future = asyncio.get_event_loop().create_future()
+        entry = [priority, next(self.sequence), future]
+        heapq.heappush(self.queue, entry)
+        self.queued += 1
+        self.max_depth = max(self.max_depth, len(self.queue))
+        start_time = asyncio.get_event_loop().time()
+
+        wait = self.max_wait if timeout is None else min(self.max_wait, timeout)
+        try:
+            await asyncio.wait_for(future, timeout=wait)
+        except asyncio.TimeoutError:
+            self.discard(entry)
+            raise self.reject('timeout', f"Aucun créneau d'appel libéré en {wait:g}s")
+        except asyncio.CancelledError:
+            # Créneau transmis juste avant l'annulation : il est rendu
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            else:
+                self.discard(entry)
+            raise
+        self.admitted += 1
+        self.waited += 1
+        self.total_wait += asyncio.get_event_loop().time() - start_time
+
+    def release(self, held: Optional[float] = None):
+        """Libère un créneau, transmis directement à la requête en attente la plus prioritaire"""
+        if held is not None:
+            self.service_time = 0.9 * self.service_time + 0.1 * held
+        while self.queue:
+            future = heapq.heappop(self.queue)[2]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def get_stats(self) -> Dict:
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'max_wait': self.max_wait,
+            'active': self.active,
+            'queue_depth': self.depth,
+            'max_queue_depth': self.max_depth,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'average_wait_ms': round(1000 * self.total_wait / self.waited, 1) if self.waited else 0.0,
+            'shed': dict(self.shed),
+            'service_time_s': round(self.service_time, 3),
+            'retry_after': self.retry_after()
+        }
+
+class _Call:
+    """Appel partagé : résultat (ou fragments) et nombre de requêtes qui l'attendent"""
+
+    def __init__(self):
+        self.condition = asyncio.Condition()
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.result: Any = None
+        self.waiters = 0
+        self.cancelled = False  # Abandonné par toutes ses requêtes, annulation en cours
+        self.task: Optional[asyncio.Task] = None
+
+class SingleFlight:
+    """
+    Regroupement des appels identiques en cours.
+
+    La première requête d'une clé lance l'appel dans une tâche ; les suivantes
+    attendent le même résultat (ou relisent les fragments du même flux). Si
+    toutes les requêtes abandonnent, l'appel est annulé.
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = Counter()
+
+    def join(self, key: str, start: Callable[[_Call], Awaitable[None]], mode: str) -> _Call:
+        call = self.calls.get(key)
+        # Un appel terminé ou en cours d'annulation n'est pas rejoint : un nouvel appel le remplace
+        if call is None or call.cancelled or call.task.done():
+            call = self.calls[key] = _Call()
+            call.task = asyncio.ensure_future(self._run(key, call, start))
+            self.leaders += 1
+        else:
+            self.coalesced[mode] += 1
+            COALESCED.inc(mode=mode)
+        call.waiters += 1
+        return call
+
+    async def _run(self, key: str, call: _Call, start: Callable[[_Call], Awaitable[None]]):
+        try:
+            await start(call)
+        except BaseException as e:
+            call.error = e
+        finally:
+            if self.calls.get(key) is call:
+                del self.calls[key]
+            async with call.condition:
+                call.done = True
+                call.condition.notify_all()
+
+    def leave(self, call: _Call):
+        call.waiters -= 1
+        if call.waiters == 0 and not call.done:
+            call.cancelled = True
+            call.task.cancel()
+
+    async def do(self, key: str, function: Callable[[], Awaitable[Any]]) -> Any:
+        """Résultat de `function()`, exécutée une seule fois pour les appels simultanés de même clé"""
+        async def start(call: _Call):
+            call.result = await function()
+
+        call = self.join(key, start, 'complete')
+        try:
+            await asyncio.shield(call.task)
+        finally:
+            self.leave(call)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def stream(self, key: str, function: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Fragments de `function()`, diffusés à toutes les requêtes simultanées de même clé"""
+        async def start(call: _Call):
+            iterator = function()
+            try:
+                async for chunk in iterator:
+                    async with call.condition:
+                        call.chunks.append(chunk)
+                        call.condition.notify_all()
+            finally:
+                await iterator.aclose()
+
+        call = self.join(key, start, 'stream')
+        position = 0
+        try:
+            while True:
+                async with call.condition:
+                    await call.condition.wait_for(lambda: position < len(call.chunks) or call.done)
+                    chunks, finished = call.chunks[position:], call.done
+                position += len(chunks)
+                for chunk in chunks:
+                    yield chunk
+                if finished:
+                    break
+        finally:
+            self.leave(call)
+        if call.error is not None:
+            raise call.error
+
+    def get_stats(self) -> Dict:
+        return {
+            'in_flight': len(self.calls),
+            'leaders': self.leaders,
+            'coalesced': dict(self.coalesced)
+        }
@@ -1,27 +1,131 @@
-from fastapi import FastAPI, Request, Form
+from fastapi import FastAPI, Request, Response, Form, Header, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-from chatbot import Chatbot
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from chatbot import Chatbot, NotReady
+from admission import Overloaded
+from tenants import DEFAULT_TENANT, TenantRegistry, UnknownTenant
+from metrics import CONTENT_TYPE, REGISTRY, REQUEST_SECONDS, STARTUP, EventLoopLagMonitor
 import uvicorn
+import asyncio
+import json
 import os
+import re
+import hmac
+import time
+import uuid
+
+# Le modèle et l'index ne sont pas chargés ici, mais au démarrage, en arrière-plan
+STARTUP.mark('imports')
 
 app = FastAPI()
 chatbot = Chatbot()
+loop_lag_monitor = EventLoopLagMonitor.from_env()
+warmup_task = None
+STARTUP.mark('app_setup')
 
 # Configuration des templates et des fichiers statiques
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/static/images", StaticFiles(directory="static/images"), name="static_images")
 
+# Valeurs lues à chaque export de /metrics
+REGISTRY.gauge("chatbot_knowledge_base_documents", "Passages indexés dans l'instantané actif",
+               lambda: len(chatbot.knowledge_base.documents))
+REGISTRY.gauge("chatbot_knowledge_base_index_version", "Version de l'index vectoriel actif",
+               lambda: chatbot.knowledge_base.index_version)
+REGISTRY.gauge("chatbot_query_embedding_cache_hits", "Requêtes servies par le cache d'embeddings",
+               lambda: chatbot.embedding_batcher.query_cache.get_stats().get('hits', 0))
+REGISTRY.gauge("chatbot_tenants_loaded", "Sites clients dont la base de connaissances est en mémoire",
+               lambda: len(chatbot.tenants.tenants()))
+REGISTRY.gauge("chatbot_tenants_memory_bytes", "Mémoire estimée des bases de connaissances chargées",
+               lambda: chatbot.tenants.memory_bytes)
+REGISTRY.gauge("chatbot_llm_queue_depth", "Appels au LLM en attente d'un créneau",
+               lambda: chatbot.llm.admission.depth)
+REGISTRY.gauge("chatbot_llm_active_calls", "Appels au LLM en cours",
+               lambda: chatbot.llm.admission.active)
+REGISTRY.gauge("chatbot_ready", "1 quand la base de connaissances est chargée et préchauffée",
+               lambda: int(chatbot.ready))
+REGISTRY.gauge("chatbot_startup_seconds", "Durée du démarrage (jusqu'à l'état prêt, ou écoulée)",
+               lambda: STARTUP.elapsed)
+
+def route_path(request: Request) -> str:
+    """Chemin de la route (/chat, /stats...) : l'URL brute donnerait une série par URL inconnue"""
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    endpoint = request.scope.get("endpoint")
+    return next((route.path for route in app.routes if getattr(route, "endpoint", getattr(route, "app", None)) is endpoint), "other")
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    # Durée jusqu'à l'envoi des en-têtes (le flux SSE est mesuré par l'étape llm_stream)
+    start_time = time.perf_counter()
+    response = await call_next(request)
+    path = route_path(request)
+    if not path.startswith("/static"):
+        REQUEST_SECONDS.observe(time.perf_counter() - start_time,
+                                method=request.method, path=path, status=str(response.status_code))
+    return response
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    # Refus rapide plutôt qu'une attente jusqu'au délai maximal
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service momentanément saturé, merci de réessayer dans quelques instants"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(NotReady)
+async def not_ready(request: Request, exc: NotReady):
+    # Démarrage en cours : le port est ouvert avant la fin du chargement du modèle et de l'index
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Démarrage en cours, merci de réessayer dans quelques instants"},
+        headers={"Retry-After": "5"}
+    )
+
+@app.exception_handler(UnknownTenant)
+async def unknown_tenant(request: Request, exc: UnknownTenant):
+    return JSONResponse(status_code=404, content={"detail": str(exc)})
+
+# Site client choisi par en-tête (site par défaut sinon)
+TENANT_HEADER = "X-Tenant"
+
+def get_tenant(request: Request) -> str:
+    return request.headers.get(TENANT_HEADER) or DEFAULT_TENANT
+
+# Identification des sessions par cookie ou en-tête
+SESSION_COOKIE = "session_id"
+SESSION_HEADER = "X-Session-ID"
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+def get_session_id(request: Request) -> str:
+    """Retourne l'identifiant de session fourni par le client ou en génère un nouveau"""
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    if session_id and SESSION_ID_PATTERN.match(session_id):
+        return session_id
+    return uuid.uuid4().hex
+
+def set_session_cookie(response: Response, session_id: str):
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request, "messages": chatbot.conversation_history})
+    session_id = get_session_id(request)
+    history = await chatbot.get_history(TenantRegistry.session_key(get_tenant(request), session_id))
+    response = templates.TemplateResponse("index.html", {"request": request, "messages": history})
+    set_session_cookie(response, session_id)
+    return response
 
 @app.post("/chat")
-async def chat(message: str = Form(...)):
+async def chat(request: Request, response: Response, message: str = Form(...)):
+    session_id = get_session_id(request)
+    set_session_cookie(response, session_id)
+    
     # Obtenir la réponse du chatbot
-    response = await chatbot.get_response(message)
+    bot_response = await chatbot.get_response(message, session_id, get_tenant(request))
     
     # Créer la structure de réponse avec les messages formatés
     return {
@@ -30,14 +134,117 @@ async def chat(message: str = Form(...)):
             "role": "user"
         },
         "botResponse": {
-            "content": response,
+            "content": bot_response,
             "role": "assistant"
         }
     }
 
+@app.post("/chat/stream")
+async def chat_stream(request: Request, message: str = Form(...)):
+    session_id = get_session_id(request)
+    
+    # Premier fragment attendu avant les en-têtes : un refus (Overloaded) donne encore un 503
+    deltas = chatbot.stream_response(message, session_id, get_tenant(request))
+    try:
+        first_delta = await deltas.__anext__()
+    except StopAsyncIteration:
+        first_delta = None
+    
+    # Transmission des fragments de réponse au fil de l'eau (Server-Sent Events)
+    async def event_stream():
+        response_parts = []
+        if first_delta is not None:
+            response_parts.append(first_delta)
+            yield f"data: {json.dumps({'delta': first_delta}, ensure_ascii=False)}\n\n"
+            async for delta in deltas:
+                response_parts.append(delta)
+                yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+        
+        # Événement final avec la réponse complète, toujours envoyé (même vide)
+        done = {"content": "".join(response_parts), "role": "assistant"}
+        yield f"event: done\ndata: {json.dumps(done, ensure_ascii=False)}\n\n"
+    
+    response = StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    set_session_cookie(response, session_id)
+    return response
+
+@app.get("/healthz")
+async def healthz():
+    # Vivacité : la boucle d'événements répond (échec seulement si le chargement a échoué)
+    if chatbot.startup_error:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": chatbot.startup_error})
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    # Disponibilité : base de connaissances chargée et préchauffée
+    if not chatbot.ready:
+        status = "failed" if chatbot.startup_error else "starting"
+        return JSONResponse(status_code=503, content={"status": status, "startup": STARTUP.get_stats()})
+    return {"status": "ready", "startup": STARTUP.get_stats()}
+
+@app.get("/stats")
+async def stats():
+    # Statistiques internes des composants (remplissage des lots, etc.)
+    ready = chatbot.ready
+    return {
+        "startup": STARTUP.get_stats(),
+        "knowledge_base": chatbot.knowledge_base_manager.get_stats() if ready else None,
+        "tenants": chatbot.tenants.get_stats() if ready else None,
+        "intent_router": chatbot.intent_router.get_stats() if ready else None,
+        "embedding_batcher": chatbot.embedding_batcher.get_stats(),
+        "response_cache": chatbot.response_cache.get_stats() if ready else None,
+        "llm": chatbot.llm.get_stats(),
+        "profiler": chatbot.profiler.get_stats(),
+        "prompt_builder": chatbot.prompt_builder.get_stats(),
+        "event_loop": loop_lag_monitor.get_stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    # Export au format texte de Prometheus (un jeu de métriques par processus)
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.post("/admin/reload", status_code=202)
+async def reload_knowledge_base(request: Request, x_admin_token: str = Header(None)):
+    # Rechargement à chaud de la base de connaissances du site, réservé à l'administration
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token or not x_admin_token or not hmac.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Accès refusé")
+    tenant = await chatbot.get_tenant(get_tenant(request))
+    if not tenant.knowledge_base_manager.start_reload("admin"):
+        raise HTTPException(status_code=409, detail="Rechargement déjà en cours")
+    return {"status": "started", "tenant": tenant.name, "version": tenant.knowledge_base.index_version}
+
+@app.on_event("startup")
+async def startup():
+    global warmup_task
+    STARTUP.mark('server_start')
+    # Chargement du modèle et de l'index, surveillance de scraped_data (KB_WATCH_INTERVAL)
+    # puis requêtes de préchauffage : en tâche de fond, le port s'ouvre sans attendre
+    warmup_task = asyncio.ensure_future(chatbot.warmup())
+    # Mesure du retard de la boucle d'événements (LOOP_LAG_INTERVAL_MS)
+    loop_lag_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Fermeture du pool de connexions vers l'API Groq
+    await chatbot.llm.aclose()
+    await chatbot.embedding_batcher.aclose()
+    await chatbot.sessions.aclose()
+    if warmup_task is not None:
+        warmup_task.cancel()
+    if chatbot.tenants is not None:
+        await chatbot.tenants.aclose()
+    await loop_lag_monitor.aclose()
+
 @app.post("/clear")
-async def clear_history():
-    chatbot.clear_history()
+async def clear_history(request: Request):
+    await chatbot.clear_history(get_session_id(request), get_tenant(request))
     return {"status": "success"}
 
 if __name__ == "__main__":
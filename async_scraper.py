@@ -0,0 +1,196 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+import httpx
+from scraper import ITWorkScraper
+
+class TokenBucket:
+    """Limiteur de débit à seau de jetons (un jeton par requête)"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncCrawler:
+    """
+    Crawl asynchrone en largeur d'abord.
+
+    Une file de travail alimente un nombre borné de workers qui partagent un
+    pool de connexions HTTP. Le débit est limité par hôte (seau de jetons,
+    ralenti si robots.txt impose un Crawl-delay). L'extraction et
+    l'enregistrement réutilisent ceux d'ITWorkScraper : la sortie est identique.
+    """
+
+    def __init__(self, scraper: Optional[ITWorkScraper] = None, workers: int = 8,
+                 rate_per_host: float = 2.0, burst: float = 2.0, max_depth: int = 3,
+                 respect_robots: bool = True):
+        self.setup_logging()
+        self.scraper = scraper or ITWorkScraper()
+
+        self.workers = workers
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.max_depth = max_depth
+        self.respect_robots = respect_robots
+
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.robots: Dict[str, Optional[RobotFileParser]] = {}
+        self._robots_lock = None  # Créé dans la boucle du crawl
+        self.pages_fetched = 0
+        self.errors = 0
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('AsyncCrawler')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    async def _get_robots(self, client: httpx.AsyncClient, url: str) -> Optional[RobotFileParser]:
+        """Charge (une seule fois par hôte) le robots.txt et adapte le débit au Crawl-delay"""
+        parsed = urlparse(url)
+        host = parsed.netloc
+        async with self._robots_lock:
+            if host in self.robots:
+                return self.robots[host]
+
+            parser = None
+            if self.respect_robots:
+                try:
+                    response = await client.get(f"{parsed.scheme}://{host}/robots.txt")
+                    if response.status_code == 200:
+                        parser = RobotFileParser()
+                        parser.parse(response.text.splitlines())
+                except Exception as e:
+                    self.logger.warning(f"robots.txt indisponible pour {host}: {str(e)}")
+            self.robots[host] = parser
+
+            rate, capacity = self.rate_per_host, self.burst
+            if parser is not None:
+                crawl_delay = parser.crawl_delay(client.headers.get('User-Agent', '*'))
+                if crawl_delay and 1 / float(crawl_delay) < rate:
+                    # Crawl-delay plus strict : une requête par intervalle, sans rafale
+                    rate, capacity = 1 / float(crawl_delay), 1.0
+                    self.logger.info(f"Crawl-delay de {crawl_delay}s appliqué à {host}")
+            self.buckets[host] = TokenBucket(rate, capacity=capacity)
+            return parser
+
+    async def fetch(self, client: httpx.AsyncClient, url: str) -> Optional[httpx.Response]:
+        """Récupère une page (requête conditionnelle) en respectant robots.txt et le débit de l'hôte"""
+        robots = await self._get_robots(client, url)
+        if robots is not None and not robots.can_fetch(client.headers.get('User-Agent', '*'), url):
+            self.logger.info(f"URL interdite par robots.txt : {url}")
+            self.scraper.failed_urls.add(url)
+            return None
+
+        await self.buckets[urlparse(url).netloc].acquire()
+        try:
+            response = await client.get(url, headers=self.scraper.conditional_headers(url))
+            if response.status_code in (404, 410):
+                # Page disparue : elle sera retirée en fin de crawl
+                self.logger.info(f"Page supprimée ({response.status_code}) : {url}")
+                self.scraper.gone_urls.add(url)
+                return None
+            if response.status_code != 304:
+                response.raise_for_status()
+            return response
+        except Exception as e:
+            self.errors += 1
+            self.scraper.failed_urls.add(url)
+            self.logger.error(f"Erreur lors de la récupération de {url}: {str(e)}")
+            return None
+
+    def process(self, url: str, response: httpx.Response) -> Optional[Dict]:
+        """Extrait et enregistre le contenu d'une page (exécuté hors de la boucle)"""
+        return self.scraper.process_response(url, response.status_code, response.text, response.headers)
+
+    def enqueue(self, queue: asyncio.Queue, url: str, depth: int):
+        # La file persistée écarte les URLs déjà vues (sous leur forme normalisée)
+        normalized = self.scraper.enqueue(url, depth)
+        if normalized is not None:
+            queue.put_nowait((normalized, depth))
+
+    async def worker(self, client: httpx.AsyncClient, queue: "asyncio.Queue[Tuple[str, int]]"):
+        loop = asyncio.get_event_loop()
+        while True:
+            url, depth = await queue.get()
+            try:
+                self.logger.info(f"Scraping de {url} (profondeur {depth})")
+                self.scraper.visited_urls.add(url)
+                response = await self.fetch(client, url)
+                if response is None:
+                    continue
+                content = await loop.run_in_executor(None, self.process, url, response)
+                if content is None:
+                    continue
+                self.pages_fetched += 1
+
+                # Les liens sont ajoutés en fin de file : parcours en largeur
+                for link_info in content['links']:
+                    self.enqueue(queue, link_info['url'], depth + 1)
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"Erreur lors du traitement de {url}: {str(e)}")
+            finally:
+                self.scraper.complete_url(url)
+                queue.task_done()
+
+    async def crawl(self, resume: bool = False) -> Dict:
+        """Lance le crawl (ou reprend le crawl interrompu) et retourne ses statistiques"""
+        start_time = time.perf_counter()
+        self._robots_lock = asyncio.Lock()
+        queue = asyncio.Queue()
+        resumed = self.scraper.start_frontier(resume)
+        for url, depth in self.scraper.frontier.pending():
+            queue.put_nowait((url, depth))
+
+        headers = {'User-Agent': self.scraper.user_agent}
+        limits = httpx.Limits(max_connections=self.workers, max_keepalive_connections=self.workers)
+        async with httpx.AsyncClient(headers=headers, limits=limits, timeout=10,
+                                     follow_redirects=True) as client:
+            tasks = [asyncio.ensure_future(self.worker(client, queue)) for _ in range(self.workers)]
+            await queue.join()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.scraper.finish_crawl()
+        duration = time.perf_counter() - start_time
+        stats = {
+            'pages': self.pages_fetched,
+            'errors': self.errors,
+            'added': len(self.scraper.changes.added),
+            'modified': len(self.scraper.changes.modified),
+            'removed': len(self.scraper.changes.removed),
+            'unchanged': self.scraper.changes.unchanged,
+            'resumed': resumed,
+            'checkpoints': self.scraper.frontier.checkpoints,
+            'duration': round(duration, 3),
+            'pages_per_second': round(self.pages_fetched / duration, 2) if duration else 0.0
+        }
+        self.logger.info(f"Crawl terminé : {stats['pages']} pages en {stats['duration']}s "
+                         f"({stats['pages_per_second']} pages/s)")
+        return stats
+
+    def run(self, resume: bool = False) -> Dict:
+        self.logger.info("Démarrage du scraping asynchrone")
+        return asyncio.run(self.crawl(resume))
@@ -0,0 +1,105 @@
+"""
+Benchmark des types d'index vectoriels sur des corpus synthétiques.
+
+Génère des corpus de taille croissante (vecteurs regroupés autour de thèmes,
+comme des passages de pages proches), puis compare chaque type d'index à la
+recherche exacte : rappel@k, requêtes par seconde (une requête à la fois,
+comme en production), temps de construction et taille de l'index.
+
+Usage :
+    python -m benchmarks.bench_ann --sizes 1000 10000 100000 --types flat ivf hnsw pq
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import faiss
+import numpy as np
+from vector_index import INDEX_TYPES, VectorIndexSpec, normalize
+
+def synthetic_corpus(size: int, queries: int, dimension: int, seed: int = 0):
+    """Vecteurs normalisés regroupés en thèmes ; les requêtes sont des variantes bruitées du corpus"""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(8, size // 100), dimension)).astype(np.float32)
+    assignments = rng.integers(0, len(topics), size)
+    corpus = topics[assignments] + 0.6 * rng.standard_normal((size, dimension)).astype(np.float32)
+    picks = rng.integers(0, size, queries)
+    query_vectors = corpus[picks] + 0.4 * rng.standard_normal((queries, dimension)).astype(np.float32)
+    return normalize(corpus), normalize(query_vectors)
+
+def index_size_mb(index: faiss.Index) -> float:
+    return len(faiss.serialize_index(index)) / 2**20
+
+def bench_index(spec: VectorIndexSpec, corpus: np.ndarray, queries: np.ndarray,
+                ground_truth: np.ndarray, k: int) -> dict:
+    start_time = time.perf_counter()
+    index = spec.build(corpus)
+    build_time = time.perf_counter() - start_time
+
+    found = []
+    start_time = time.perf_counter()
+    for query in queries:
+        _, indices = index.search(query[None, :], k)
+        found.append(indices[0])
+    search_time = time.perf_counter() - start_time
+
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, ground_truth)])
+    return {
+        'type': spec.kind,
+        'class': type(index).__name__,
+        'build_s': round(build_time, 3),
+        'qps': round(len(queries) / search_time, 1),
+        'latency_ms': round(1000 * search_time / len(queries), 3),
+        f'recall@{k}': round(float(recall), 4),
+        'index_mb': round(index_size_mb(index), 2),
+        'bytes_per_vector': round(index_size_mb(index) * 2**20 / len(corpus), 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des index vectoriels FAISS")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--types', nargs='+', default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--nlist', type=int, default=256)
+    parser.add_argument('--nprobe', type=int, default=16)
+    parser.add_argument('--hnsw-m', type=int, default=32)
+    parser.add_argument('--ef-search', type=int, default=64)
+    parser.add_argument('--pq-m', type=int, default=48)
+    parser.add_argument('--threads', type=int, default=1, help="Threads FAISS (1 : latence d'un worker)")
+    parser.add_argument('--output', help="Fichier JSON où enregistrer les résultats")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    results = {'config': vars(args), 'runs': []}
+    print(f"{'taille':>8} {'type':<6}{'classe':<16}{'construction':>13}{'req/s':>10}"
+          f"{'rappel@' + str(args.k):>11}{'index':>10}{'o/vecteur':>11}")
+    for size in args.sizes:
+        corpus, queries = synthetic_corpus(size, args.queries, args.dimension)
+
+        # Vérité terrain : recherche exacte
+        exact = faiss.IndexFlatIP(args.dimension)
+        exact.add(corpus)
+        _, ground_truth = exact.search(queries, args.k)
+
+        for kind in args.types:
+            spec = VectorIndexSpec(kind=kind, nlist=args.nlist, nprobe=args.nprobe, hnsw_m=args.hnsw_m,
+                                   ef_search=args.ef_search, pq_m=args.pq_m)
+            run = bench_index(spec, corpus, queries, ground_truth, args.k)
+            run['size'] = size
+            results['runs'].append(run)
+            print(f"{size:>8} {run['type']:<6}{run['class']:<16}{run['build_s']:>12.2f}s{run['qps']:>10.0f}"
+                  f"{run[f'recall@{args.k}']:>11.3f}{run['index_mb']:>8.1f}Mo{run['bytes_per_vector']:>11.0f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
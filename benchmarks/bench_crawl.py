@@ -0,0 +1,74 @@
+"""
+Mesure du débit de crawl sur le site de test local.
+
+Compare le scraper séquentiel (sans pause) au crawler asynchrone, puis
+mesure un second passage incrémental (requêtes conditionnelles, 304).
+
+Usage :
+    python -m benchmarks.bench_crawl --pages 200 --latency 0.05 --workers 8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixture_site import FixtureSite
+from scraper import ITWorkScraper
+from async_scraper import AsyncCrawler
+
+def bench_sequential(base_url: str, max_depth: int) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        scraper = ITWorkScraper(base_urls=[base_url], data_dir=data_dir, delay=0, max_depth=max_depth)
+        start_time = time.perf_counter()
+        scraper.run()
+        duration = time.perf_counter() - start_time
+        pages = len(scraper.fetched_urls)
+    return {'pages': pages, 'duration': round(duration, 3),
+            'pages_per_second': round(pages / duration, 2) if duration else 0.0}
+
+def bench_async(base_url: str, max_depth: int, workers: int, rate: float) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        results = {}
+        # Premier crawl complet puis recrawl incrémental dans le même répertoire
+        for run in ('async', 'async_recrawl'):
+            scraper = ITWorkScraper(base_urls=[base_url], data_dir=data_dir, delay=0, max_depth=max_depth)
+            crawler = AsyncCrawler(scraper, workers=workers, rate_per_host=rate, burst=workers, max_depth=max_depth)
+            results[run] = crawler.run()
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du crawl (séquentiel vs asynchrone)")
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help="Latence simulée par réponse (s)")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=1000.0, help="Requêtes/s par hôte (crawler asynchrone)")
+    parser.add_argument('--max-depth', type=int, default=10)
+    parser.add_argument('--output', help="Fichier JSON où enregistrer les résultats")
+    args = parser.parse_args()
+
+    # Le scraper écrit son journal dans le répertoire courant
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    os.chdir(tempfile.mkdtemp())
+
+    results = {'config': vars(args)}
+    with FixtureSite(pages=args.pages, latency=args.latency) as site:
+        results['sequential'] = bench_sequential(site.base_url, args.max_depth)
+    with FixtureSite(pages=args.pages, latency=args.latency) as site:
+        results.update(bench_async(site.base_url, args.max_depth, args.workers, args.rate))
+        results['async_recrawl']['not_modified'] = site.not_modified
+
+    for mode in ('sequential', 'async', 'async_recrawl'):
+        r = results[mode]
+        print(f"{mode:<12} {r['pages']:>5} pages  {r['duration']:>8.2f}s  {r['pages_per_second']:>8.2f} pages/s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
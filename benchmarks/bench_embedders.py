@@ -0,0 +1,163 @@
+"""
+Comparaison des backends d'embedding (PyTorch vs ONNX Runtime int8).
+
+Chaque backend est mesuré dans un processus séparé : temps de démarrage à
+froid (imports, chargement, premier encodage), RSS, latence d'une requête
+seule (p50/p95) et débit d'encodage par lots. La parité est vérifiée par la
+similarité cosinus et le rappel@k entre les embeddings du premier backend
+(référence) et ceux des suivants, sur les passages de scraped_data et des
+requêtes types ; le script échoue si elle passe sous les seuils.
+
+Usage :
+    python embedders.py export
+    python -m benchmarks.bench_embedders --backends sentence-transformers onnx
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def peak_rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_worker(backend: str, texts_file: str, vectors_file: str, repeats: int, batch_size: int):
+    """Mesures d'un backend (exécuté dans un processus dédié)"""
+    start_time = time.perf_counter()
+    os.environ['EMBEDDING_BACKEND'] = backend
+    # La parité est mesurée ici : le seuil de chargement du backend onnx est levé
+    os.environ['ONNX_MIN_COSINE'] = '0'
+    os.environ['ONNX_MIN_RECALL'] = '0'
+    import numpy as np
+    from embedders import PARITY_QUERIES, create_embedder
+
+    embedder = create_embedder()
+    load_time = time.perf_counter()
+    embedder.encode_queries([PARITY_QUERIES[0]])
+    cold_start = time.perf_counter() - start_time
+
+    with open(texts_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    passages, queries = data['passages'], data['queries']
+
+    # Latence d'une requête isolée
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            query_start = time.perf_counter()
+            embedder.encode_queries([query])
+            latencies.append(1000 * (time.perf_counter() - query_start))
+
+    # Débit d'encodage par lots
+    throughput_start = time.perf_counter()
+    vectors = [embedder.encode_documents(passages[i:i + batch_size]) for i in range(0, len(passages), batch_size)]
+    throughput_time = time.perf_counter() - throughput_start
+
+    embeddings = np.vstack(vectors + [embedder.encode_queries(queries)]).astype(np.float32)
+    np.save(vectors_file, embeddings)
+
+    print(json.dumps({
+        'backend': backend,
+        'name': embedder.name,
+        'cold_start_s': round(cold_start, 3),
+        'load_s': round(load_time - start_time, 3),
+        'rss_mb': round(peak_rss_mb(), 1),
+        'query_latency_p50_ms': round(percentile(latencies, 0.5), 2),
+        'query_latency_p95_ms': round(percentile(latencies, 0.95), 2),
+        'throughput_texts_per_s': round(len(passages) / throughput_time, 1) if throughput_time else 0.0
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des backends d'embedding")
+    parser.add_argument('--backends', nargs='+', default=['sentence-transformers', 'onnx'],
+                        help="Backends à comparer, le premier sert de référence pour la parité")
+    parser.add_argument('--passages', type=int, default=256, help="Nombre maximal de passages encodés")
+    parser.add_argument('--repeats', type=int, default=5, help="Répétitions des requêtes pour la latence")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--parity-threshold', type=float, default=None,
+                        help="Similarité cosinus minimale avec la référence (défaut : seuil du backend onnx)")
+    parser.add_argument('--recall-threshold', type=float, default=None,
+                        help="Rappel@k minimal des passages retrouvés par la référence (défaut : seuil du backend onnx)")
+    parser.add_argument('--output', help="Fichier JSON où enregistrer les résultats")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--texts-file', help=argparse.SUPPRESS)
+    parser.add_argument('--vectors-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args.worker, args.texts_file, args.vectors_file, args.repeats, args.batch_size)
+
+    import numpy as np
+    from embedders import PARITY_K, PARITY_MIN_COSINE, PARITY_MIN_RECALL, PARITY_QUERIES, calibration_texts, parity_report
+
+    if args.parity_threshold is None:
+        args.parity_threshold = PARITY_MIN_COSINE
+    if args.recall_threshold is None:
+        args.recall_threshold = PARITY_MIN_RECALL
+    passages, queries = calibration_texts(os.path.join(ROOT, 'scraped_data'), args.passages), PARITY_QUERIES
+    workdir = tempfile.mkdtemp()
+    texts_file = os.path.join(workdir, 'texts.json')
+    with open(texts_file, 'w', encoding='utf-8') as f:
+        json.dump({'passages': passages, 'queries': queries}, f, ensure_ascii=False)
+
+    results = {'config': vars(args), 'backends': []}
+    vectors = {}
+    for backend in args.backends:
+        vectors_file = os.path.join(workdir, f"{backend}.npy")
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_embedders', '--worker', backend,
+             '--texts-file', texts_file, '--vectors-file', vectors_file,
+             '--repeats', str(args.repeats), '--batch-size', str(args.batch_size)],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            print(f"{backend} : échec\n{completed.stderr}", file=sys.stderr)
+            return 1
+        results['backends'].append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        vectors[backend] = np.load(vectors_file)
+
+    # Parité avec le backend de référence
+    reference = vectors[args.backends[0]]
+    parity_ok = True
+    for result in results['backends'][1:]:
+        parity = parity_report(reference, vectors[result['backend']], len(queries))
+        result['parity_min_cosine'] = parity['min_cosine']
+        result['parity_mean_cosine'] = parity['mean_cosine']
+        result['parity_recall_at_k'] = parity['recall_at_k']
+        parity_ok = (parity_ok and parity['min_cosine'] >= args.parity_threshold
+                     and parity['recall_at_k'] >= args.recall_threshold)
+
+    print(f"{'backend':<24}{'démarrage':>10}{'RSS':>9}{'p50':>9}{'p95':>9}{'textes/s':>10}{'cos min':>9}"
+          f"{f'rappel@{PARITY_K}':>10}")
+    for r in results['backends']:
+        print(f"{r['backend']:<24}{r['cold_start_s']:>9.2f}s{r['rss_mb']:>7.0f}Mo"
+              f"{r['query_latency_p50_ms']:>7.1f}ms{r['query_latency_p95_ms']:>7.1f}ms"
+              f"{r['throughput_texts_per_s']:>10.1f}{r.get('parity_min_cosine', 1.0):>9.4f}"
+              f"{r.get('parity_recall_at_k', 1.0):>10.3f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if not parity_ok:
+        print(f"Parité insuffisante (seuils cosinus {args.parity_threshold}, rappel {args.recall_threshold})",
+              file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Micro-benchmark de l'extraction HTML du scraper.
+
+Les pages de scraped_data ne contiennent que le contenu extrait : le HTML de
+chaque page est reconstruit (en-tête, menu, conteneurs imbriqués comme sur
+le site, blocs de service, scripts, pied de page avec coordonnées), puis
+l'extraction d'origine (plusieurs `find_all`, html.parser) est comparée à
+PageExtractor (un seul parcours) avec chaque parseur disponible.
+
+Usage :
+    python -m benchmarks.bench_extraction --repeat 5
+    python -m benchmarks.bench_extraction --html-dir pages_html/   # fichiers .html réels
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from html import escape
+from typing import Dict, List
+from urllib.parse import urljoin
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup
+from corpus_store import CorpusStore, iter_json_pages
+from extraction import PageExtractor
+
+BASE_URLS = ['https://it-work.fr/', 'https://blog.it-work.fr/']
+
+def legacy_extract_contact_info(soup: BeautifulSoup) -> Dict:
+    """Extraction des coordonnées d'origine (ITWorkScraper.extract_contact_info)"""
+    contact_info = {'phone': [], 'email': [], 'address': [], 'social_media': []}
+    phone_elements = soup.find_all(string=lambda text: text and any(x in text for x in ['0', '+33']))
+    for element in phone_elements:
+        if any(char.isdigit() for char in element):
+            contact_info['phone'].append(element.strip())
+    email_elements = soup.find_all('a', href=lambda href: href and 'mailto:' in href)
+    for element in email_elements:
+        contact_info['email'].append(element['href'].replace('mailto:', '').strip())
+    address_elements = soup.find_all(['address', 'div'], class_=lambda x: x and 'address' in x.lower())
+    for element in address_elements:
+        contact_info['address'].append(element.get_text().strip())
+    social_patterns = ['facebook', 'twitter', 'linkedin', 'instagram']
+    social_links = soup.find_all('a', href=lambda href: href and any(pattern in href.lower() for pattern in social_patterns))
+    for link in social_links:
+        contact_info['social_media'].append({
+            'platform': next(p for p in social_patterns if p in link['href'].lower()),
+            'url': link['href']
+        })
+    return contact_info
+
+def legacy_extract(url: str, html: str) -> Dict:
+    """Extraction d'origine (ITWorkScraper.extract_page_content sur html.parser)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    content = {'url': url, 'title': '', 'main_content': '', 'meta_description': '',
+               'contact_info': {}, 'links': [], 'timestamp': datetime.now().isoformat()}
+    title_tag = soup.find('title')
+    if title_tag:
+        content['title'] = title_tag.get_text().strip()
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    if meta_desc:
+        content['meta_description'] = meta_desc.get('content', '').strip()
+    main_content = []
+    articles = soup.find_all(['article', 'div'], class_=lambda x: x and any(c in str(x) for c in ['post', 'article', 'content']))
+    for article in articles:
+        for element in article.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'ul', 'ol']):
+            text = element.get_text().strip()
+            if text:
+                main_content.append({'type': element.name, 'content': text})
+    services = soup.find_all('div', class_=lambda x: x and 'service' in str(x))
+    for service in services:
+        service_content = service.get_text().strip()
+        if service_content:
+            main_content.append({'type': 'service', 'content': service_content})
+    content['main_content'] = main_content
+    content['contact_info'] = legacy_extract_contact_info(soup)
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        if href.startswith('/') or any(base_url in href for base_url in BASE_URLS):
+            content['links'].append({'url': urljoin(url, href), 'text': link.get_text().strip() or link.get('title', '')})
+    return content
+
+def render_page(page: Dict) -> str:
+    """HTML d'une page scrapée, structuré comme les pages du site"""
+    menu = ''.join(f'<li><a href="{escape(link["url"])}">{escape(link["text"])}</a></li>'
+                   for link in page.get('links', []))
+    blocks = []
+    for block in page.get('main_content') or []:
+        if not isinstance(block, dict):
+            continue
+        tag = block.get('type', 'p')
+        text = escape(block.get('content', ''))
+        if tag == 'service':
+            blocks.append(f'<div class="service-item"><h3>Service</h3><p>{text}</p></div>')
+        elif tag in ('ul', 'ol'):
+            items = ''.join(f'<li><p>{item}</p></li>' for item in text.split('\n') if item.strip())
+            blocks.append(f'<{tag}>{items}</{tag}>')
+        elif tag.startswith('h') or tag == 'p':
+            blocks.append(f'<{tag}>{text}</{tag}>')
+        else:
+            blocks.append(f'<p>{text}</p>')
+    body = ''.join(blocks)
+    return f"""<!DOCTYPE html>
+<html lang="fr"><head>
+<meta charset="utf-8"><title>{escape(page.get('title', ''))}</title>
+<meta name="description" content="{escape(page.get('meta_description', ''))}">
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{dataLayer.push(arguments);}} gtag('js', new Date());</script>
+<style>.content {{ margin: 0 auto; }}</style>
+</head><body>
+<header><nav><ul class="menu">{menu}</ul></nav><p>Appelez-nous : 04 84 89 42 52</p></header>
+<div class="site-content"><div class="entry-content"><article class="post">{body}</article></div></div>
+<footer><p>© 2024 IT Work. Tous droits réservés.</p>
+<a href="mailto:contact@it-work.fr">contact@it-work.fr</a>
+<div class="footer-address">52 Bd de la Libération 13001 Marseille</div>
+<a href="https://www.linkedin.com/company/it-work-france/">LinkedIn</a>
+<a href="https://www.facebook.com/itwork">Facebook</a></footer>
+</body></html>"""
+
+def load_documents(args) -> List[tuple]:
+    if args.html_dir:
+        documents = []
+        for name in sorted(os.listdir(args.html_dir)):
+            if name.endswith('.html'):
+                with open(os.path.join(args.html_dir, name), 'r', encoding='utf-8') as f:
+                    documents.append((f"https://it-work.fr/{name[:-5]}/", f.read()))
+        return documents
+    store = CorpusStore.open(args.data_dir)
+    pages = store.iter_pages(links=True) if store is not None else iter_json_pages(args.data_dir)
+    return [(page['url'], render_page(page)) for page in pages]
+
+def bench(name: str, extract, documents: List[tuple], repeat: int) -> Dict:
+    extract(*documents[0])  # préchauffage
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        results = [extract(url, html) for url, html in documents]
+    elapsed = time.perf_counter() - start_time
+    pages = len(documents) * repeat
+    return {
+        'name': name,
+        'pages_per_s': round(pages / elapsed, 1),
+        'ms_per_page': round(1000 * elapsed / pages, 2),
+        'blocks': sum(len(r['main_content']) for r in results),
+        'phones': sum(len(r['contact_info']['phone']) for r in results),
+        'links': sum(len(r['links']) for r in results)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'extraction HTML")
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'scraped_data'))
+    parser.add_argument('--html-dir', help="Répertoire de pages HTML réelles (.html) à utiliser à la place")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Fichier JSON où enregistrer les résultats")
+    args = parser.parse_args()
+
+    documents = load_documents(args)
+    size = sum(len(html) for _, html in documents)
+    print(f"{len(documents)} pages, {size / 1024:.0f} Ko de HTML")
+
+    runs = [bench('origine (html.parser)', legacy_extract, documents, args.repeat)]
+    for parser_name in ('html.parser', 'lxml'):
+        try:
+            BeautifulSoup('<p></p>', parser_name)
+        except Exception:
+            continue
+        extractor = PageExtractor(BASE_URLS, parser=parser_name)
+        runs.append(bench(f"un parcours ({parser_name})", extractor.extract, documents, args.repeat))
+
+    baseline = runs[0]['pages_per_s']
+    print(f"{'extraction':<26}{'pages/s':>10}{'ms/page':>10}{'gain':>8}{'blocs':>8}{'tél.':>7}{'liens':>8}")
+    for run in runs:
+        run['speedup'] = round(run['pages_per_s'] / baseline, 2)
+        print(f"{run['name']:<26}{run['pages_per_s']:>10.1f}{run['ms_per_page']:>10.2f}{run['speedup']:>7.2f}x"
+              f"{run['blocks']:>8}{run['phones']:>7}{run['links']:>8}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'pages': len(documents), 'runs': runs}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
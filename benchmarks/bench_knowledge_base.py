@@ -0,0 +1,182 @@
+"""
+Micro-benchmarks de la base de connaissances.
+
+- démarrage à froid : import et construction de KnowledgeBase dans un
+  processus neuf, cache des embeddings vide puis rempli, première recherche
+  comprise ;
+- load_knowledge : lecture et découpage du corpus ;
+- build_index : index en cache, index reconstruit à partir des embeddings en
+  cache, et encodage complet (cache vide) ;
+- search_knowledge : latence p50/p95/p99 sur le corpus de requêtes, et débit
+  de search_batch par lots.
+
+Chaque mesure s'exécute dans un répertoire temporaire (cache `index_cache`
+neuf) pointant vers les données de `--data-dir`.
+
+Usage :
+    python -m benchmarks.bench_knowledge_base --output avant.json
+    python -m benchmarks.bench_knowledge_base --skip-cold-start --repeat 10
+    python -m benchmarks.compare avant.json apres.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import ROOT, QUERIES_FILE, latency_summary, load_queries, save_results
+
+def prepare_workdir(data_dir: str) -> str:
+    """Répertoire de travail neuf : données partagées, cache d'index vide"""
+    workdir = tempfile.mkdtemp(prefix='bench-kb-')
+    os.symlink(os.path.abspath(data_dir), os.path.join(workdir, 'scraped_data'))
+    return workdir
+
+def run_cold_start_worker(query: str):
+    """Démarrage mesuré dans un processus neuf (répertoire courant : le répertoire de travail)"""
+    start_time = time.perf_counter()
+    from knowledge_base import KnowledgeBase
+    from metrics import resident_memory_bytes
+    import_time = time.perf_counter()
+    knowledge_base = KnowledgeBase()
+    ready_time = time.perf_counter()
+    knowledge_base.search_knowledge(query)
+    first_query_time = time.perf_counter()
+    print(json.dumps({
+        'import_s': round(import_time - start_time, 3),
+        'init_s': round(ready_time - import_time, 3),
+        'first_query_ms': round(1000 * (first_query_time - ready_time), 2),
+        'total_s': round(first_query_time - start_time, 3),
+        'rss_mb': round(resident_memory_bytes() / 2**20, 1),
+        'passages': len(knowledge_base.documents)
+    }))
+
+def bench_cold_start(data_dir: str, query: str) -> Dict:
+    workdir = prepare_workdir(data_dir)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    results = {}
+    try:
+        # Premier lancement : tout est encodé ; second : embeddings et index lus sur disque
+        for run in ('empty_cache', 'warm_cache'):
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--worker', '--query', query],
+                cwd=workdir, env=env, capture_output=True, text=True
+            )
+            if completed.returncode != 0:
+                raise RuntimeError(f"Échec du démarrage ({run}) :\n{completed.stderr}")
+            results[run] = json.loads(completed.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def timed(function: Callable, repeat: int, setup: Callable = None) -> Dict:
+    """Durées (ms) de `repeat` appels, `setup` étant exécuté hors mesure avant chacun"""
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start_time = time.perf_counter()
+        function()
+        durations.append(1000 * (time.perf_counter() - start_time))
+    summary = latency_summary(durations)
+    return {key: summary[key] for key in ('count', 'p50_ms', 'mean_ms', 'max_ms')}
+
+def bench_in_process(data_dir: str, queries: List[str], repeat: int, batch_size: int) -> Dict:
+    workdir = prepare_workdir(data_dir)
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from knowledge_base import KnowledgeBase
+        from embedding_cache import EmbeddingCache
+
+        knowledge_base = KnowledgeBase()
+        results = {'passages': len(knowledge_base.documents), 'vector_index': knowledge_base.vector_index.key}
+
+        def reset():
+            # Remise à zéro des données chargées avant chaque mesure
+            knowledge_base.documents = []
+            knowledge_base.urls = []
+            knowledge_base.contact_info = {}
+            knowledge_base.page_titles = {}
+            if knowledge_base.corpus is not None:
+                knowledge_base.corpus.close()
+
+        results['load_knowledge'] = timed(knowledge_base.load_knowledge, repeat, setup=reset)
+        results['build_index_cached'] = timed(knowledge_base.build_index, repeat)
+        results['build_index_from_embeddings'] = timed(
+            knowledge_base.build_index, repeat, setup=knowledge_base.embedding_cache.clear_indexes
+        )
+
+        def empty_cache():
+            shutil.rmtree('index_cache', ignore_errors=True)
+            knowledge_base.embedding_cache = EmbeddingCache(knowledge_base.embedder.name, cache_dir='index_cache')
+        results['build_index_full_encode'] = timed(knowledge_base.build_index, 1, setup=empty_cache)
+
+        # Recherche requête par requête, puis par lots (comme EmbeddingBatcher)
+        knowledge_base.search_knowledge(queries[0])
+        latencies = []
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            for query in queries:
+                query_start = time.perf_counter()
+                knowledge_base.search_knowledge(query)
+                latencies.append(1000 * (time.perf_counter() - query_start))
+        elapsed = time.perf_counter() - start_time
+        results['search_knowledge'] = dict(latency_summary(latencies), qps=round(len(latencies) / elapsed, 1))
+
+        batches = [queries[i:i + batch_size] for i in range(0, len(queries), batch_size)]
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            for batch in batches:
+                knowledge_base.search_batch(batch, [3] * len(batch))
+        elapsed = time.perf_counter() - start_time
+        results['search_batch'] = {'batch_size': batch_size, 'qps': round(repeat * len(queries) / elapsed, 1)}
+        return results
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de la base de connaissances")
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'scraped_data'))
+    parser.add_argument('--queries', default=QUERIES_FILE, help="Corpus de requêtes (JSON lines)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--skip-cold-start', action='store_true', help="Sans les mesures de démarrage en processus neuf")
+    parser.add_argument('--output', help="Fichier JSON où enregistrer les résultats")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--query', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_cold_start_worker(args.query)
+
+    queries = [item['query'] for item in load_queries(args.queries)]
+    results = {}
+    if not args.skip_cold_start:
+        results['cold_start'] = bench_cold_start(args.data_dir, queries[0])
+    results.update(bench_in_process(args.data_dir, queries, args.repeat, args.batch_size))
+
+    print(f"\n{results['passages']} passages, index {results['vector_index']}")
+    for run, cold in results.get('cold_start', {}).items():
+        print(f"démarrage ({run}) : {cold['total_s']:.2f}s (import {cold['import_s']:.2f}s, "
+              f"construction {cold['init_s']:.2f}s, 1re requête {cold['first_query_ms']:.1f} ms), RSS {cold['rss_mb']} Mo")
+    for name in ('load_knowledge', 'build_index_cached', 'build_index_from_embeddings', 'build_index_full_encode'):
+        print(f"{name:<30}{results[name]['p50_ms']:>10.1f} ms (max {results[name]['max_ms']:.1f} ms)")
+    search = results['search_knowledge']
+    print(f"{'search_knowledge':<30}{search['p50_ms']:>10.2f} ms p50, {search['p95_ms']:.2f} ms p95, "
+          f"{search['p99_ms']:.2f} ms p99 ({search['qps']} req/s)")
+    print(f"{'search_batch':<30}{results['search_batch']['qps']:>10.1f} req/s (lots de {args.batch_size})")
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ('output', 'worker', 'query')}
+        save_results(args.output, 'knowledge_base', config, results)
+
+if __name__ == "__main__":
+    main()
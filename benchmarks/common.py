@@ -0,0 +1,147 @@
+"""
+Outils communs aux benchmarks : corpus de requêtes, percentiles, lecture de
+/metrics et enregistrement des résultats en JSON (comparables avec
+`python -m benchmarks.compare`).
+"""
+import os
+import sys
+import json
+import platform
+import subprocess
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERIES_FILE = os.path.join(ROOT, 'benchmarks', 'queries_fr.jsonl')
+
+def load_queries(path: str = QUERIES_FILE, categories: Optional[Iterable[str]] = None) -> List[Dict]:
+    """Requêtes du corpus rejouable ({'query', 'category'}), dans l'ordre du fichier"""
+    categories = set(categories) if categories else None
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if categories is None or item.get('category') in categories:
+                queries.append(item)
+    return queries
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile par interpolation linéaire (q entre 0 et 1)"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    position = q * (len(values) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def latency_summary(latencies_ms: List[float]) -> Dict:
+    """p50, p95, p99, moyenne et maximum (ms)"""
+    if not latencies_ms:
+        return {'count': 0}
+    return {
+        'count': len(latencies_ms),
+        'p50_ms': round(percentile(latencies_ms, 0.50), 2),
+        'p95_ms': round(percentile(latencies_ms, 0.95), 2),
+        'p99_ms': round(percentile(latencies_ms, 0.99), 2),
+        'mean_ms': round(sum(latencies_ms) / len(latencies_ms), 2),
+        'max_ms': round(max(latencies_ms), 2)
+    }
+
+def process_rss_mb(pid: int) -> Optional[float]:
+    """RSS actuelle d'un processus (Linux), None si indisponible"""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def parse_metrics(text: str) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+    """Échantillons du format texte de Prometheus : (nom, étiquettes triées) -> valeur"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, _, value = line.rpartition(' ')
+        name, _, labels = series.partition('{')
+        pairs = []
+        for pair in labels.rstrip('}').split('",'):
+            if '=' in pair:
+                key, _, label_value = pair.partition('=')
+                pairs.append((key.strip(), label_value.strip().strip('"')))
+        samples[(name, tuple(sorted(pairs)))] = float(value.replace('+Inf', 'inf'))
+    return samples
+
+def histogram_delta(before: Dict, after: Dict, name: str, **labels: str) -> List[Tuple[float, float]]:
+    """Comptes cumulés par borne (le, nombre) observés entre deux relevés d'un histogramme"""
+    wanted = set(labels.items())
+    buckets = {}
+    for (sample_name, pairs), value in after.items():
+        if sample_name != f'{name}_bucket' or not wanted <= set(pairs):
+            continue
+        bound = float(dict(pairs)['le'].replace('+Inf', 'inf'))
+        buckets[bound] = buckets.get(bound, 0.0) + value - before.get((sample_name, pairs), 0.0)
+    return sorted(buckets.items())
+
+def histogram_quantile(buckets: List[Tuple[float, float]], q: float) -> Optional[float]:
+    """Quantile estimé depuis des comptes cumulés (interpolation dans la borne, comme PromQL)"""
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    target = q * buckets[-1][1]
+    previous_bound, previous_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= target:
+            if bound == float('inf'):
+                return previous_bound
+            if count == previous_count:
+                return bound
+            return previous_bound + (bound - previous_bound) * (target - previous_count) / (count - previous_count)
+        previous_bound, previous_count = bound, count
+    return previous_bound
+
+def histogram_totals(before: Dict, after: Dict, name: str, label: str) -> Dict[str, Dict]:
+    """Nombre d'observations et durée moyenne (ms) par valeur d'étiquette entre deux relevés"""
+    totals = {}
+    for (sample_name, pairs), value in after.items():
+        if sample_name not in (f'{name}_sum', f'{name}_count'):
+            continue
+        key = dict(pairs).get(label, '')
+        delta = value - before.get((sample_name, pairs), 0.0)
+        entry = totals.setdefault(key, {'count': 0.0, 'sum': 0.0})
+        entry['count' if sample_name.endswith('_count') else 'sum'] += delta
+    return {
+        key: {'count': int(entry['count']), 'mean_ms': round(1000 * entry['sum'] / entry['count'], 3)}
+        for key, entry in sorted(totals.items()) if entry['count']
+    }
+
+def git_revision() -> Optional[str]:
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                  text=True, timeout=5).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, timeout=5).stdout.strip()
+        return f"{revision}-dirty" if revision and dirty else revision or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def save_results(path: str, benchmark: str, config: Dict, results: Dict):
+    """Enregistre les résultats avec le contexte d'exécution (révision, machine, paramètres)"""
+    document = {
+        'benchmark': benchmark,
+        'timestamp': datetime.now().isoformat(),
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': config,
+        'results': results
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    print(f"Résultats enregistrés dans {path}")
@@ -0,0 +1,78 @@
+"""
+Comparaison de deux fichiers de résultats (load_test, bench_knowledge_base...).
+
+Chaque valeur numérique des résultats est comparée ; le sens d'une
+amélioration est déduit du nom (débit, rappel : plus haut ; latence, durée,
+mémoire : plus bas). Les écarts au-delà de `--threshold` % sont signalés, et
+`--fail-on-regression` fait échouer la commande (intégration continue).
+
+Usage :
+    python -m benchmarks.compare avant.json apres.json
+    python -m benchmarks.compare avant.json apres.json --threshold 10 --fail-on-regression
+"""
+import sys
+import json
+import argparse
+from typing import Dict, Optional
+
+HIGHER_IS_BETTER = ('qps', 'rps', 'per_s', 'throughput', 'recall', 'hit', 'completed', 'speedup')
+NEUTRAL = ('count', 'status', 'requests', 'passages', 'samples', 'target', 'batch_size', 'tokens', 'responses')
+
+def flatten(data, prefix: str = '') -> Dict[str, float]:
+    values = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            values.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        values[prefix] = float(data)
+    return values
+
+def direction(key: str) -> Optional[int]:
+    """+1 si une hausse est une amélioration, -1 si c'est une régression, None si neutre"""
+    key = key.lower()
+    if any(word in key for word in NEUTRAL):
+        return None
+    if any(word in key for word in HIGHER_IS_BETTER):
+        return 1
+    return -1
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison de deux exécutions d'un benchmark")
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=5.0, help="Écart signalé (%%)")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    with open(args.before, 'r', encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, 'r', encoding='utf-8') as f:
+        after = json.load(f)
+    if before.get('benchmark') != after.get('benchmark'):
+        print(f"Attention : benchmarks différents ({before.get('benchmark')} / {after.get('benchmark')})")
+    print(f"avant : {before.get('revision')} ({before.get('timestamp')})")
+    print(f"après : {after.get('revision')} ({after.get('timestamp')})\n")
+
+    old, new = flatten(before.get('results', {})), flatten(after.get('results', {}))
+    regressions = 0
+    print(f"{'mesure':<52}{'avant':>12}{'après':>12}{'écart':>10}")
+    for key in sorted(old.keys() & new.keys()):
+        change = (new[key] - old[key]) / abs(old[key]) * 100 if old[key] else 0.0
+        sense = direction(key)
+        flag = ''
+        if sense is not None and abs(change) >= args.threshold:
+            if change * sense > 0:
+                flag = '  mieux'
+            else:
+                flag = '  PIRE'
+                regressions += 1
+        print(f"{key:<52}{old[key]:>12.2f}{new[key]:>12.2f}{change:>9.1f}%{flag}")
+
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f"{key:<52}{'(absent avant)' if key in new else '(absent après)':>24}")
+
+    print(f"\n{regressions} régression(s) au-delà de {args.threshold:g} %")
+    return 1 if regressions and args.fail_on_regression else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Faux serveur de complétion compatible avec l'API Groq (format OpenAI).
+
+Permet de tester hors ligne le client LLM (pool de connexions, limites de
+concurrence, nouvelles tentatives, Retry-After, délais, modèle de secours).
+
+Usage :
+    python -m benchmarks.fake_groq --port 8081 --latency 0.5 --error-rate 0.1
+    GROQ_BASE_URL=http://127.0.0.1:8081 GROQ_API_KEY=fake python app.py
+"""
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+DEFAULT_REPLY = ("Bonjour ! Chez IT-Work, nous accompagnons les entreprises sur le cloud, "
+                 "la téléphonie IP et les réseaux. N'hésitez pas à nous contacter au "
+                 "04 84 89 42 52 pour en discuter.")
+
+@dataclass
+class FakeGroqConfig:
+    latency: float = 0.2           # Délai avant le premier token (secondes)
+    token_delay: float = 0.01      # Délai entre deux fragments en streaming
+    error_rate: float = 0.0        # Proportion de réponses 500
+    rate_limit_rate: float = 0.0   # Proportion de réponses 429
+    retry_after: Optional[float] = 1.0  # Valeur de l'en-tête Retry-After des 429
+    fail_first: int = 0            # Nombre de premières requêtes en échec (429)
+    failing_models: str = ""       # Modèles toujours en erreur 503 (séparés par des virgules)
+    reply: str = DEFAULT_REPLY
+
+def create_app(config: Optional[FakeGroqConfig] = None) -> FastAPI:
+    config = config or FakeGroqConfig()
+    app = FastAPI()
+    app.state.config = config
+    app.state.requests = 0
+    app.state.in_flight = 0
+    app.state.max_in_flight = 0
+
+    def error_response(status: int, message: str, retry_after: Optional[float] = None) -> JSONResponse:
+        headers = {}
+        if retry_after is not None:
+            headers['retry-after'] = str(retry_after)
+        return JSONResponse(
+            status_code=status,
+            content={"error": {"message": message, "type": "fake_error"}},
+            headers=headers
+        )
+
+    def usage(messages, completion: str) -> dict:
+        # Approximation grossière : un token pour quatre caractères
+        prompt_tokens = sum(len(m.get('content', '')) for m in messages) // 4
+        completion_tokens = len(completion) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "requests": app.state.requests,
+            "in_flight": app.state.in_flight,
+            "max_in_flight": app.state.max_in_flight
+        }
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        model = body.get('model', 'fake-model')
+        messages = body.get('messages', [])
+
+        # Erreurs simulées
+        if app.state.requests <= config.fail_first:
+            return error_response(429, "Rate limit reached", config.retry_after)
+        if model in [m.strip() for m in config.failing_models.split(',') if m.strip()]:
+            return error_response(503, f"Model {model} unavailable")
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            return error_response(429, "Rate limit reached", config.retry_after)
+        if roll < config.rate_limit_rate + config.error_rate:
+            return error_response(500, "Internal server error")
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        words = config.reply.split(' ')
+
+        app.state.in_flight += 1
+        app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+
+        if not body.get('stream'):
+            try:
+                await asyncio.sleep(config.latency + config.token_delay * len(words))
+            finally:
+                app.state.in_flight -= 1
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": config.reply},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage(messages, config.reply)
+            }
+
+        async def event_stream():
+            try:
+                await asyncio.sleep(config.latency)
+                for i, word in enumerate(words):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": word if i == 0 else f" {word}"},
+                            "finish_reason": None
+                        }]
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                    await asyncio.sleep(config.token_delay)
+                final = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    "x_groq": {"usage": usage(messages, config.reply)}
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                app.state.in_flight -= 1
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur de complétion Groq")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--token-delay', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--fail-first', type=int, default=0)
+    parser.add_argument('--failing-models', default='')
+    args = parser.parse_args()
+
+    config = FakeGroqConfig(
+        latency=args.latency,
+        token_delay=args.token_delay,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        fail_first=args.fail_first,
+        failing_models=args.failing_models
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level='warning')
+
+if __name__ == "__main__":
+    main()
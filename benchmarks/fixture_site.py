@@ -0,0 +1,147 @@
+"""
+Site HTML local servant de banc d'essai pour le crawler.
+
+Génère un site de N pages reliées entre elles (structure proche des pages
+IT-Work : titre, meta description, article, blocs service, contacts, menu)
+et le sert sur un port local, avec une latence et un Crawl-delay optionnels.
+Les pages portent un ETag et répondent 304 aux requêtes conditionnelles.
+
+Usage :
+    python -m benchmarks.fixture_site --pages 200 --port 8082 --latency 0.05
+"""
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+def render_page(index: int, pages: int, fanout: int = 4) -> str:
+    """Génère le HTML de la page `index`"""
+    children = [(index * fanout + i) % pages for i in range(1, fanout + 1)]
+    links = ''.join(f'<li><a href="/page/{child}/">Page {child}</a></li>' for child in children)
+    paragraphs = ''.join(
+        f"<p>Paragraphe {p} de la page {index} : nos experts vous accompagnent sur le cloud, "
+        f"la téléphonie IP, les réseaux et la cybersécurité de votre entreprise.</p>"
+        for p in range(5)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="fr">
+<head>
+  <title>Page {index} – Site de test</title>
+  <meta name="description" content="Description de la page {index} du site de test">
+</head>
+<body>
+  <header>
+    <ul class="menu"><li><a href="/">Accueil</a></li><li><a href="/page/0/">Solutions</a></li></ul>
+    <p>04 84 89 42 52</p>
+  </header>
+  <article class="post">
+    <h1>Titre de la page {index}</h1>
+    {paragraphs}
+    <h2>Pages liées</h2>
+    <ul>{links}</ul>
+  </article>
+  <div class="service-block">Service {index % 7} : infogérance et support</div>
+  <footer>
+    <a href="mailto:contact@example.test">contact@example.test</a>
+    <div class="address">52 Bd de la Libération 13001 Marseille</div>
+    <a href="https://www.linkedin.com/company/example">LinkedIn</a>
+  </footer>
+</body>
+</html>"""
+
+class FixtureSite:
+    """Serveur HTTP local (threads) exposant le site de test"""
+
+    def __init__(self, pages: int = 100, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, crawl_delay: Optional[float] = None):
+        self.pages = pages
+        self.latency = latency
+        self.crawl_delay = crawl_delay
+        self.requests = 0
+        self.not_modified = 0
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests += 1
+                if site.latency:
+                    time.sleep(site.latency)
+
+                if self.path == '/robots.txt':
+                    body = "User-agent: *\nDisallow: /private/\n"
+                    if site.crawl_delay:
+                        body += f"Crawl-delay: {site.crawl_delay}\n"
+                    return self._send(200, body, 'text/plain')
+
+                if self.path == '/':
+                    return self._send(200, render_page(0, site.pages))
+
+                parts = self.path.strip('/').split('/')
+                if len(parts) == 2 and parts[0] == 'page' and parts[1].isdigit() and int(parts[1]) < site.pages:
+                    return self._send(200, render_page(int(parts[1]), site.pages))
+
+                self._send(404, 'Not found', 'text/plain')
+
+            def _send(self, status: int, body: str, content_type: str = 'text/html'):
+                data = body.encode('utf-8')
+                etag = f'"{hashlib.sha1(data).hexdigest()}"'
+                if status == 200 and self.headers.get('If-None-Match') == etag:
+                    site.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FixtureSite":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FixtureSite":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Site HTML local pour tester le crawler")
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--crawl-delay', type=float, default=None)
+    args = parser.parse_args()
+
+    site = FixtureSite(args.pages, args.host, args.port, args.latency, args.crawl_delay)
+    print(f"Site de test ({args.pages} pages) sur {site.base_url}")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        site.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Test de charge de bout en bout, hors ligne.
+
+Lance le faux serveur Groq et l'application (uvicorn, un worker), puis envoie
+les requêtes du corpus `queries_fr.jsonl` sur `/chat` (ou `/chat/stream`) à un
+débit cible, en boucle ouverte : les arrivées ne dépendent pas des réponses,
+comme pour de vrais visiteurs. Rapporte latences p50/p95/p99 (et premier
+fragment en streaming), débit, RSS du serveur et retard de sa boucle
+d'événements ; la répartition du temps par étape et l'usage de tokens sont
+lus sur `/metrics` avant et après la charge.
+
+Usage :
+    python -m benchmarks.load_test --rps 20 --duration 30 --output avant.json
+    python -m benchmarks.load_test --rps 20 --duration 30 --stream --llm-latency 0.5 --error-rate 0.05
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --rps 5   # serveur déjà lancé
+    python -m benchmarks.compare avant.json apres.json
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import (ROOT, QUERIES_FILE, histogram_delta, histogram_quantile, histogram_totals,
+                               latency_summary, load_queries, parse_metrics, process_rss_mb, save_results)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class ServerProcesses:
+    """Faux serveur Groq et application lancés dans des processus séparés"""
+
+    def __init__(self, args):
+        self.args = args
+        self.processes: List[subprocess.Popen] = []
+        self.app_pid = None
+        self.base_url = None
+        self.startup_time = None
+
+    def __enter__(self) -> "ServerProcesses":
+        args = self.args
+        groq_port, app_port = free_port(), free_port()
+        self.processes.append(subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.fake_groq', '--port', str(groq_port),
+             '--latency', str(args.llm_latency), '--token-delay', str(args.token_delay),
+             '--error-rate', str(args.error_rate), '--rate-limit-rate', str(args.rate_limit_rate),
+             '--retry-after', '0.2'],
+            cwd=ROOT
+        ))
+
+        env = dict(os.environ, GROQ_BASE_URL=f'http://127.0.0.1:{groq_port}', GROQ_API_KEY='fake')
+        start_time = time.perf_counter()
+        app = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1', '--port', str(app_port),
+             '--log-level', 'warning'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL if args.quiet_server else None,
+            stderr=subprocess.DEVNULL if args.quiet_server else None
+        )
+        self.processes.append(app)
+        self.app_pid = app.pid
+        self.base_url = f'http://127.0.0.1:{app_port}'
+
+        # Démarrage à froid : jusqu'à ce que /readyz confirme l'index chargé et préchauffé
+        deadline = time.monotonic() + args.startup_timeout
+        while time.monotonic() < deadline:
+            if app.poll() is not None:
+                self.__exit__(None, None, None)
+                raise RuntimeError(f"L'application s'est arrêtée au démarrage (code {app.returncode})")
+            try:
+                if httpx.get(f'{self.base_url}/readyz', timeout=1.0).status_code == 200:
+                    self.startup_time = time.perf_counter() - start_time
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"L'application n'a pas démarré en {args.startup_timeout:g}s")
+
+    def __exit__(self, *exc):
+        for process in reversed(self.processes):
+            if process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        self.processes = []
+
+class LoadGenerator:
+    """Client en boucle ouverte : une arrivée toutes les 1/rps secondes (ou selon une loi de Poisson)"""
+
+    def __init__(self, base_url: str, queries: List[Dict], rps: float, duration: float, stream: bool = False,
+                 turns: int = 1, max_in_flight: int = 256, poisson: bool = False, timeout: float = 60.0,
+                 seed: int = 1, server_pid: Optional[int] = None):
+        self.base_url = base_url
+        self.queries = queries
+        self.rps = rps
+        self.duration = duration
+        self.stream = stream
+        self.turns = max(1, turns)
+        self.max_in_flight = max_in_flight
+        self.poisson = poisson
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.server_pid = server_pid
+
+        self.records: List[Dict] = []
+        self.in_flight = 0
+        self.dropped = 0
+        self.next_query = 0
+        self.rss_samples: List[float] = []
+        self.client_lag_max = 0.0
+
+    def pick_query(self) -> Dict:
+        # Rejeu dans l'ordre du corpus, en boucle
+        item = self.queries[self.next_query % len(self.queries)]
+        self.next_query += 1
+        return item
+
+    async def send(self, client: httpx.AsyncClient, session_id: str, item: Dict):
+        record = {'category': item.get('category', ''), 'ok': False, 'status': None, 'ttfb_ms': None}
+        start_time = time.perf_counter()
+        try:
+            headers = {'X-Session-ID': session_id}
+            data = {'message': item['query']}
+            if self.stream:
+                async with client.stream('POST', '/chat/stream', data=data, headers=headers) as response:
+                    record['status'] = response.status_code
+                    async for line in response.aiter_lines():
+                        if record['ttfb_ms'] is None and line.startswith('data:'):
+                            record['ttfb_ms'] = 1000 * (time.perf_counter() - start_time)
+                        if line.startswith('event: done'):
+                            record['ok'] = response.status_code == 200
+            else:
+                response = await client.post('/chat', data=data, headers=headers)
+                record['status'] = response.status_code
+                record['ok'] = response.status_code == 200
+        except httpx.HTTPError as e:
+            record['error'] = type(e).__name__
+        record['latency_ms'] = 1000 * (time.perf_counter() - start_time)
+        self.records.append(record)
+
+    async def visitor(self, client: httpx.AsyncClient):
+        """Un visiteur : `turns` questions successives dans la même session"""
+        self.in_flight += 1
+        try:
+            session_id = f"load{uuid.uuid4().hex[:16]}"
+            for _ in range(self.turns):
+                await self.send(client, session_id, self.pick_query())
+        finally:
+            self.in_flight -= 1
+
+    async def sample_server(self, client: httpx.AsyncClient, stop: asyncio.Event):
+        """RSS du serveur (/proc si le processus est local, sinon gauge de /metrics)"""
+        while not stop.is_set():
+            rss = process_rss_mb(self.server_pid) if self.server_pid else None
+            if rss is None:
+                try:
+                    samples = parse_metrics((await client.get('/metrics')).text)
+                    rss = samples.get(('process_resident_memory_bytes', ()), 0.0) / 2**20 or None
+                except httpx.HTTPError:
+                    pass
+            if rss is not None:
+                self.rss_samples.append(rss)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+
+    async def watch_client_loop(self, stop: asyncio.Event):
+        # Retard de la boucle du générateur : au-delà de quelques ms, le client sature
+        loop = asyncio.get_event_loop()
+        while not stop.is_set():
+            expected = loop.time() + 0.05
+            await asyncio.sleep(0.05)
+            self.client_lag_max = max(self.client_lag_max, loop.time() - expected)
+
+    async def run(self) -> float:
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            stop = asyncio.Event()
+            monitors = [asyncio.ensure_future(self.sample_server(client, stop)),
+                        asyncio.ensure_future(self.watch_client_loop(stop))]
+            loop = asyncio.get_event_loop()
+            visitors = []
+            arrival_rate = self.rps / self.turns
+            start_time = loop.time()
+            next_arrival = start_time
+            while next_arrival < start_time + self.duration:
+                await asyncio.sleep(max(0.0, next_arrival - loop.time()))
+                if self.in_flight >= self.max_in_flight:
+                    self.dropped += 1
+                else:
+                    visitors.append(asyncio.ensure_future(self.visitor(client)))
+                gap = self.random.expovariate(arrival_rate) if self.poisson else 1 / arrival_rate
+                next_arrival += gap
+            await asyncio.gather(*visitors)
+            elapsed = loop.time() - start_time
+            stop.set()
+            await asyncio.gather(*monitors)
+        return elapsed
+
+    def report(self, elapsed: float) -> Dict:
+        completed = [r for r in self.records if r['ok']]
+        by_category = defaultdict(list)
+        for record in completed:
+            by_category[record['category']].append(record['latency_ms'])
+        results = {
+            'target_rps': self.rps,
+            'requests': len(self.records),
+            'completed': len(completed),
+            'http_errors': len(self.records) - len(completed),
+            'dropped': self.dropped,
+            'status_codes': dict(Counter(str(r['status']) for r in self.records)),
+            'duration_s': round(elapsed, 2),
+            'throughput_rps': round(len(completed) / elapsed, 2) if elapsed else 0.0,
+            'latency': latency_summary([r['latency_ms'] for r in completed]),
+            'latency_by_category': {
+                category: {key: value for key, value in latency_summary(values).items()
+                           if key in ('count', 'p50_ms', 'p95_ms')}
+                for category, values in sorted(by_category.items())
+            },
+            'client_loop_lag_max_ms': round(1000 * self.client_lag_max, 2)
+        }
+        if self.stream:
+            results['ttfb'] = latency_summary([r['ttfb_ms'] for r in completed if r['ttfb_ms'] is not None])
+        if self.rss_samples:
+            results['server_rss_mb'] = {
+                'start': round(self.rss_samples[0], 1),
+                'peak': round(max(self.rss_samples), 1),
+                'end': round(self.rss_samples[-1], 1)
+            }
+        return results
+
+def server_report(before: Dict, after: Dict) -> Dict:
+    """Répartition côté serveur entre deux relevés de /metrics"""
+    lag = histogram_delta(before, after, 'chatbot_event_loop_lag_seconds')
+    responses, tokens, errors = {}, {}, {}
+    for (name, pairs), value in after.items():
+        delta = value - before.get((name, pairs), 0.0)
+        labels = dict(pairs)
+        if not delta:
+            continue
+        if name == 'chatbot_responses_total':
+            responses[labels.get('source', '')] = int(delta)
+        elif name == 'chatbot_llm_tokens_total':
+            tokens[labels.get('kind', '')] = tokens.get(labels.get('kind', ''), 0) + int(delta)
+        elif name in ('chatbot_upstream_errors_total', 'chatbot_upstream_retries_total'):
+            errors[f"{name.split('_')[2]}:{labels.get('error', '')}"] = int(delta)
+
+    report = {
+        'stages': histogram_totals(before, after, 'chatbot_stage_duration_seconds', 'stage'),
+        'responses': responses,
+        'tokens': tokens,
+        'upstream': errors
+    }
+    if lag and lag[-1][1]:
+        report['event_loop_lag_ms'] = {
+            'samples': int(lag[-1][1]),
+            'p50': round(1000 * histogram_quantile(lag, 0.50), 2),
+            'p99': round(1000 * histogram_quantile(lag, 0.99), 2),
+            # Borne supérieure du plus grand retard observé (None au-delà de la dernière borne)
+            'max_bucket': next((1000 * bound for bound, count in lag
+                                if count >= lag[-1][1] and bound != float('inf')), None)
+        }
+    return report
+
+async def fetch_metrics(base_url: str) -> Dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=10.0) as client:
+        return parse_metrics((await client.get('/metrics')).text)
+
+async def warm_up(base_url: str, queries: List[Dict], count: int, stream: bool):
+    """Premières requêtes hors mesure (chargement paresseux, threads, connexions)"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        for item in queries[:count]:
+            path = '/chat/stream' if stream else '/chat'
+            await client.post(path, data={'message': item['query']}, headers={'X-Session-ID': 'warmup-session'})
+
+def print_report(results: Dict):
+    latency = results['latency']
+    print(f"\n{results['completed']}/{results['requests']} requêtes réussies en {results['duration_s']}s "
+          f"({results['throughput_rps']} req/s pour {results['target_rps']} visées, {results['dropped']} abandonnées)")
+    if latency.get('count'):
+        print(f"latence   p50 {latency['p50_ms']:.0f} ms   p95 {latency['p95_ms']:.0f} ms   "
+              f"p99 {latency['p99_ms']:.0f} ms   max {latency['max_ms']:.0f} ms")
+    if results.get('ttfb', {}).get('count'):
+        ttfb = results['ttfb']
+        print(f"1er fragment p50 {ttfb['p50_ms']:.0f} ms   p95 {ttfb['p95_ms']:.0f} ms   p99 {ttfb['p99_ms']:.0f} ms")
+    if 'server_rss_mb' in results:
+        rss = results['server_rss_mb']
+        print(f"RSS serveur  {rss['start']} -> {rss['end']} Mo (pic {rss['peak']} Mo)")
+    server = results.get('server', {})
+    if 'event_loop_lag_ms' in server:
+        lag = server['event_loop_lag_ms']
+        print(f"retard de la boucle  p50 {lag['p50']} ms   p99 {lag['p99']} ms   max <= {lag['max_bucket']} ms")
+    if server.get('stages'):
+        print(f"{'étape':<18}{'nombre':>8}{'moyenne':>12}")
+        for stage, entry in server['stages'].items():
+            print(f"{stage:<18}{entry['count']:>8}{entry['mean_ms']:>10.2f}ms")
+    if server.get('responses'):
+        print("réponses : " + ', '.join(f"{source} {count}" for source, count in server['responses'].items()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de /chat avec le faux serveur Groq")
+    parser.add_argument('--url', help="Serveur déjà lancé (sinon, application et faux Groq sont démarrés)")
+    parser.add_argument('--rps', type=float, default=10.0, help="Requêtes par seconde visées")
+    parser.add_argument('--duration', type=float, default=30.0, help="Durée de la charge (s)")
+    parser.add_argument('--stream', action='store_true', help="Utilise /chat/stream (mesure du premier fragment)")
+    parser.add_argument('--turns', type=int, default=1, help="Questions successives par visiteur (même session)")
+    parser.add_argument('--poisson', action='store_true', help="Arrivées selon une loi de Poisson")
+    parser.add_argument('--max-in-flight', type=int, default=256, help="Visiteurs simultanés au-delà desquels les arrivées sont abandonnées")
+    parser.add_argument('--queries', default=QUERIES_FILE, help="Corpus de requêtes (JSON lines)")
+    parser.add_argument('--categories', nargs='*', help="Catégories du corpus à rejouer")
+    parser.add_argument('--shuffle', action='store_true', help="Mélange le corpus (graine --seed)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=3, help="Requêtes envoyées avant la mesure")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--llm-latency', type=float, default=0.3, help="Faux Groq : délai avant le premier token (s)")
+    parser.add_argument('--token-delay', type=float, default=0.005, help="Faux Groq : délai entre deux fragments (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Faux Groq : part de réponses 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Faux Groq : part de réponses 429")
+    parser.add_argument('--startup-timeout', type=float, default=300.0)
+    parser.add_argument('--quiet-server', action='store_true', help="Masque les journaux de l'application")
+    parser.add_argument('--output', help="Fichier JSON où enregistrer les résultats")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries, args.categories)
+    if args.shuffle:
+        random.Random(args.seed).shuffle(queries)
+
+    servers = None
+    base_url, pid, startup_time = args.url, None, None
+    if base_url is None:
+        servers = ServerProcesses(args).__enter__()
+        base_url, pid, startup_time = servers.base_url, servers.app_pid, servers.startup_time
+        print(f"Application prête en {startup_time:.2f}s sur {base_url}")
+
+    try:
+        asyncio.run(warm_up(base_url, queries, args.warmup, args.stream))
+        before = asyncio.run(fetch_metrics(base_url))
+        generator = LoadGenerator(base_url, queries[args.warmup:] or queries, args.rps, args.duration,
+                                  stream=args.stream, turns=args.turns, max_in_flight=args.max_in_flight,
+                                  poisson=args.poisson, timeout=args.timeout, seed=args.seed, server_pid=pid)
+        elapsed = asyncio.run(generator.run())
+        after = asyncio.run(fetch_metrics(base_url))
+    finally:
+        if servers is not None:
+            servers.__exit__(None, None, None)
+
+    results = generator.report(elapsed)
+    results['server'] = server_report(before, after)
+    if startup_time is not None:
+        results['startup_s'] = round(startup_time, 2)
+    print_report(results)
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ('output', 'quiet_server')}
+        save_results(args.output, 'load_test', config, results)
+
+if __name__ == "__main__":
+    main()
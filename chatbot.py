@@ -1,20 +1,58 @@
 import os
+import time
 import logging
 import asyncio
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Optional, Tuple
+import numpy as np
 from dotenv import load_dotenv
-from groq import Groq
-from knowledge_base import KnowledgeBase
+import groq
+from knowledge_base_manager import KnowledgeBaseManager
+from embedding_batcher import EmbeddingBatcher
+from llm_client import LLMClient, LLMDeadlineExceeded
+from admission import PRIORITY_FOLLOW_UP, PRIORITY_NEW, Overloaded
+from response_cache import SemanticResponseCache
+from session_store import create_session_store
+from intent_router import IntentRouter
+from tenants import DEFAULT_TENANT, Tenant, TenantConfig, TenantRegistry
+from metrics import RESPONSES, STARTUP, SlowRequestProfiler, span
+from prompt_builder import PromptBuilder
+# Import différé (faiss, modèle d'embedding) : chargé par le préchauffage, après l'ouverture du port
+if TYPE_CHECKING:
+    from knowledge_base import KnowledgeBase
+
+DEFAULT_SESSION_ID = 'default'
+
+# Requêtes fictives du préchauffage (encodeur, index et caches)
+WARMUP_QUERIES = [
+    "Quelles sont vos offres d'hébergement cloud ?",
+    "Proposez-vous de la téléphonie VoIP pour les entreprises ?",
+    "Comment sécuriser le réseau wifi de mon magasin ?",
+    "Avez-vous des solutions pour les cabinets médicaux ?",
+    "Comment obtenir un devis ?"
+]
+
+class NotReady(Exception):
+    """La base de connaissances est encore en cours de chargement"""
 
 class Chatbot:
     def __init__(self):
         # Chargement de la clé API depuis les variables d'environnement
         load_dotenv()
-        self.groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+        self.llm = LLMClient.from_env(default_model="mixtral-8x7b-32768")
+        
+        # Bases de connaissances des sites clients : construites par warmup(), en
+        # arrière-plan, pour que le serveur ouvre son port sans attendre le modèle
+        self.tenants: Optional[TenantRegistry] = None
+        self.ready = False
+        self.startup_error: Optional[str] = None
+        self.warmup_queries = WARMUP_QUERIES[:int(os.getenv('WARMUP_QUERIES', '3'))]
         
-        # Initialisation de la base de connaissances
-        self.knowledge_base = KnowledgeBase()
+        # Encodage et recherche des requêtes par lot, hors de la boucle d'événements
+        self.embedding_batcher = EmbeddingBatcher.from_env()
+        
+        # Profil des requêtes lentes (PROFILE_SLOW_MS, désactivé par défaut)
+        self.profiler = SlowRequestProfiler.from_env()
         
         # Configuration du système de prompt
         self.system_prompt = """Tu es l'assistant virtuel d'IT-Work, une entreprise de services informatiques basée en France. 
@@ -41,10 +79,17 @@ Important :
 
 Ta mission est d'être un véritable partenaire de confiance, comme un collègue bienveillant qui connaît bien IT-Work."""
 
-        # Initialisation de l'historique des conversations
-        self.conversation_history = []
+        # Initialisation de l'historique des conversations (une entrée par session)
+        self.sessions = create_session_store()
         self.max_history = 5  # Nombre maximum de messages dans l'historique
         
+        # Assemblage du prompt dans un budget de tokens (résumé des échanges anciens)
+        self.prompt_builder = PromptBuilder.from_env()
+        
+        # Paramètres de génération
+        self.temperature = 0.8  # Légèrement augmenté pour plus de naturel
+        self.max_tokens = 1024
+        
         self.setup_logging()
 
     def setup_logging(self):
@@ -56,74 +101,221 @@ Ta mission est d'être un véritable partenaire de confiance, comme un collègue
             handler.setFormatter(formatter)
             self.logger.addHandler(handler)
 
-    def prepare_context(self, user_input: str) -> str:
-        """Prépare le contexte pour la réponse en recherchant les informations pertinentes"""
+    def load_knowledge_bases(self) -> TenantRegistry:
+        """Construit la base de connaissances du site par défaut (exécuté hors de la boucle d'événements)"""
+        with STARTUP.phase('deferred_imports'):
+            from knowledge_base import create_knowledge_base
+
+        # Base de connaissances du site par défaut (rechargeable à chaud), avec
+        # son routeur de réponses directes et son cache sémantique de réponses
+        start = time.time()
+        start_time = time.perf_counter()
+        knowledge_base = create_knowledge_base()
+        for phase, duration in knowledge_base.build_times.items():
+            STARTUP.record(phase, duration, start=start)
+            start += duration
+        default_tenant = Tenant(
+            TenantConfig(DEFAULT_TENANT, knowledge_base.data_dir, cache_dir=knowledge_base.cache_dir),
+            knowledge_base,
+            watch_interval=float(os.getenv('KB_WATCH_INTERVAL', '0')),
+            load_time=time.perf_counter() - start_time
+        )
+        
+        # Autres sites clients (TENANTS_FILE), chargés à la demande avec le même modèle
+        with STARTUP.phase('tenants'):
+            return TenantRegistry.from_env(default_tenant)
+
+    async def warmup(self):
+        """Charge les bases de connaissances puis exécute quelques requêtes fictives avant d'être prêt"""
         try:
-            # Recherche d'informations pertinentes
-            relevant_content = self.knowledge_base.search_knowledge(user_input, k=3)
-            
-            # Si la question semble porter sur les contacts
-            contact_keywords = ['contact', 'téléphone', 'email', 'adresse', 'joindre', 'appeler']
-            if any(keyword in user_input.lower() for keyword in contact_keywords):
-                contact_info = self.knowledge_base.get_contact_info()
-                context = "Voici les informations de contact d'IT-Work :\n"
-                if contact_info['phone']:
-                    context += f"Téléphone : {', '.join(contact_info['phone'])}\n"
-                if contact_info['email']:
-                    context += f"Email : {', '.join(contact_info['email'])}\n"
-                if contact_info['address']:
-                    context += f"Adresse : {', '.join(contact_info['address'])}\n"
-                if contact_info['social_media']:
-                    context += "Réseaux sociaux :\n"
-                    for platform, url in contact_info['social_media'].items():
-                        context += f"- {platform.capitalize()} : {url}\n"
-                return context
-
-            # Formater les résultats de recherche
-            return self.knowledge_base.format_knowledge_response(relevant_content)
+            loop = asyncio.get_event_loop()
+            self.tenants = await loop.run_in_executor(None, self.load_knowledge_bases)
+            self.knowledge_base_manager.start_watching()
+        except Exception as e:
+            self.startup_error = str(e)
+            self.logger.error(f"Erreur lors du chargement de la base de connaissances : {str(e)}")
+            return
+
+        # Premières inférences du modèle, pages de l'index et caches : hors du chemin des visiteurs
+        if self.warmup_queries:
+            with STARTUP.phase('warmup_queries'):
+                try:
+                    await asyncio.gather(*(
+                        self.embedding_batcher.search(self.knowledge_base, query, k=3)
+                        for query in self.warmup_queries
+                    ))
+                except Exception as e:
+                    self.logger.warning(f"Préchauffage incomplet : {str(e)}")
+
+        self.ready = True
+        STARTUP.mark_ready()
+
+    async def get_tenant(self, tenant_name: str = DEFAULT_TENANT) -> Tenant:
+        """Site client demandé (NotReady tant que le préchauffage n'est pas terminé)"""
+        if not self.ready:
+            raise NotReady("Base de connaissances en cours de chargement")
+        return await self.tenants.get(tenant_name)
+
+    @property
+    def knowledge_base(self) -> "KnowledgeBase":
+        """Instantané actif de la base de connaissances du site par défaut"""
+        return self.tenants.default.knowledge_base
+
+    @property
+    def knowledge_base_manager(self) -> KnowledgeBaseManager:
+        return self.tenants.default.knowledge_base_manager
+
+    @property
+    def intent_router(self) -> IntentRouter:
+        return self.tenants.default.intent_router
+
+    @property
+    def response_cache(self) -> SemanticResponseCache:
+        return self.tenants.default.response_cache
+
+    def is_contact_question(self, tenant: Tenant, user_input: str) -> bool:
+        """Indique si la question semble porter sur les contacts"""
+        return tenant.intent_router.match(user_input).contact
+
+    async def retrieve(self, tenant: Tenant, user_input: str) -> Tuple[Optional[List[Dict]], Optional[np.ndarray]]:
+        """Recherche les documents pertinents et l'embedding de la requête (rien pour les questions de contact)"""
+        if self.is_contact_question(tenant, user_input):
+            return None, None
+        try:
+            # Encodage par lot hors de la boucle d'événements
+            with span('retrieve'):
+                return await self.embedding_batcher.search(tenant.knowledge_base, user_input, k=3)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la recherche : {str(e)}")
+            return [], None
+
+    def prepare_context(self, tenant: Tenant) -> str:
+        """Contexte des questions de contact : coordonnées du site"""
+        try:
+            contact_info = tenant.knowledge_base.get_contact_info()
+            context = "Voici les informations de contact de l'entreprise :\n"
+            if contact_info['phone']:
+                context += f"Téléphone : {', '.join(contact_info['phone'])}\n"
+            if contact_info['email']:
+                context += f"Email : {', '.join(contact_info['email'])}\n"
+            if contact_info['address']:
+                context += f"Adresse : {', '.join(contact_info['address'])}\n"
+            if contact_info['social_media']:
+                context += "Réseaux sociaux :\n"
+                for platform, url in contact_info['social_media'].items():
+                    context += f"- {platform.capitalize()} : {url}\n"
+            return context
 
         except Exception as e:
             self.logger.error(f"Erreur lors de la préparation du contexte : {str(e)}")
             return ""
 
-    def add_to_history(self, role: str, content: str):
-        """Ajoute un message à l'historique des conversations"""
-        self.conversation_history.append({
+    async def cache_scope(self, tenant: Tenant, session_id: str, relevant_content: Optional[List[Dict]],
+                          query_vector: Optional[np.ndarray]) -> Optional[Tuple[str, ...]]:
+        """
+        Portée du cache de réponses : les URLs des documents retrouvés.
+
+        Seules les premières questions d'une session sont mises en cache, la
+        réponse ne dépendant alors que de la question et du contexte.
+        """
+        if query_vector is None or not tenant.response_cache.enabled or await self.get_history(session_id):
+            return None
+        tenant.response_cache.check_version(tenant.knowledge_base.index_version)
+        return tuple(sorted({item['url'] for item in relevant_content or []}))
+
+    async def get_history(self, session_id: str = DEFAULT_SESSION_ID) -> List[Dict]:
+        """Retourne l'historique des conversations de la session"""
+        return await self.sessions.get(session_id)
+
+    async def add_to_history(self, role: str, content: str, session_id: str = DEFAULT_SESSION_ID):
+        """Ajoute un message à l'historique des conversations de la session"""
+        conversation_history = await self.sessions.get(session_id)
+        conversation_history.append({
             'role': role,
             'content': content,
             'timestamp': datetime.now().isoformat()
         })
         
         # Garder uniquement les derniers messages
-        if len(self.conversation_history) > self.max_history * 2:  # *2 car on compte les paires Q/R
-            self.conversation_history = self.conversation_history[-self.max_history * 2:]
-
-    def format_conversation_history(self) -> List[Dict[str, str]]:
-        """Formate l'historique de conversation pour l'API Groq"""
-        formatted_history = []
-        for msg in self.conversation_history:
-            formatted_history.append({
-                'role': msg['role'],
-                'content': msg['content']
-            })
-        return formatted_history
-
-    def clear_history(self):
-        """Efface l'historique des conversations"""
-        self.conversation_history = []
+        if len(conversation_history) > self.max_history * 2:  # *2 car on compte les paires Q/R
+            conversation_history = conversation_history[-self.max_history * 2:]
+        
+        await self.sessions.save(session_id, conversation_history)
+
+    async def remove_last_question(self, user_input: str, session_id: str = DEFAULT_SESSION_ID):
+        """Retire de l'historique une question restée sans réponse"""
+        conversation_history = await self.sessions.get(session_id)
+        if conversation_history and conversation_history[-1]['role'] == 'user' \
+                and conversation_history[-1]['content'] == user_input:
+            await self.sessions.save(session_id, conversation_history[:-1])
+
+    async def clear_history(self, session_id: str = DEFAULT_SESSION_ID, tenant_name: str = DEFAULT_TENANT):
+        """Efface l'historique des conversations de la session"""
+        session_id = TenantRegistry.session_key(tenant_name, session_id)
+        await self.sessions.delete(session_id)
+        self.prompt_builder.forget(session_id)
         self.logger.info("Historique des conversations effacé")
 
-    async def get_response(self, user_input: str) -> str:
-        """Génère une réponse à l'entrée utilisateur"""
-        try:
-            # Préparation du contexte
-            context = self.prepare_context(user_input)
-            
-            # Détection des besoins
-            detected_needs = self.knowledge_base.detect_needs(user_input)
-            
-            # Construction du prompt avec contexte masqué
-            prompt = f"""Question de l'utilisateur : {user_input}
+    async def serve_from_router(self, tenant: Tenant, user_input: str, session_id: str) -> Optional[str]:
+        """Retourne la réponse directe d'une question simple et l'ajoute à l'historique"""
+        response = tenant.intent_router.route(user_input)
+        if response is not None:
+            await self.add_to_history('user', user_input, session_id)
+            await self.add_to_history('assistant', response, session_id)
+        return response
+
+    async def serve_from_cache(self, tenant: Tenant, user_input: str, session_id: str,
+                               query_vector: Optional[np.ndarray], scope: Optional[Tuple[str, ...]]) -> Optional[str]:
+        """Retourne la réponse en cache d'une question similaire et l'ajoute à l'historique"""
+        if scope is None:
+            return None
+        cached = tenant.response_cache.lookup(query_vector, scope)
+        if cached is not None:
+            await self.add_to_history('user', user_input, session_id)
+            await self.add_to_history('assistant', cached, session_id)
+        return cached
+
+    async def build_messages(self, tenant: Tenant, user_input: str, session_id: str = DEFAULT_SESSION_ID,
+                             relevant_content: Optional[List[Dict]] = None) -> List[Dict[str, str]]:
+        """Construit les messages envoyés à l'API Groq et ajoute la question à l'historique"""
+        knowledge_base = tenant.knowledge_base
+        
+        # Contexte : coordonnées pour les questions de contact, sinon passages retrouvés
+        extra_context = ""
+        snippets = None
+        if self.is_contact_question(tenant, user_input):
+            extra_context = self.prepare_context(tenant)
+        else:
+            if relevant_content is None:
+                relevant_content, _ = await self.retrieve(tenant, user_input)
+            snippets = relevant_content or []
+        
+        # Détection des besoins : pages du site à proposer
+        urls_map = knowledge_base.urls_map
+        detected_needs = [need for need in tenant.intent_router.match(user_input).needs if need in urls_map]
+        if detected_needs:
+            extra_context += "\n\nPages du site en rapport avec la demande :\n"
+            extra_context += "\n".join(f"- {need} : {urls_map[need]}" for need in detected_needs)
+        
+        # Assemblage dans le budget de tokens : extraits, résumé et derniers échanges
+        with span('build_prompt'):
+            messages = self.prompt_builder.build(
+                tenant.config.system_prompt or self.system_prompt,
+                await self.get_history(session_id),
+                lambda context: self.render_prompt(user_input, context),
+                snippets=snippets,
+                format_context=knowledge_base.format_knowledge_response,
+                extra_context=extra_context.strip(),
+                session_id=session_id
+            )
+
+        # Ajout du message utilisateur à l'historique
+        await self.add_to_history('user', user_input, session_id)
+        return messages
+
+    def render_prompt(self, user_input: str, context: str) -> str:
+        """Message utilisateur envoyé au LLM, avec le contexte masqué"""
+        return f"""Question de l'utilisateur : {user_input}
 
 Information contexte :
 {context}
@@ -134,32 +326,155 @@ Instructions spéciales :
 - Reste décontracté et amical dans ta réponse
 - Concentre-toi sur l'aide concrète plutôt que sur les détails techniques"""
 
-            # Ajout du message utilisateur à l'historique
-            self.add_to_history('user', user_input)
+    def error_message(self, error: Exception) -> str:
+        """Message affiché à l'utilisateur selon le type d'erreur"""
+        if isinstance(error, groq.RateLimitError):
+            return "Je suis très sollicité en ce moment, pouvez-vous réessayer dans quelques instants ?"
+        if isinstance(error, (LLMDeadlineExceeded, groq.APITimeoutError)):
+            return "Désolé, la réponse prend plus de temps que prévu. On peut réessayer ?"
+        return "Désolé, j'ai un petit souci technique. On peut réessayer ?"
 
-            # Appel à l'API Groq dans une coroutine séparée
-            loop = asyncio.get_event_loop()
-            chat_completion = await loop.run_in_executor(
-                None,
-                lambda: self.groq_client.chat.completions.create(
-                    messages=[
-                        {"role": "system", "content": self.system_prompt},
-                        *self.format_conversation_history(),
-                        {"role": "user", "content": prompt}
-                    ],
-                    model="mixtral-8x7b-32768",
-                    temperature=0.8,  # Légèrement augmenté pour plus de naturel
-                    max_tokens=1024
-                )
+    async def get_response(self, user_input: str, session_id: str = DEFAULT_SESSION_ID,
+                           tenant_name: str = DEFAULT_TENANT) -> str:
+        """Génère une réponse à l'entrée utilisateur (UnknownTenant si le site n'est pas configuré, NotReady au démarrage)"""
+        with self.profiler.profile('chat'):
+            tenant = await self.get_tenant(tenant_name)
+            session_id = TenantRegistry.session_key(tenant_name, session_id)
+            # Les tours d'une même session sont traités l'un après l'autre
+            async with self.sessions.lock(session_id):
+                return await self._get_response(tenant, user_input, session_id)
+
+    async def _get_response(self, tenant: Tenant, user_input: str, session_id: str) -> str:
+        try:
+            start_time = time.perf_counter()
+            
+            # Question simple : réponse directe sans appel au LLM
+            direct = await self.serve_from_router(tenant, user_input, session_id)
+            if direct is not None:
+                self.logger.info(f"Réponse directe en {1e6 * (time.perf_counter() - start_time):.0f}µs")
+                RESPONSES.inc(source='router')
+                return direct
+
+            relevant_content, query_vector = await self.retrieve(tenant, user_input)
+
+            # Réponse déjà générée pour une question similaire
+            scope = await self.cache_scope(tenant, session_id, relevant_content, query_vector)
+            cached = await self.serve_from_cache(tenant, user_input, session_id, query_vector, scope)
+            if cached is not None:
+                self.logger.info(f"Réponse servie depuis le cache en {time.perf_counter() - start_time:.3f}s")
+                RESPONSES.inc(source='cache')
+                return cached
+
+            # Les conversations en cours passent avant les nouvelles en cas d'affluence
+            priority = PRIORITY_FOLLOW_UP if await self.get_history(session_id) else PRIORITY_NEW
+            messages = await self.build_messages(tenant, user_input, session_id, relevant_content)
+
+            # Appel asynchrone à l'API Groq
+            chat_completion = await self.llm.complete(
+                messages,
+                priority=priority,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
             )
 
             # Récupération de la réponse
             response = chat_completion.choices[0].message.content
+            self.logger.info(f"Réponse générée en {time.perf_counter() - start_time:.2f}s")
+            RESPONSES.inc(source='llm')
 
             # Ajout de la réponse à l'historique
-            self.add_to_history('assistant', response)
+            await self.add_to_history('assistant', response, session_id)
+            if scope is not None:
+                tenant.response_cache.store(query_vector, scope, response)
             return response
 
+        except Overloaded:
+            # Refus immédiat (503 et Retry-After) : la question sera reposée par le client
+            RESPONSES.inc(source='shed')
+            await self.remove_last_question(user_input, session_id)
+            raise
         except Exception as e:
             self.logger.error(f"Erreur lors de la génération de la réponse : {str(e)}")
-            return "Désolé, j'ai un petit souci technique. On peut réessayer ?"
+            RESPONSES.inc(source='error')
+            # Le message d'erreur n'est pas un tour de conversation : la question est retirée
+            await self.remove_last_question(user_input, session_id)
+            return self.error_message(e)
+
+    async def stream_response(self, user_input: str, session_id: str = DEFAULT_SESSION_ID,
+                              tenant_name: str = DEFAULT_TENANT) -> AsyncIterator[str]:
+        """Génère une réponse token par token à partir du flux de l'API Groq"""
+        with self.profiler.profile('chat_stream'):
+            tenant = await self.get_tenant(tenant_name)
+            session_id = TenantRegistry.session_key(tenant_name, session_id)
+            async with self.sessions.lock(session_id):
+                async for delta in self._stream_response(tenant, user_input, session_id):
+                    yield delta
+
+    async def _stream_response(self, tenant: Tenant, user_input: str, session_id: str) -> AsyncIterator[str]:
+        start_time = time.perf_counter()
+        first_token_time = None
+        response_parts = []
+        scope = None
+        try:
+            # Question simple : réponse directe sans appel au LLM
+            direct = await self.serve_from_router(tenant, user_input, session_id)
+            if direct is not None:
+                self.logger.info(f"Réponse directe en {1e6 * (time.perf_counter() - start_time):.0f}µs")
+                RESPONSES.inc(source='router')
+                yield direct
+                return
+
+            relevant_content, query_vector = await self.retrieve(tenant, user_input)
+
+            # Réponse déjà générée pour une question similaire
+            scope = await self.cache_scope(tenant, session_id, relevant_content, query_vector)
+            cached = await self.serve_from_cache(tenant, user_input, session_id, query_vector, scope)
+            if cached is not None:
+                self.logger.info(f"Réponse servie depuis le cache en {time.perf_counter() - start_time:.3f}s")
+                RESPONSES.inc(source='cache')
+                yield cached
+                return
+
+            # Les conversations en cours passent avant les nouvelles en cas d'affluence
+            priority = PRIORITY_FOLLOW_UP if await self.get_history(session_id) else PRIORITY_NEW
+            messages = await self.build_messages(tenant, user_input, session_id, relevant_content)
+
+            async for delta in self.llm.stream(
+                messages,
+                priority=priority,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            ):
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                response_parts.append(delta)
+                yield delta
+            RESPONSES.inc(source='llm')
+
+        except Overloaded:
+            # Levée avant le premier fragment : l'application répond 503
+            RESPONSES.inc(source='shed')
+            await self.remove_last_question(user_input, session_id)
+            raise
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la génération de la réponse en streaming : {str(e)}")
+            RESPONSES.inc(source='error')
+            scope = None
+            if not response_parts:
+                # Comme pour /chat : message d'erreur affiché mais absent de l'historique
+                await self.remove_last_question(user_input, session_id)
+                yield self.error_message(e)
+                return
+
+        total_time = time.perf_counter() - start_time
+        if first_token_time is not None:
+            self.logger.info(
+                f"Réponse en streaming : premier token en {first_token_time - start_time:.2f}s, "
+                f"total {total_time:.2f}s"
+            )
+
+        # Ajout de la réponse complète à l'historique
+        response = ''.join(response_parts)
+        await self.add_to_history('assistant', response, session_id)
+        if scope is not None:
+            tenant.response_cache.store(query_vector, scope, response)
@@ -0,0 +1,144 @@
+import os
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List
+
+# Balises qui ouvrent une nouvelle section de la page
+SECTION_TAGS = {'h1', 'h2', 'h3'}
+
+class PassageChunker:
+    """
+    Découpe les pages scrapées en passages courts qui se chevauchent.
+
+    Les blocs de `main_content` répétés sur de nombreuses pages (menus,
+    en-tête téléphone/adresse, pied de page) sont écartés, ainsi que les
+    doublons à l'intérieur d'une même page. Les passages suivent la
+    structure de la page (un titre h1-h3 ouvre un nouveau passage) et restent
+    sous la limite de tokens du modèle d'embedding.
+    """
+
+    def __init__(self, max_words: int = 80, overlap_words: int = 20,
+                 boilerplate_ratio: float = 0.3, min_boilerplate_pages: int = 3):
+        self.setup_logging()
+        self.max_words = max_words
+        self.overlap_words = min(overlap_words, max_words // 2)
+        self.boilerplate_ratio = boilerplate_ratio
+        self.min_boilerplate_pages = min_boilerplate_pages
+        self.boilerplate = set()
+
+    @classmethod
+    def from_env(cls) -> "PassageChunker":
+        """Crée le découpeur à partir des variables d'environnement"""
+        return cls(
+            max_words=int(os.getenv('CHUNK_MAX_WORDS', '80')),
+            overlap_words=int(os.getenv('CHUNK_OVERLAP_WORDS', '20')),
+            boilerplate_ratio=float(os.getenv('CHUNK_BOILERPLATE_RATIO', '0.3'))
+        )
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('PassageChunker')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalise les espaces d'un bloc de texte"""
+        return ' '.join(text.split())
+
+    @staticmethod
+    def _blocks(page: Dict) -> List[Dict]:
+        return [item for item in page.get('main_content') or [] if isinstance(item, dict)]
+
+    def fit(self, pages: Iterable[Dict]):
+        """Repère les blocs répétés sur de nombreuses pages du corpus (parcouru une seule fois)"""
+        frequencies = Counter()
+        page_count = 0
+        for page in pages:
+            page_count += 1
+            frequencies.update({self.normalize(item.get('content', '')) for item in self._blocks(page)})
+
+        threshold = max(self.min_boilerplate_pages, self.boilerplate_ratio * page_count)
+        self.boilerplate = {text for text, count in frequencies.items() if text and count >= threshold}
+        self.logger.info(f"{len(self.boilerplate)} blocs répétés écartés du corpus ({page_count} pages)")
+
+    def clean_blocks(self, page: Dict) -> List[Dict]:
+        """Retourne les blocs utiles de la page, sans contenu répété ni doublon"""
+        blocks = []
+        seen = set()
+        for item in self._blocks(page):
+            text = self.normalize(item.get('content', ''))
+            if not text or text in self.boilerplate or text in seen:
+                continue
+            seen.add(text)
+            blocks.append({'type': item.get('type', ''), 'content': text})
+        return blocks
+
+    def _split_long(self, words: List[str], max_words: int) -> List[List[str]]:
+        # Fenêtres glissantes pour un bloc plus long qu'un passage
+        step = max_words - self.overlap_words
+        return [words[i:i + max_words] for i in range(0, max(1, len(words) - self.overlap_words), step)]
+
+    def chunk_page(self, page: Dict) -> List[Dict]:
+        """Découpe une page en passages rattachés à l'URL de la page"""
+        title = page.get('title', '')
+        prefix = f"{title} : " if title else ''
+        passages_words = []
+
+        # Le titre est répété en tête de chaque passage et compte dans sa taille
+        max_words = max(2 * self.overlap_words, self.max_words - len(prefix.split()))
+
+        # La meta description forme un passage à part entière
+        if page.get('meta_description'):
+            passages_words.append(self.normalize(page['meta_description']).split())
+
+        current = []
+        new_words = 0  # Mots du passage courant hors chevauchement
+        has_text = False  # Le passage courant contient autre chose que des titres
+        for block in self.clean_blocks(page):
+            words = block['content'].split()
+            is_section = block['type'] in SECTION_TAGS
+
+            # Un titre de section ouvre un nouveau passage (sans chevauchement)
+            if is_section and has_text:
+                passages_words.append(current)
+                current, new_words, has_text = [], 0, False
+
+            if len(words) > max_words:
+                if new_words:
+                    passages_words.append(current)
+                windows = self._split_long(words, max_words)
+                passages_words.extend(windows)
+                current, new_words, has_text = list(windows[-1][len(windows[-1]) - self.overlap_words:]), 0, False
+                continue
+
+            if len(current) + len(words) > max_words and new_words:
+                passages_words.append(current)
+                # Chevauchement : la fin du passage précédent ouvre le suivant
+                current, new_words, has_text = current[len(current) - self.overlap_words:], 0, False
+            if len(current) + len(words) > max_words:
+                # Chevauchement réduit pour rester sous la taille maximale
+                current = current[len(current) + len(words) - max_words:]
+            current.extend(words)
+            new_words += len(words)
+            has_text = has_text or not is_section
+
+        if new_words:
+            passages_words.append(current)
+
+        passages = []
+        for i, words in enumerate(passages_words):
+            if not words:
+                continue
+            text = ' '.join(words)
+            passages.append({
+                'content': prefix + text,  # Texte encodé (avec le titre de la page)
+                'text': text,              # Texte du passage seul, pour le prompt
+                'url': page['url'],
+                'title': title,
+                'passage_id': i
+            })
+        return passages
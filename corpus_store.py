@@ -0,0 +1,315 @@
+"""
+Corpus des pages scrapées dans un fichier SQLite unique.
+
+Remplace les fichiers JSON indentés écrits pour chaque page : les pages
+sont écrites une à une pendant le crawl, les liens (souvent identiques
+d'une page à l'autre : menus, pied de page) ne sont stockés qu'une fois, et
+le corps des pages est compressé et n'est lu qu'à la demande.
+
+Migration d'une arborescence JSON existante :
+    python corpus_store.py migrate --data-dir scraped_data
+"""
+import os
+import json
+import zlib
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Dict, Iterator, List, Optional
+
+CORPUS_FILE = 'corpus.db'
+
+# Champs stockés en colonnes ; le reste de la page forme le corps compressé
+PAGE_FIELDS = ('url', 'title', 'meta_description', 'contact_info', 'links', 'timestamp')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL DEFAULT '',
+    meta_description TEXT NOT NULL DEFAULT '',
+    contact_info BLOB,
+    timestamp TEXT,
+    body BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE (url, text)
+);
+CREATE TABLE IF NOT EXISTS page_links (
+    page_id INTEGER NOT NULL REFERENCES pages(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    link_id INTEGER NOT NULL REFERENCES links(id),
+    PRIMARY KEY (page_id, position)
+) WITHOUT ROWID;
+"""
+
+def corpus_path(data_dir: str = 'scraped_data') -> str:
+    return os.path.join(data_dir, CORPUS_FILE)
+
+class CorpusStore:
+    """
+    Pages scrapées (une ligne par URL) et liens dédupliqués.
+
+    L'identifiant d'une page est conservé quand elle est réécrite ; les
+    passages de la base de connaissances y font référence pour retrouver
+    liens et coordonnées sans les garder en mémoire. Le mode WAL permet au
+    chatbot de lire pendant qu'un crawl écrit.
+    """
+
+    def __init__(self, path: str, readonly: bool = False):
+        self.setup_logging()
+        self.path = path
+        self.readonly = readonly
+        if readonly:
+            self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.executescript(SCHEMA)
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        # Connexion partagée entre les threads de recherche
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, data_dir: str = 'scraped_data', readonly: bool = True) -> Optional["CorpusStore"]:
+        """Ouvre le corpus de `data_dir`, None s'il n'existe pas encore"""
+        path = corpus_path(data_dir)
+        if readonly and not os.path.exists(path):
+            return None
+        return cls(path, readonly=readonly)
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('CorpusStore')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @staticmethod
+    def _pack(value) -> bytes:
+        return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    @staticmethod
+    def _unpack(data: Optional[bytes]):
+        return json.loads(zlib.decompress(data).decode('utf-8')) if data else {}
+
+    def _pack_body(self, content: Dict) -> bytes:
+        return self._pack({key: value for key, value in content.items() if key not in PAGE_FIELDS})
+
+    def _link_ids(self, links: List[Dict]) -> List[int]:
+        ids = []
+        for link in links:
+            key = (link.get('url', ''), link.get('text', ''))
+            self.connection.execute('INSERT OR IGNORE INTO links (url, text) VALUES (?, ?)', key)
+            row = self.connection.execute('SELECT id FROM links WHERE url = ? AND text = ?', key).fetchone()
+            ids.append(row[0])
+        return ids
+
+    def put(self, content: Dict, commit: bool = True) -> int:
+        """Écrit (ou remplace) une page et retourne son identifiant"""
+        with self._lock:
+            contact_info = content.get('contact_info')
+            self.connection.execute(
+                """INSERT INTO pages (url, title, meta_description, contact_info, timestamp, body)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(url) DO UPDATE SET
+                       title = excluded.title, meta_description = excluded.meta_description,
+                       contact_info = excluded.contact_info, timestamp = excluded.timestamp,
+                       body = excluded.body""",
+                (
+                    content['url'],
+                    content.get('title') or '',
+                    content.get('meta_description') or '',
+                    self._pack(contact_info) if contact_info else None,
+                    content.get('timestamp'),
+                    self._pack_body(content)
+                )
+            )
+            page_id = self.connection.execute('SELECT id FROM pages WHERE url = ?', (content['url'],)).fetchone()[0]
+            self.connection.execute('DELETE FROM page_links WHERE page_id = ?', (page_id,))
+            self.connection.executemany(
+                'INSERT INTO page_links (page_id, position, link_id) VALUES (?, ?, ?)',
+                [(page_id, position, link_id) for position, link_id in enumerate(self._link_ids(content.get('links') or []))]
+            )
+            if commit:
+                self.connection.commit()
+            return page_id
+
+    def commit(self):
+        with self._lock:
+            self.connection.commit()
+
+    def remove(self, url: str) -> bool:
+        """Supprime une page ; retourne False si elle n'existait pas"""
+        with self._lock:
+            cursor = self.connection.execute('DELETE FROM pages WHERE url = ?', (url,))
+            self.connection.commit()
+            return cursor.rowcount > 0
+
+    def contains(self, url: str) -> bool:
+        with self._lock:
+            return self.connection.execute('SELECT 1 FROM pages WHERE url = ?', (url,)).fetchone() is not None
+
+    def page_id(self, url: str) -> Optional[int]:
+        with self._lock:
+            row = self.connection.execute('SELECT id FROM pages WHERE url = ?', (url,)).fetchone()
+        return row[0] if row else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def links(self, page_id: int) -> List[Dict]:
+        """Liens d'une page, dans leur ordre d'origine"""
+        with self._lock:
+            rows = self.connection.execute(
+                """SELECT links.url, links.text FROM page_links
+                   JOIN links ON links.id = page_links.link_id
+                   WHERE page_links.page_id = ? ORDER BY page_links.position""",
+                (page_id,)
+            ).fetchall()
+        return [{'url': url, 'text': text} for url, text in rows]
+
+    def contact_info(self, page_id: int) -> Dict:
+        with self._lock:
+            row = self.connection.execute('SELECT contact_info FROM pages WHERE id = ?', (page_id,)).fetchone()
+        return self._unpack(row[0]) if row else {}
+
+    def body(self, page_id: int) -> Optional[Dict]:
+        """Corps de la page (contenu principal, en-têtes), lu à la demande"""
+        with self._lock:
+            row = self.connection.execute('SELECT body FROM pages WHERE id = ?', (page_id,)).fetchone()
+        return self._unpack(row[0]) if row else None
+
+    def _page(self, row, links: bool) -> Dict:
+        page_id, url, title, meta_description, contact_info, timestamp, body = row
+        page = {
+            'id': page_id,
+            'url': url,
+            'title': title,
+            'meta_description': meta_description,
+            'contact_info': self._unpack(contact_info),
+            'timestamp': timestamp
+        }
+        page.update(self._unpack(body))
+        if links:
+            page['links'] = self.links(page_id)
+        return page
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Page complète (liens compris), au format écrit par le scraper"""
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT id, url, title, meta_description, contact_info, timestamp, body FROM pages WHERE url = ?',
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        page = self._page(row, links=True)
+        del page['id']
+        return page
+
+    def iter_pages(self, links: bool = False, batch_size: int = 64) -> Iterator[Dict]:
+        """Parcourt les pages une à une (avec leur identifiant `id`), sans tout charger en mémoire"""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self.connection.execute(
+                    """SELECT id, url, title, meta_description, contact_info, timestamp, body
+                       FROM pages WHERE id > ? ORDER BY id LIMIT ?""",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._page(row, links)
+            last_id = rows[-1][0]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            pages = self.connection.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+            links = self.connection.execute('SELECT COUNT(*) FROM links').fetchone()[0]
+            references = self.connection.execute('SELECT COUNT(*) FROM page_links').fetchone()[0]
+        return {
+            'pages': pages,
+            'distinct_links': links,
+            'link_references': references,
+            'size_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+    def checkpoint(self):
+        """Intègre le journal WAL au fichier principal (fin de crawl)"""
+        with self._lock:
+            self.connection.commit()
+            self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        if not self.readonly:
+            self.checkpoint()
+        with self._lock:
+            self.connection.close()
+
+def iter_json_pages(data_dir: str) -> Iterator[Dict]:
+    """Pages JSON de l'arborescence (sous-dossiers compris), hors fichiers annexes"""
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith('.json') or name.startswith('crawl_'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                logging.getLogger('CorpusStore').error(f"Erreur lors du chargement de {path}: {str(e)}")
+                continue
+            # Fichiers annexes (ex. contact_info.json) sans page associée
+            if isinstance(data, dict) and 'url' in data:
+                yield data
+
+def migrate_json_tree(data_dir: str, store: CorpusStore) -> Dict:
+    """
+    Importe une arborescence de pages JSON dans le corpus.
+    Une URL présente dans plusieurs fichiers (copies horodatées des
+    sous-dossiers) est importée dans sa version la plus récente.
+    """
+    latest = {}
+    files = 0
+    for page in iter_json_pages(data_dir):
+        files += 1
+        current = latest.get(page['url'])
+        if current is None or (page.get('timestamp') or '') >= (current.get('timestamp') or ''):
+            latest[page['url']] = page
+
+    for page in latest.values():
+        store.put(page, commit=False)
+    store.commit()
+    return {'files': files, 'pages': len(latest), **store.get_stats()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Corpus SQLite des pages scrapées")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help="Importe les pages JSON (sous-dossiers compris)")
+    migrate_parser.add_argument('--data-dir', default='scraped_data')
+    migrate_parser.add_argument('--output', default=None, help=f"Fichier du corpus (défaut : <data-dir>/{CORPUS_FILE})")
+    subparsers.add_parser('stats', help="Statistiques du corpus").add_argument('--data-dir', default='scraped_data')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        store = CorpusStore(args.output or corpus_path(args.data_dir))
+        stats = migrate_json_tree(args.data_dir, store)
+        store.close()
+        print(f"{stats['files']} fichiers JSON, {stats['pages']} pages importées, "
+              f"{stats['distinct_links']} liens distincts pour {stats['link_references']} références, "
+              f"{os.path.getsize(store.path) / 1024:.0f} Ko")
+    else:
+        store = CorpusStore.open(args.data_dir)
+        print(json.dumps(store.get_stats() if store else {}, indent=2))
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_url(url: str) -> str:
+    """
+    Forme canonique d'une URL à récupérer : fragment supprimé, schéma et hôte
+    en minuscules, port par défaut retiré, paramètres de requête triés.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+def url_key(url: str) -> str:
+    """Clé de déduplication : `/cloud` et `/cloud/` désignent la même page"""
+    normalized = normalize_url(url)
+    parts = urlsplit(normalized)
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme, parts.netloc, path, parts.query, ''))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frontier_status ON frontier (status, seq);
+CREATE TABLE IF NOT EXISTS crawl_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    started_at TEXT NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT '{}'
+);
+"""
+
+class CrawlFrontier:
+    """
+    File d'URLs à crawler et URLs déjà vues, persistées dans SQLite.
+
+    Chaque URL est identifiée par sa forme normalisée (`url_key`) et passe
+    par les états queued -> in_progress -> done / failed / gone. Les
+    écritures sont validées par points de contrôle périodiques (toutes les
+    `checkpoint_pages` pages ou `checkpoint_interval` secondes) : après un
+    arrêt brutal, `--resume` reprend au dernier point de contrôle, les pages
+    en cours étant simplement récupérées à nouveau.
+    """
+
+    def __init__(self, path: str, checkpoint_pages: int = 25, checkpoint_interval: float = 10.0):
+        self.setup_logging()
+        self.path = path
+        self.checkpoint_pages = checkpoint_pages
+        self.checkpoint_interval = checkpoint_interval
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+        self.pending_writes = 0
+        self.last_checkpoint = time.monotonic()
+        self.checkpoints = 0
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('CrawlFrontier')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    def resumable(self) -> bool:
+        """Vrai si un crawl précédent s'est arrêté avant la fin"""
+        row = self.connection.execute('SELECT finished FROM crawl_state WHERE id = 1').fetchone()
+        return row is not None and not row[0]
+
+    def start(self, seeds: List[str], resume: bool = False) -> bool:
+        """
+        Prépare la file : reprise du crawl interrompu si `resume`, sinon
+        nouvelle file contenant les URLs de départ. Retourne True en cas de reprise.
+        """
+        if resume and self.resumable():
+            # Pages en cours ou en erreur au moment de l'arrêt : à récupérer de nouveau
+            self.connection.execute(
+                "UPDATE frontier SET status = 'queued' WHERE status IN ('in_progress', 'failed')"
+            )
+            self.connection.commit()
+            counts = self.counts()
+            self.logger.info(f"Reprise du crawl : {counts.get('queued', 0)} URLs en file, "
+                             f"{counts.get('done', 0)} déjà traitées")
+            return True
+
+        if resume:
+            self.logger.info("Aucun crawl interrompu à reprendre, nouveau crawl")
+        self.connection.execute('DELETE FROM frontier')
+        self.connection.execute('DELETE FROM crawl_state')
+        self.connection.execute(
+            'INSERT INTO crawl_state (id, started_at) VALUES (1, ?)', (datetime.now().isoformat(),)
+        )
+        for url in seeds:
+            self.add(url, 0)
+        self.connection.commit()
+        return False
+
+    def add(self, url: str, depth: int) -> Optional[str]:
+        """Ajoute une URL à la file ; retourne sa forme normalisée, ou None si elle est déjà connue"""
+        normalized = normalize_url(url)
+        cursor = self.connection.execute(
+            'INSERT OR IGNORE INTO frontier (key, url, depth, updated_at) VALUES (?, ?, ?, ?)',
+            (url_key(normalized), normalized, depth, time.time())
+        )
+        if cursor.rowcount:
+            self.pending_writes += 1
+            return normalized
+        return None
+
+    def pop(self) -> Optional[Tuple[str, int]]:
+        """Prochaine URL en file (ordre d'ajout : parcours en largeur), marquée en cours"""
+        row = self.connection.execute(
+            "SELECT seq, url, depth FROM frontier WHERE status = 'queued' ORDER BY seq LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        self.connection.execute(
+            "UPDATE frontier SET status = 'in_progress', updated_at = ? WHERE seq = ?", (time.time(), row[0])
+        )
+        return row[1], row[2]
+
+    def pending(self) -> List[Tuple[str, int]]:
+        """URLs en file, marquées en cours (mode asynchrone : la file est chargée d'un coup)"""
+        rows = self.connection.execute(
+            "SELECT url, depth FROM frontier WHERE status = 'queued' ORDER BY seq"
+        ).fetchall()
+        self.connection.execute(
+            "UPDATE frontier SET status = 'in_progress', updated_at = ? WHERE status = 'queued'", (time.time(),)
+        )
+        return [(url, depth) for url, depth in rows]
+
+    def mark(self, url: str, status: str):
+        """Enregistre le résultat d'une URL (done, failed ou gone)"""
+        self.connection.execute(
+            'UPDATE frontier SET status = ?, updated_at = ? WHERE key = ?', (status, time.time(), url_key(url))
+        )
+        self.pending_writes += 1
+
+    def urls(self, status: str) -> Set[str]:
+        return {row[0] for row in self.connection.execute('SELECT url FROM frontier WHERE status = ?', (status,))}
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.connection.execute('SELECT status, COUNT(*) FROM frontier GROUP BY status').fetchall())
+
+    def load_state(self) -> Dict:
+        row = self.connection.execute('SELECT state FROM crawl_state WHERE id = 1').fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def checkpoint_due(self) -> bool:
+        return bool(self.pending_writes) and (
+            self.pending_writes >= self.checkpoint_pages
+            or time.monotonic() - self.last_checkpoint >= self.checkpoint_interval
+        )
+
+    def checkpoint(self, state: Optional[Dict] = None):
+        """Valide les écritures en attente, avec l'état du crawl à restaurer en cas de reprise"""
+        if state is not None:
+            self.connection.execute(
+                'UPDATE crawl_state SET state = ? WHERE id = 1', (json.dumps(state, ensure_ascii=False),)
+            )
+        self.connection.commit()
+        self.pending_writes = 0
+        self.last_checkpoint = time.monotonic()
+        self.checkpoints += 1
+
+    def finish(self):
+        """Marque le crawl comme terminé : un prochain --resume repartira de zéro"""
+        self.connection.execute('UPDATE crawl_state SET finished = 1 WHERE id = 1')
+        self.checkpoint()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,160 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+class CrawlManifest:
+    """
+    Manifeste du crawl : ETag, Last-Modified et hash du contenu de chaque URL.
+
+    Permet d'envoyer des requêtes conditionnelles (If-None-Match /
+    If-Modified-Since) et de ne réécrire que les pages qui ont changé.
+    Le contenu enregistré est lu dans le corpus SQLite (`store`) ou, à
+    défaut, dans le fichier JSON de chaque page.
+    """
+
+    def __init__(self, data_dir: str = 'scraped_data', filename: str = 'crawl_manifest.json', store=None):
+        self.setup_logging()
+        self.path = os.path.join(data_dir, filename)
+        self.store = store
+        self.entries: Dict[str, Dict] = {}
+        self.load()
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('CrawlManifest')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    def load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('pages', {})
+        except Exception as e:
+            self.logger.warning(f"Manifeste de crawl illisible, il sera reconstruit : {str(e)}")
+            self.entries = {}
+
+    def save(self):
+        """Écrit le manifeste de manière atomique"""
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # Copie : le crawl asynchrone met le manifeste à jour depuis d'autres threads
+                json.dump({'pages': dict(self.entries)}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'écriture du manifeste de crawl : {str(e)}")
+
+    @staticmethod
+    def content_hash(content: Dict) -> str:
+        """Hash du contenu extrait d'une page (horodatage exclu)"""
+        stable = {key: value for key, value in content.items() if key != 'timestamp'}
+        return hashlib.sha256(json.dumps(stable, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def get(self, url: str) -> Optional[Dict]:
+        return self.entries.get(url)
+
+    def has_content(self, url: str) -> bool:
+        """Vrai si le contenu de la page est toujours enregistré"""
+        entry = self.entries.get(url)
+        if not entry:
+            return False
+        if self.store is not None:
+            return self.store.contains(url)
+        return bool(entry.get('file')) and os.path.exists(entry['file'])
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """En-têtes de requête conditionnelle pour une URL déjà crawlée"""
+        entry = self.entries.get(url)
+        headers = {}
+        if entry and self.has_content(url):
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def load_content(self, url: str) -> Optional[Dict]:
+        """Relit le contenu enregistré d'une page inchangée"""
+        entry = self.entries.get(url)
+        if not entry:
+            return None
+        try:
+            if self.store is not None:
+                return self.store.get(url)
+            if not entry.get('file'):
+                return None
+            with open(entry['file'], 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.warning(f"Contenu enregistré illisible pour {url}: {str(e)}")
+            return None
+
+    def update(self, url: str, content_hash: str, file: str,
+               etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.entries[url] = {
+            'content_hash': content_hash,
+            'file': file,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': datetime.now().isoformat()
+        }
+
+    def remove(self, url: str) -> Optional[Dict]:
+        return self.entries.pop(url, None)
+
+class ChangeSet:
+    """Liste des changements d'un crawl : pages ajoutées, modifiées et supprimées"""
+
+    def __init__(self):
+        self.crawl_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.added: List[Dict] = []
+        self.modified: List[Dict] = []
+        self.removed: List[Dict] = []
+        self.unchanged = 0
+        self.duplicates: List[Dict] = []  # Quasi-doublons écartés de l'index
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ChangeSet":
+        """Restaure la liste des changements d'un crawl interrompu"""
+        changes = cls()
+        changes.crawl_id = data.get('crawl_id', changes.crawl_id)
+        changes.added = data.get('added', [])
+        changes.modified = data.get('modified', [])
+        changes.removed = data.get('removed', [])
+        changes.unchanged = data.get('unchanged', 0)
+        return changes
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+    def to_dict(self) -> Dict:
+        return {
+            'crawl_id': self.crawl_id,
+            'timestamp': datetime.now().isoformat(),
+            'added': self.added,
+            'modified': self.modified,
+            'removed': self.removed,
+            'unchanged': self.unchanged,
+            'duplicates': self.duplicates
+        }
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+def load_changes(data_dir: str = 'scraped_data', filename: str = 'crawl_changes.json') -> Optional[Dict]:
+    """Lit la liste des changements du dernier crawl"""
+    path = os.path.join(data_dir, filename)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
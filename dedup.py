@@ -0,0 +1,163 @@
+import os
+import zlib
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+from urllib.parse import urlsplit
+import numpy as np
+from crawl_frontier import normalize_url
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Champs de la page conservés avec ses passages (le corps n'est pas gardé en mémoire)
+PAGE_SUMMARY_FIELDS = ('id', 'url', 'title', 'contact_info', 'links', 'timestamp')
+
+def canonical_rank(url: str) -> Tuple[bool, bool, int]:
+    """
+    Rang d'une URL parmi les copies d'une même page (la plus petite l'emporte) :
+    forme canonique (sans fragment, voir `normalize_url`), sans paramètres de
+    requête, puis chemin le plus court.
+    """
+    parts = urlsplit(url)
+    return url != normalize_url(url), bool(parts.query), len(parts.path.rstrip('/'))
+
+class NearDuplicateDetector:
+    """
+    Détection des pages quasi identiques par MinHash et LSH.
+
+    Chaque page est réduite à une signature MinHash de ses shingles (suites
+    de `shingle_size` mots) ; la similarité de Jaccard de deux pages est
+    estimée par la part de valeurs communes de leurs signatures. L'index LSH
+    (signature découpée en `bands` bandes) ne compare une page qu'aux pages
+    partageant au moins une bande : le coût reste proche du linéaire.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, bands: int = 16,
+                 shingle_size: int = 5, seed: int = 1):
+        self.setup_logging()
+        if num_perm % bands:
+            raise ValueError("num_perm doit être un multiple de bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Permutations (a·x + b) mod p, identiques d'un processus à l'autre
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+
+    @classmethod
+    def from_env(cls) -> "NearDuplicateDetector":
+        """Crée le détecteur à partir des variables d'environnement"""
+        return cls(threshold=float(os.getenv('DEDUP_THRESHOLD', '0.85')))
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('NearDuplicateDetector')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Hash (32 bits, stables) des suites de mots du texte"""
+        words = text.lower().split()
+        if not words:
+            return np.empty(0, dtype=np.uint64)
+        size = min(self.shingle_size, len(words))
+        hashes = {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8')) for i in range(len(words) - size + 1)}
+        return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+    def signature(self, text: str) -> np.ndarray:
+        """Signature MinHash du texte (vide si le texte ne contient aucun mot)"""
+        hashes = self.shingles(text)
+        if not len(hashes):
+            return hashes
+        return ((np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME).min(axis=0)
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Similarité de Jaccard estimée entre deux signatures"""
+        return float(np.mean(first == second))
+
+    def deduplicate(self, records: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Sépare les enregistrements ({'url', 'timestamp', 'signature', ...})
+        en pages conservées et quasi-doublons. Chaque groupe garde la copie à
+        l'URL canonique (`/pages/services` plutôt que `/pages/services#cloud`),
+        puis la plus récente.
+        """
+        if not self.enabled:
+            return records, []
+
+        buckets = defaultdict(list)
+        kept, removed = [], []
+        order = sorted(range(len(records)), key=lambda i: records[i].get('timestamp') or '', reverse=True)
+        order.sort(key=lambda i: canonical_rank(records[i]['url']))
+        for i in order:
+            record = records[i]
+            signature = record['signature']
+            if not len(signature):
+                record['order'] = i
+                kept.append(record)
+                continue
+
+            keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                    for band in range(self.bands)]
+            candidates = {idx for key in keys for idx in buckets.get(key, ())}
+            best, best_similarity = None, 0.0
+            for idx in candidates:
+                similarity = self.similarity(signature, kept[idx]['signature'])
+                if similarity > best_similarity:
+                    best, best_similarity = idx, similarity
+
+            if best is not None and best_similarity >= self.threshold:
+                removed.append({
+                    'url': record['url'],
+                    'duplicate_of': kept[best]['url'],
+                    'similarity': round(best_similarity, 3)
+                })
+                continue
+
+            for key in keys:
+                buckets[key].append(len(kept))
+            kept.append(record)
+            record['order'] = i
+
+        # Ordre d'origine des pages conservées
+        kept.sort(key=lambda r: r.get('order', 0))
+        return kept, removed
+
+def chunk_unique_pages(pages: Iterable[Dict], chunker, detector: NearDuplicateDetector) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Découpe les pages en passages puis écarte les quasi-doublons.
+
+    L'empreinte de chaque page porte sur ses passages, donc sans les blocs
+    répétés (menus, en-têtes) écartés par le chunker, déjà ajusté sur le
+    corpus. Retourne les pages conservées ({'page', 'passages'}) et la
+    liste des pages écartées.
+    """
+    records = []
+    for page in pages:
+        passages = chunker.chunk_page(page)
+        text = ' '.join(passage['content'] for passage in passages)
+        records.append({
+            'url': page['url'],
+            'timestamp': page.get('timestamp'),
+            'signature': detector.signature(text) if detector.enabled else np.empty(0, dtype=np.uint64),
+            'page': {key: page[key] for key in PAGE_SUMMARY_FIELDS if key in page},
+            'passages': passages
+        })
+
+    kept, removed = detector.deduplicate(records)
+    for item in removed:
+        detector.logger.info(f"Quasi-doublon écarté : {item['url']} "
+                             f"(similaire à {item['duplicate_of']}, {item['similarity']:.0%})")
+    return kept, removed
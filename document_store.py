@@ -0,0 +1,144 @@
+import os
+import json
+import mmap
+import shutil
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import faiss
+import numpy as np
+from vector_index import read_index_mapped
+
+class DocumentStore:
+    """
+    Documents en lecture seule dans un fichier mappé en mémoire.
+
+    Chaque document est sérialisé en JSON dans `documents.bin` ; le tableau
+    `documents.offsets.npy` donne la position de chacun. Les processus qui
+    ouvrent le même fichier partagent ses pages en mémoire, et un document
+    n'est décodé que lorsqu'il est lu.
+    """
+
+    DATA_FILE = 'documents.bin'
+    OFFSETS_FILE = 'documents.offsets.npy'
+
+    def __init__(self, directory: str):
+        directory = Path(directory)
+        self.offsets = np.load(directory / self.OFFSETS_FILE, mmap_mode='r')
+        self._file = open(directory / self.DATA_FILE, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    @classmethod
+    def write(cls, directory: str, documents: List[Dict]):
+        """Écrit les documents dans le répertoire"""
+        directory = Path(directory)
+        offsets = [0]
+        with open(directory / cls.DATA_FILE, 'wb') as f:
+            for document in documents:
+                data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        np.save(directory / cls.OFFSETS_FILE, np.asarray(offsets, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> Dict:
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        return json.loads(self._data[start:end].decode('utf-8'))
+
+    def __iter__(self) -> Iterator[Dict]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+class SharedSnapshot:
+    """
+    Instantané de la base de connaissances partagé entre les workers.
+
+    Chaque export crée un sous-répertoire (index FAISS, documents,
+    métadonnées) puis met à jour le fichier `current` de manière atomique.
+    Les workers mappent les fichiers en lecture : un worker encore sur
+    l'instantané précédent n'est pas perturbé par un nouvel export.
+    """
+
+    INDEX_FILE = 'index.faiss'
+    METADATA_FILE = 'metadata.json'
+
+    def __init__(self, root: str, keep: int = 3):
+        self.setup_logging()
+        self.root = Path(root).resolve()
+        self.keep = keep
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('SharedSnapshot')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    def current(self) -> Optional[Path]:
+        """Répertoire de l'instantané actif"""
+        try:
+            with open(self.root / 'current', 'r', encoding='utf-8') as f:
+                path = self.root / f.read().strip()
+            return path if path.exists() else None
+        except FileNotFoundError:
+            return None
+
+    def export(self, knowledge_base) -> Path:
+        """Écrit l'instantané d'une base de connaissances construite et le rend actif"""
+        name = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        tmp_dir = self.root / f".{name}.tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        faiss.write_index(knowledge_base.index, str(tmp_dir / self.INDEX_FILE))
+        DocumentStore.write(str(tmp_dir), list(knowledge_base.documents))
+        with open(tmp_dir / self.METADATA_FILE, 'w', encoding='utf-8') as f:
+            json.dump({
+                'model': knowledge_base.model_name,
+                'dimension': knowledge_base.dimension,
+                'vector_index': knowledge_base.vector_index.key,
+                'documents': len(knowledge_base.documents),
+                'page_titles': knowledge_base.page_titles,
+                'contact_info': knowledge_base.contact_info,
+                'created_at': datetime.now().isoformat()
+            }, f, ensure_ascii=False)
+
+        snapshot_dir = self.root / name
+        os.replace(tmp_dir, snapshot_dir)
+        tmp_current = self.root / 'current.tmp'
+        with open(tmp_current, 'w', encoding='utf-8') as f:
+            f.write(name)
+        os.replace(tmp_current, self.root / 'current')
+
+        self.cleanup()
+        self.logger.info(f"Instantané partagé exporté dans {snapshot_dir}")
+        return snapshot_dir
+
+    def cleanup(self):
+        """Supprime les instantanés les plus anciens"""
+        snapshots = sorted(path for path in self.root.iterdir() if path.is_dir() and not path.name.startswith('.'))
+        for path in snapshots[:-self.keep]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, snapshot_dir: Path):
+        """Ouvre l'index (mmap), les documents et les métadonnées d'un instantané"""
+        with open(snapshot_dir / cls.METADATA_FILE, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        index = read_index_mapped(str(snapshot_dir / cls.INDEX_FILE))
+        return index, DocumentStore(str(snapshot_dir)), metadata
@@ -0,0 +1,287 @@
+"""
+Backends d'encodage des textes.
+
+Le backend est choisi au démarrage avec EMBEDDING_BACKEND :
+- `sentence-transformers` (défaut) : modèle PyTorch complet ;
+- `onnx` : export ONNX du même modèle quantifié en int8, exécuté par
+  ONNX Runtime (ni PyTorch ni transformers au chargement).
+
+Export du modèle ONNX (nécessite sentence-transformers et onnxruntime) :
+    python embedders.py export --output models/minilm-onnx
+
+L'export mesure la parité du modèle int8 avec le modèle PyTorch (similarité
+cosine et rappel@k sur les passages de scraped_data) et l'enregistre dans
+embedder.json ; le backend onnx refuse un modèle dont la parité n'a pas été
+mesurée ou passe sous les seuils (ONNX_MIN_COSINE, ONNX_MIN_RECALL).
+"""
+import os
+import re
+import json
+import logging
+import argparse
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+
+DEFAULT_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+# Cache local des modèles Hugging Face
+MODEL_CACHE_DIR = Path.home() / '.cache' / 'it-work-chatbot'
+
+# Seuils de parité du modèle int8 avec le modèle PyTorch
+PARITY_MIN_COSINE = 0.98
+PARITY_MIN_RECALL = 0.9
+PARITY_K = 5
+
+# Requêtes types de la mesure de parité
+PARITY_QUERIES = [
+    "Quelles sont vos offres cloud pour les PME ?",
+    "Je cherche une solution de téléphonie VoIP pour mon cabinet médical",
+    "Comment sécuriser le réseau wifi de mon hôtel ?",
+    "Proposez-vous Microsoft 365 ?",
+    "Avez-vous des tarifs pour les associations ?",
+    "Sauvegarde des données et hébergement des serveurs",
+    "Installation d'un standard téléphonique pour un commerce",
+    "Qui êtes-vous et où êtes-vous situés ?",
+]
+
+class Embedder(ABC):
+    """Interface commune des backends d'encodage"""
+
+    # Nom utilisé comme clé du cache disque des embeddings
+    name: str = ''
+    dimension: int = 384
+    # Vrai si l'encodage est délégué à un autre processus (instantané partagé)
+    remote: bool = False
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode un lot de textes en vecteurs float32 (n, d)"""
+
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        return self.encode(texts)
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        return self.encode(queries)
+
+class SentenceTransformerEmbedder(Embedder):
+    """Modèle sentence-transformers (PyTorch), backend par défaut"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, cache_folder: Optional[str] = None):
+        from sentence_transformers import SentenceTransformer
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, cache_folder=cache_folder)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(list(texts))
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+
+class OnnxEmbedder(Embedder):
+    """
+    Export ONNX du modèle, quantifié dynamiquement en int8 (ONNX Runtime).
+
+    Reproduit la chaîne sentence-transformers : tokenisation (tokenizers),
+    passage dans le transformeur puis moyenne des états cachés pondérée par
+    le masque d'attention.
+    """
+
+    def __init__(self, model_dir: str, threads: int = 0, min_cosine: Optional[float] = PARITY_MIN_COSINE,
+                 min_recall: Optional[float] = PARITY_MIN_RECALL):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("Le backend onnx nécessite les paquets onnxruntime et tokenizers") from e
+
+        model_dir = Path(model_dir)
+        with open(model_dir / 'embedder.json', 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        self.name = f"{config['model_name']}-onnx-int8"
+        self.dimension = config['dimension']
+        self.max_length = config.get('max_seq_length', 128)
+
+        # Parité mesurée à l'export (None : vérification désactivée, pendant l'export)
+        self.parity = config.get('parity')
+        if min_cosine is not None or min_recall is not None:
+            check_parity(self.parity, min_cosine or 0.0, min_recall or 0.0, model_dir)
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        self.tokenizer.enable_padding(pad_id=config.get('pad_token_id', 1), pad_token=config.get('pad_token', '<pad>'))
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(model_dir / 'model_int8.onnx'), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {item.name for item in self.session.get_inputs()}
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(list(texts))
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            inputs['token_type_ids'] = np.zeros_like(input_ids)
+
+        hidden_states = self.session.run(None, inputs)[0]
+
+        # Moyenne des états cachés sur les tokens réels
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (hidden_states * mask).sum(axis=1)
+        return (summed / np.clip(mask.sum(axis=1), 1e-9, None)).astype(np.float32)
+
+def check_parity(parity: Optional[dict], min_cosine: float, min_recall: float, model_dir) -> None:
+    """Refuse un modèle int8 trop éloigné du modèle PyTorch (ou dont la parité n'a pas été mesurée)"""
+    if not parity:
+        raise ValueError(f"Parité du modèle ONNX de {model_dir} non mesurée : relancer python embedders.py export")
+    if parity['min_cosine'] < min_cosine or parity['recall_at_k'] < min_recall:
+        raise ValueError(
+            f"Parité insuffisante du modèle ONNX de {model_dir} : cosinus min {parity['min_cosine']:.4f} "
+            f"(seuil {min_cosine}), rappel@{parity['k']} {parity['recall_at_k']:.3f} (seuil {min_recall})"
+        )
+
+def parity_report(reference: np.ndarray, candidate: np.ndarray, query_count: int, k: int = PARITY_K) -> dict:
+    """
+    Écart entre deux encodages des mêmes textes (passages puis `query_count` requêtes) :
+    similarité cosinus ligne à ligne et rappel@k des passages retrouvés pour chaque requête.
+    """
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = (reference * candidate).sum(axis=1)
+
+    passage_count = len(reference) - query_count
+    k = min(k, passage_count)
+    recalls = []
+    if k > 0:
+        for row in range(passage_count, len(reference)):
+            expected = np.argsort(-(reference[:passage_count] @ reference[row]))[:k]
+            found = np.argsort(-(candidate[:passage_count] @ candidate[row]))[:k]
+            recalls.append(len(set(expected) & set(found)) / k)
+    return {
+        'texts': len(reference),
+        'min_cosine': round(float(cosine.min()), 4),
+        'mean_cosine': round(float(cosine.mean()), 4),
+        'k': k,
+        'recall_at_k': round(float(np.mean(recalls)), 4) if recalls else 1.0
+    }
+
+def calibration_texts(data_dir: str = 'scraped_data', limit: int = 256) -> List[str]:
+    """Passages du corpus, découpés comme à l'indexation"""
+    from chunker import PassageChunker
+
+    pages = []
+    for name in sorted(os.listdir(data_dir)):
+        if name.endswith('.json'):
+            with open(os.path.join(data_dir, name), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if 'url' in data:
+                pages.append(data)
+    chunker = PassageChunker()
+    chunker.fit(pages)
+    return [passage['content'] for page in pages for passage in chunker.chunk_page(page)][:limit]
+
+def default_onnx_dir(model_name: str = DEFAULT_MODEL_NAME) -> str:
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+    return os.path.join('models', f"{slug}-onnx")
+
+def local_tokenizer_path(model_name: str = DEFAULT_MODEL_NAME) -> Optional[str]:
+    """tokenizer.json du modèle disponible localement : export ONNX, puis cache Hugging Face"""
+    name = model_name.split('/')[-1]
+    candidates = [
+        Path(os.getenv('ONNX_MODEL_DIR', default_onnx_dir(model_name))) / 'tokenizer.json',
+        MODEL_CACHE_DIR / f"sentence-transformers_{name}" / 'tokenizer.json'
+    ]
+    candidates.extend(sorted(MODEL_CACHE_DIR.glob(f"**/models--*--{name}/snapshots/*/tokenizer.json")))
+    return next((str(path) for path in candidates if path.is_file()), None)
+
+def create_embedder(model_name: str = DEFAULT_MODEL_NAME, cache_folder: Optional[str] = None) -> Embedder:
+    """Crée le backend d'encodage choisi par EMBEDDING_BACKEND"""
+    backend = os.getenv('EMBEDDING_BACKEND', 'sentence-transformers').lower()
+    if backend == 'onnx':
+        return OnnxEmbedder(
+            os.getenv('ONNX_MODEL_DIR', default_onnx_dir(model_name)),
+            threads=int(os.getenv('ONNX_THREADS', '0')),
+            min_cosine=float(os.getenv('ONNX_MIN_COSINE', str(PARITY_MIN_COSINE))),
+            min_recall=float(os.getenv('ONNX_MIN_RECALL', str(PARITY_MIN_RECALL)))
+        )
+    if backend in ('sentence-transformers', 'pytorch'):
+        return SentenceTransformerEmbedder(model_name, cache_folder=cache_folder)
+    raise ValueError(f"EMBEDDING_BACKEND inconnu : {backend}")
+
+def export_onnx(model_name: str, output_dir: str, opset: int = 14, data_dir: str = 'scraped_data',
+                passages: int = 256):
+    """Exporte le transformeur du modèle en ONNX, le quantifie en int8 puis mesure sa parité"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logger = logging.getLogger('OnnxExport')
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model[0].tokenizer
+    tokenizer.save_pretrained(str(output_dir))
+
+    sample = tokenizer(["Exemple de phrase à encoder"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    fp32_path = output_dir / 'model.onnx'
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    quantize_dynamic(str(fp32_path), str(output_dir / 'model_int8.onnx'), weight_type=QuantType.QInt8)
+
+    config = {
+        'model_name': model_name,
+        'dimension': model.get_sentence_embedding_dimension(),
+        'max_seq_length': model.max_seq_length,
+        'pad_token': tokenizer.pad_token,
+        'pad_token_id': tokenizer.pad_token_id
+    }
+    with open(output_dir / 'embedder.json', 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+    # Parité avec le modèle PyTorch sur les passages du corpus et des requêtes types
+    texts = calibration_texts(data_dir, passages) + PARITY_QUERIES
+    reference = np.asarray(model.encode(texts), dtype=np.float32)
+    candidate = OnnxEmbedder(str(output_dir), min_cosine=None, min_recall=None).encode(texts)
+    config['parity'] = parity_report(reference, candidate, len(PARITY_QUERIES))
+    with open(output_dir / 'embedder.json', 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+    parity = config['parity']
+    logger.info(f"Modèle ONNX int8 exporté dans {output_dir} : cosinus min {parity['min_cosine']:.4f}, "
+                f"moyen {parity['mean_cosine']:.4f}, rappel@{parity['k']} {parity['recall_at_k']:.3f} "
+                f"({parity['texts']} textes)")
+    if parity['min_cosine'] < PARITY_MIN_COSINE or parity['recall_at_k'] < PARITY_MIN_RECALL:
+        logger.warning("Parité sous les seuils : le backend onnx refusera ce modèle")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Outils des backends d'embedding")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help="Exporte et quantifie le modèle en ONNX int8")
+    export_parser.add_argument('--model', default=DEFAULT_MODEL_NAME)
+    export_parser.add_argument('--output', default=None)
+    export_parser.add_argument('--data-dir', default='scraped_data', help="Corpus de la mesure de parité")
+    export_parser.add_argument('--passages', type=int, default=256, help="Passages de la mesure de parité")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    export_onnx(args.model, args.output or default_onnx_dir(args.model), data_dir=args.data_dir,
+                passages=args.passages)
@@ -0,0 +1,186 @@
+import os
+import time
+import asyncio
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from response_cache import QueryEmbeddingCache
+from metrics import STAGE_SECONDS
+
+class EmbeddingBatcher:
+    """
+    Exécute l'encodage des requêtes et la recherche FAISS hors de la boucle d'événements.
+
+    Les requêtes arrivant dans une fenêtre de quelques millisecondes sont
+    regroupées : un seul appel à `encode` et un seul `index.search` par lot,
+    puis le résultat de chaque appelant est transmis via son futur. Un lot
+    peut mêler plusieurs bases de connaissances (sites clients) partageant le
+    même modèle ; les requêtes sont alors traitées base par base.
+    """
+
+    def __init__(self, max_batch_size: int = 16, max_wait_ms: float = 5.0,
+                 embedding_cache_size: int = 1000):
+        self.setup_logging()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        # Requêtes déjà vues : l'embedding est réutilisé sans réencodage
+        self.query_cache = QueryEmbeddingCache(max_size=embedding_cache_size)
+
+        # Un seul thread : le modèle et l'index sont utilisés séquentiellement
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='embedding')
+
+        # Créés à la première utilisation pour être liés à la boucle d'uvicorn
+        self._queue = None
+        self._worker = None
+
+        # Statistiques de remplissage des lots
+        self.batches = 0
+        self.queries = 0
+        self.batch_sizes = Counter()
+        self.processing_time = 0.0
+        self.stage_times = Counter()  # Durée cumulée par étape (lexicale, encodage, vectorielle, fusion)
+        self.dense_skipped = 0
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingBatcher":
+        """Crée l'exécuteur à partir des variables d'environnement"""
+        return cls(
+            max_batch_size=int(os.getenv('EMBEDDING_BATCH_SIZE', '16')),
+            max_wait_ms=float(os.getenv('EMBEDDING_BATCH_WAIT_MS', '5')),
+            embedding_cache_size=int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '1000'))
+        )
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('EmbeddingBatcher')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    async def search(self, knowledge_base, query: str, k: int = 5) -> Tuple[List[Dict], Optional[np.ndarray]]:
+        """
+        Recherche les documents pertinents pour une requête (traitée par lot) et
+        retourne aussi son embedding (None si la recherche vectorielle a été évitée)
+        """
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.ensure_future(self._run())
+
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((query, k, future, time.perf_counter(), knowledge_base))
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple]:
+        """Attend une première requête puis regroupe celles qui arrivent dans la fenêtre"""
+        loop = asyncio.get_event_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = await self._collect_batch()
+
+            # Les appelants partis entre-temps (client déconnecté) sont ignorés
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                continue
+
+            try:
+                results = await loop.run_in_executor(self.executor, self._process_batch, batch)
+            except Exception as e:
+                self.logger.error(f"Erreur lors du traitement d'un lot de {len(batch)} requêtes : {str(e)}")
+                for _, _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, _, future, _, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _encode(self, knowledge_base, queries: List[str]) -> np.ndarray:
+        """Encode les requêtes en réutilisant les embeddings déjà calculés"""
+        vectors = [self.query_cache.get(query) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = knowledge_base.encode_queries([queries[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                self.query_cache.put(queries[i], vector)
+        return np.vstack(vectors).astype(np.float32)
+
+    def _process_batch(self, batch: List[Tuple]) -> List[Tuple[List[Dict], Optional[np.ndarray]]]:
+        """Encode et recherche un lot de requêtes (exécuté dans le thread dédié)"""
+        start_time = time.perf_counter()
+
+        # Attente de chaque requête avant son traitement (fenêtre de regroupement et file de l'exécuteur)
+        for _, _, _, enqueued_at, _ in batch:
+            STAGE_SECONDS.observe(start_time - enqueued_at, stage='executor_queue')
+
+        # Chaque requête garde l'instantané de sa base, même si celle-ci est rechargée entre-temps
+        groups: Dict[int, List[int]] = {}
+        for i, (_, _, _, _, knowledge_base) in enumerate(batch):
+            groups.setdefault(id(knowledge_base), []).append(i)
+
+        timings = Counter()
+        results = [None] * len(batch)
+        for rows in groups.values():
+            knowledge_base = batch[rows[0]][4]
+            group_results = knowledge_base.search_batch(
+                [batch[i][0] for i in rows],
+                [batch[i][1] for i in rows],
+                encode=lambda texts: self._encode(knowledge_base, texts),
+                timings=timings
+            )
+            for i, result in zip(rows, group_results):
+                results[i] = result
+        self.stage_times.update(timings)
+        for stage, duration in timings.items():
+            STAGE_SECONDS.observe(duration, stage=stage)
+
+        self.batches += 1
+        self.queries += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        self.dense_skipped += sum(1 for _, vector in results if vector is None)
+        self.processing_time += time.perf_counter() - start_time
+        return results
+
+    def get_stats(self) -> Dict:
+        """Statistiques de remplissage des lots"""
+        average_size = self.queries / self.batches if self.batches else 0.0
+        return {
+            'batches': self.batches,
+            'queries': self.queries,
+            'average_batch_size': round(average_size, 2),
+            'batch_fill_ratio': round(average_size / self.max_batch_size, 3),
+            'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            'average_batch_time_ms': round(1000 * self.processing_time / self.batches, 2) if self.batches else 0.0,
+            'average_stage_time_ms': {
+                stage: round(1000 * duration / self.batches, 3) for stage, duration in list(self.stage_times.items())
+            },
+            'dense_search_skipped': self.dense_skipped,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'query_embedding_cache': self.query_cache.get_stats()
+        }
+
+    async def aclose(self):
+        """Arrête le traitement des lots"""
+        if self._worker is not None:
+            self._worker.cancel()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import faiss
+import numpy as np
+from vector_index import read_index_mapped
+
+class EmbeddingCache:
+    """
+    Cache disque des embeddings et de l'index FAISS.
+
+    Les embeddings sont indexés par nom de modèle et par hash du contenu de
+    chaque document : seuls les documents nouveaux ou modifiés sont ré-encodés
+    au démarrage. Un index est conservé par type d'index vectoriel.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str = 'index_cache'):
+        self.setup_logging()
+        self.model_name = model_name
+
+        # Un sous-dossier par modèle : changer de modèle invalide le cache
+        model_slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.cache_dir = Path(cache_dir) / model_slug
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self.embeddings_path = self.cache_dir / 'embeddings.npy'
+        self.hashes_path = self.cache_dir / 'hashes.json'
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('EmbeddingCache')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """Calcule le hash du contenu d'un document"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _read_hashes(self) -> List[str]:
+        try:
+            if self.hashes_path.exists():
+                with open(self.hashes_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('model') == self.model_name:
+                    return data.get('hashes', [])
+        except Exception as e:
+            self.logger.warning(f"Manifeste du cache illisible, il sera reconstruit : {str(e)}")
+        return []
+
+    def load_embeddings(self) -> Dict[str, np.ndarray]:
+        """Charge les embeddings en cache sous la forme {hash: vecteur}"""
+        hashes = self._read_hashes()
+        if not hashes or not self.embeddings_path.exists():
+            return {}
+        try:
+            embeddings = np.load(self.embeddings_path, mmap_mode='r')
+            if len(embeddings) != len(hashes):
+                self.logger.warning("Cache d'embeddings incohérent, il sera reconstruit")
+                return {}
+            return {h: embeddings[i] for i, h in enumerate(hashes)}
+        except Exception as e:
+            self.logger.warning(f"Impossible de lire le cache d'embeddings : {str(e)}")
+            return {}
+
+    def get_embeddings(self, texts: List[str],
+                       encode: Callable[[List[str]], np.ndarray]) -> Tuple[np.ndarray, bool]:
+        """
+        Retourne les embeddings des textes en n'encodant que ceux absents du cache.
+
+        Le booléen retourné indique si le contenu du corpus a changé depuis la
+        dernière écriture du cache (et donc si l'index doit être reconstruit).
+        """
+        hashes = [self.content_hash(text) for text in texts]
+        cached = self.load_embeddings()
+
+        # Textes à encoder (un seul encodage par contenu identique)
+        from_cache = sum(1 for h in hashes if h in cached)
+        missing = {}
+        for text, h in zip(texts, hashes):
+            if h not in cached and h not in missing:
+                missing[h] = text
+
+        if missing:
+            self.logger.info(f"Encodage de {len(missing)} document(s) nouveau(x) ou modifié(s) "
+                             f"({from_cache} depuis le cache)")
+            new_embeddings = np.asarray(encode(list(missing.values())), dtype=np.float32)
+            for h, vector in zip(missing.keys(), new_embeddings):
+                cached[h] = vector
+        else:
+            self.logger.info(f"{len(texts)} embeddings chargés depuis le cache")
+
+        embeddings = np.vstack([cached[h] for h in hashes]).astype(np.float32)
+
+        changed = hashes != self._read_hashes()
+        if changed:
+            self.save_embeddings(hashes, embeddings)
+            self.clear_indexes()
+        return embeddings, changed
+
+    @staticmethod
+    def _temp_path(path: Path) -> str:
+        """
+        Fichier temporaire propre à l'écrivain, renommé ensuite sur `path` : deux
+        workers qui écrivent le même cache ne partagent jamais un fichier à moitié écrit
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.stem}.", suffix=f".tmp{path.suffix}")
+        os.close(fd)
+        return tmp_path
+
+    @staticmethod
+    def _discard(tmp_path: Optional[str]):
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def save_embeddings(self, hashes: List[str], embeddings: np.ndarray):
+        """Écrit les embeddings et leur manifeste de manière atomique"""
+        tmp_embeddings = tmp_hashes = None
+        try:
+            tmp_embeddings = self._temp_path(self.embeddings_path)
+            np.save(tmp_embeddings, embeddings)
+            os.replace(tmp_embeddings, self.embeddings_path)
+
+            tmp_hashes = self._temp_path(self.hashes_path)
+            with open(tmp_hashes, 'w', encoding='utf-8') as f:
+                json.dump({'model': self.model_name, 'hashes': hashes}, f)
+            os.replace(tmp_hashes, self.hashes_path)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'écriture du cache d'embeddings : {str(e)}")
+            self._discard(tmp_embeddings)
+            self._discard(tmp_hashes)
+
+    def index_path(self, key: str) -> Path:
+        """Fichier de l'index FAISS pour un type d'index donné"""
+        return self.cache_dir / f"index-{key}.faiss"
+
+    def clear_indexes(self):
+        """Supprime les index en cache, construits sur un corpus qui a changé"""
+        for path in self.cache_dir.glob('index*.faiss'):
+            try:
+                path.unlink()
+            except OSError as e:
+                self.logger.warning(f"Impossible de supprimer {path} : {str(e)}")
+
+    def load_index(self, key: str) -> Optional[faiss.Index]:
+        """Charge l'index FAISS en cache par lecture mappée en mémoire (lecture seule)"""
+        index_path = self.index_path(key)
+        if not index_path.exists():
+            return None
+        try:
+            return read_index_mapped(str(index_path))
+        except Exception as e:
+            self.logger.warning(f"Index FAISS en cache illisible : {str(e)}")
+            return None
+
+    def save_index(self, index: faiss.Index, key: str):
+        """Écrit l'index FAISS (paramètres entraînés compris) de manière atomique"""
+        tmp_path = None
+        try:
+            index_path = self.index_path(key)
+            tmp_path = self._temp_path(index_path)
+            faiss.write_index(index, tmp_path)
+            os.replace(tmp_path, index_path)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'écriture de l'index FAISS : {str(e)}")
+            self._discard(tmp_path)
@@ -0,0 +1,268 @@
+"""
+Service local d'encodage partagé par les workers uvicorn.
+
+Un seul processus charge le modèle d'embedding, construit la base de
+connaissances et exporte un instantané mappé en mémoire (index FAISS et
+documents). Les workers, lancés avec SHARED_INDEX=1, ouvrent cet instantané
+en lecture et lui envoient leurs requêtes à encoder par un socket Unix.
+
+Protocole : chaque message est précédé de sa longueur (4 octets, big-endian).
+Requête : JSON {"op": "encode" | "info" | "rebuild", "texts": [...]}.
+Réponse : JSON {"ok": true, ...} ; pour "encode", suivi d'un second message
+contenant les vecteurs float32 bruts de forme `shape`.
+
+Usage :
+    python embedding_service.py --socket /tmp/itbot-embedding.sock
+"""
+import os
+import json
+import time
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from embedders import DEFAULT_MODEL_NAME, Embedder
+
+DEFAULT_SOCKET = '/tmp/itbot-embedding.sock'
+SHARED_INDEX_DIR = os.path.join('index_cache', 'shared')
+HEADER = struct.Struct('>I')
+
+def encode_message(payload: bytes) -> bytes:
+    return HEADER.pack(len(payload)) + payload
+
+async def read_message(reader: asyncio.StreamReader) -> bytes:
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return await reader.readexactly(length)
+
+class EmbeddingServer:
+    """Sert l'encodage des requêtes et la reconstruction de l'instantané partagé"""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, shared_dir: str = SHARED_INDEX_DIR):
+        self.setup_logging()
+        self.socket_path = socket_path
+        self.shared_dir = shared_dir
+        self.knowledge_base = None
+        self.snapshot_dir = None
+
+        # Un seul thread : le modèle est utilisé séquentiellement (encodages et
+        # reconstructions, les encodages attendent la fin d'une reconstruction)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='embedding')
+        self._rebuild_lock = None
+
+        self.requests = 0
+        self.texts = 0
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('EmbeddingServer')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    def build(self):
+        """Construit la base de connaissances et exporte l'instantané partagé"""
+        from knowledge_base import KnowledgeBase
+        from document_store import SharedSnapshot
+
+        embedder = self.knowledge_base.embedder if self.knowledge_base is not None else None
+        knowledge_base = KnowledgeBase(embedder=embedder)
+        self.snapshot_dir = SharedSnapshot(self.shared_dir).export(knowledge_base)
+        self.knowledge_base = knowledge_base
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_event_loop()
+        try:
+            while True:
+                request = json.loads(await read_message(reader))
+                op = request.get('op')
+                try:
+                    if op == 'encode':
+                        texts = request.get('texts', [])
+                        vectors = await loop.run_in_executor(
+                            self.executor, self.knowledge_base.encode_queries, texts
+                        )
+                        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+                        self.requests += 1
+                        self.texts += len(texts)
+                        header = {'ok': True, 'shape': list(vectors.shape)}
+                        writer.write(encode_message(json.dumps(header).encode('utf-8')))
+                        writer.write(encode_message(vectors.tobytes()))
+                    elif op == 'rebuild':
+                        async with self._rebuild_lock:
+                            # Déjà reconstruit à la demande d'un autre worker
+                            if request.get('snapshot') in (None, str(self.snapshot_dir)):
+                                await loop.run_in_executor(self.executor, self.build)
+                        writer.write(encode_message(json.dumps(self.info()).encode('utf-8')))
+                    elif op == 'info':
+                        writer.write(encode_message(json.dumps(self.info()).encode('utf-8')))
+                    else:
+                        raise ValueError(f"opération inconnue : {op}")
+                except Exception as e:
+                    self.logger.error(f"Erreur lors du traitement de la requête {op} : {str(e)}")
+                    writer.write(encode_message(json.dumps({'ok': False, 'error': str(e)}).encode('utf-8')))
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    def info(self) -> Dict:
+        return {
+            'ok': True,
+            'snapshot': str(self.snapshot_dir),
+            'model': self.knowledge_base.embedder.name,
+            'dimension': self.knowledge_base.dimension,
+            'requests': self.requests,
+            'texts': self.texts
+        }
+
+    async def serve(self):
+        self._rebuild_lock = asyncio.Lock()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+        self.logger.info(f"Service d'embedding à l'écoute sur {self.socket_path}")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        start_time = time.perf_counter()
+        self.build()
+        self.logger.info(f"Instantané prêt en {time.perf_counter() - start_time:.2f}s")
+        try:
+            asyncio.run(self.serve())
+        finally:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+class EmbeddingServiceError(Exception):
+    """Erreur renvoyée par le service d'embedding"""
+
+class RemoteEmbedder(Embedder):
+    """
+    Client du service d'embedding (socket Unix, appels bloquants).
+
+    Utilisé depuis le thread d'encodage des workers ; une connexion unique
+    est protégée par un verrou et rouverte en cas d'erreur.
+    """
+
+    remote = True
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, connect_timeout: float = 60.0,
+                 request_timeout: float = 300.0):
+        self.setup_logging()
+        self.name = DEFAULT_MODEL_NAME
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self._socket: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RemoteEmbedder":
+        """Crée le client à partir des variables d'environnement"""
+        return cls(
+            socket_path=os.getenv('EMBEDDING_SOCKET', DEFAULT_SOCKET),
+            connect_timeout=float(os.getenv('EMBEDDING_CONNECT_TIMEOUT', '60'))
+        )
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('RemoteEmbedder')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    def _connect(self) -> socket.socket:
+        # Le service peut être encore en train de charger le modèle
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.socket_path)
+                sock.settimeout(self.request_timeout)
+                return sock
+            except OSError as e:
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise EmbeddingServiceError(f"service d'embedding injoignable ({self.socket_path}) : {str(e)}")
+                time.sleep(0.5)
+
+    def _recv_exactly(self, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = self._socket.recv(min(size, 1 << 20))
+            if not chunk:
+                raise ConnectionError("connexion fermée par le service d'embedding")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def _recv_message(self) -> bytes:
+        (length,) = HEADER.unpack(self._recv_exactly(HEADER.size))
+        return self._recv_exactly(length)
+
+    def _request(self, request: Dict, with_vectors: bool = False):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._socket is None:
+                        self._socket = self._connect()
+                    self._socket.sendall(encode_message(json.dumps(request, ensure_ascii=False).encode('utf-8')))
+                    response = json.loads(self._recv_message())
+                    if not response.get('ok'):
+                        raise EmbeddingServiceError(response.get('error', 'erreur inconnue'))
+                    if with_vectors:
+                        data = self._recv_message()
+                        return np.frombuffer(data, dtype=np.float32).reshape(response['shape'])
+                    return response
+                except (OSError, ConnectionError) as e:
+                    # Service redémarré : une nouvelle connexion est tentée une fois
+                    self.close()
+                    if attempt:
+                        raise EmbeddingServiceError(f"service d'embedding indisponible : {str(e)}")
+                    self.logger.warning(f"Connexion au service d'embedding perdue, reconnexion : {str(e)}")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode un lot de textes en vecteurs float32 (n, d)"""
+        return self._request({'op': 'encode', 'texts': list(texts)}, with_vectors=True)
+
+    def info(self) -> Dict:
+        """Instantané actif et backend du service"""
+        info = self._request({'op': 'info'})
+        self.name, self.dimension = info['model'], info['dimension']
+        return info
+
+    def rebuild(self, snapshot=None) -> Dict:
+        """
+        Demande au service de reconstruire et d'exporter l'instantané partagé.
+        Si l'instantané actif n'est plus `snapshot`, un autre worker l'a déjà
+        fait reconstruire et il est simplement réutilisé.
+        """
+        return self._request({'op': 'rebuild', 'snapshot': str(snapshot) if snapshot else None})
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            finally:
+                self._socket = None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service d'embedding partagé par les workers")
+    parser.add_argument('--socket', default=os.getenv('EMBEDDING_SOCKET', DEFAULT_SOCKET))
+    parser.add_argument('--shared-dir', default=SHARED_INDEX_DIR)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    EmbeddingServer(args.socket, args.shared_dir).run()
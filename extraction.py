@@ -0,0 +1,218 @@
+import os
+import re
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import PreformattedString
+
+# Numéros français : 04 84 89 42 52, 04.84.89.42.52, +33 4 84 89 42 52, +33 (0)4 84...
+PHONE_PATTERN = re.compile(r'(?<![\d+])(?:\+33\s?(?:\(0\)\s?)?|0)[1-9](?:[\s.\-]?\d{2}){4}(?!\d)')
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[a-zA-Z]{2,}')
+SOCIAL_PATTERN = re.compile(r'facebook|twitter|linkedin|instagram', re.IGNORECASE)
+CONTAINER_CLASS_PATTERN = re.compile(r'post|article|content')
+
+CONTAINER_TAGS = {'article', 'div'}
+BLOCK_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'ul', 'ol'}
+SKIPPED_TAGS = {'script', 'style', 'template'}
+
+def default_parser() -> str:
+    """lxml s'il est installé, sinon le parseur de la bibliothèque standard"""
+    try:
+        import lxml  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'html.parser'
+
+class _Buffer:
+    """Texte d'un élément en cours de parcours (bloc, service, adresse, lien)"""
+
+    __slots__ = ('kind', 'tag', 'parts')
+
+    def __init__(self, kind: str, tag: Tag):
+        self.kind = kind
+        self.tag = tag
+        self.parts: List[str] = []
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts).strip()
+
+class PageExtractor:
+    """
+    Extraction du contenu d'une page en un seul parcours de l'arbre HTML.
+
+    Titre, meta description, blocs de contenu, coordonnées et liens sont
+    collectés pendant le même parcours : chaque nœud texte est ajouté aux
+    éléments ouverts qui le contiennent. Un bloc imbriqué dans plusieurs
+    conteneurs (article dans un div « content ») n'est extrait qu'une fois,
+    et seul le bloc le plus externe est retenu (pas de paragraphe répété
+    dans sa liste).
+    """
+
+    def __init__(self, base_urls: List[str], parser: Optional[str] = None):
+        self.setup_logging()
+        self.base_urls = base_urls
+        self.parser = parser if parser and parser != 'auto' else default_parser()
+
+    @classmethod
+    def from_env(cls, base_urls: List[str]) -> "PageExtractor":
+        """Crée l'extracteur à partir des variables d'environnement"""
+        return cls(base_urls, parser=os.getenv('HTML_PARSER', 'auto'))
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('PageExtractor')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    def is_internal(self, href: str) -> bool:
+        return href.startswith('/') or any(base_url in href for base_url in self.base_urls)
+
+    @staticmethod
+    def _classes(tag: Tag) -> str:
+        classes = tag.get('class')
+        if not classes:
+            return ''
+        return ' '.join(classes) if isinstance(classes, list) else classes
+
+    @staticmethod
+    def _append_unique(values: List, value, seen: set):
+        if value and value not in seen:
+            seen.add(value)
+            values.append(value)
+
+    def extract(self, url: str, html: str) -> Dict:
+        """Contenu structuré de la page (même format que les pages enregistrées)"""
+        return self.extract_soup(url, BeautifulSoup(html, self.parser))
+
+    def extract_soup(self, url: str, soup: BeautifulSoup) -> Dict:
+        content = {
+            'url': url,
+            'title': '',
+            'main_content': [],
+            'meta_description': '',
+            'contact_info': {},
+            'links': [],
+            'timestamp': datetime.now().isoformat()
+        }
+        contact_info = {'phone': [], 'email': [], 'address': [], 'social_media': []}
+        seen_phones, seen_emails, seen_addresses, seen_social = set(), set(), set(), set()
+
+        blocks: List[_Buffer] = []
+        services: List[_Buffer] = []
+        addresses: List[_Buffer] = []
+        links: List[tuple] = []
+        title: Optional[_Buffer] = None
+
+        # Parcours en profondeur itératif : (nœud, nombre de conteneurs englobants) ;
+        # (None, n) marque la sortie d'un élément ayant ouvert n tampons
+        open_buffers: List[_Buffer] = []
+        stack = [(soup, 0)]
+        while stack:
+            node, count = stack.pop()
+
+            if node is None:
+                del open_buffers[len(open_buffers) - count:]
+                continue
+            containers = count
+
+            if isinstance(node, NavigableString):
+                # Commentaires, doctype, etc. ; scripts et styles ne sont pas parcourus
+                if isinstance(node, PreformattedString):
+                    continue
+                text = str(node)
+                for buffer in open_buffers:
+                    buffer.parts.append(text)
+                if any(char.isdigit() for char in text):
+                    for match in PHONE_PATTERN.finditer(text):
+                        self._append_unique(contact_info['phone'], ' '.join(match.group().split()), seen_phones)
+                if '@' in text:
+                    for match in EMAIL_PATTERN.finditer(text):
+                        self._append_unique(contact_info['email'], match.group(), seen_emails)
+                continue
+
+            name = node.name
+            if name in SKIPPED_TAGS:
+                continue
+
+            opened = 0
+            classes = self._classes(node) if isinstance(node, Tag) and name != '[document]' else ''
+            open_kinds = {buffer.kind for buffer in open_buffers}
+
+            if name == 'title' and title is None:
+                title = _Buffer('title', node)
+                open_buffers.append(title)
+                opened += 1
+            elif name == 'meta' and not content['meta_description'] and node.get('name') == 'description':
+                content['meta_description'] = (node.get('content') or '').strip()
+
+            # Blocs de contenu : le plus externe, à l'intérieur d'un conteneur
+            if containers and name in BLOCK_TAGS and 'block' not in open_kinds:
+                buffer = _Buffer('block', node)
+                blocks.append(buffer)
+                open_buffers.append(buffer)
+                opened += 1
+            if name in CONTAINER_TAGS and CONTAINER_CLASS_PATTERN.search(classes):
+                containers += 1
+
+            # Blocs de service et adresses (hors blocs de même nature déjà ouverts)
+            if name == 'div' and 'service' in classes and 'service' not in open_kinds:
+                buffer = _Buffer('service', node)
+                services.append(buffer)
+                open_buffers.append(buffer)
+                opened += 1
+            if (name == 'address' or (name == 'div' and 'address' in classes.lower())) and 'address' not in open_kinds:
+                buffer = _Buffer('address', node)
+                addresses.append(buffer)
+                open_buffers.append(buffer)
+                opened += 1
+
+            if name == 'a':
+                href = node.get('href')
+                if href is not None:
+                    if href.startswith('mailto:'):
+                        email = href[len('mailto:'):].split('?')[0].strip()
+                        self._append_unique(contact_info['email'], email, seen_emails)
+                    match = SOCIAL_PATTERN.search(href)
+                    if match and href not in seen_social:
+                        seen_social.add(href)
+                        contact_info['social_media'].append({'platform': match.group().lower(), 'url': href})
+                    if self.is_internal(href):
+                        buffer = _Buffer('link', node)
+                        links.append((urljoin(url, href), buffer))
+                        open_buffers.append(buffer)
+                        opened += 1
+
+            if opened:
+                stack.append((None, opened))
+            for child in reversed(node.contents):
+                stack.append((child, containers))
+
+        if title is not None:
+            content['title'] = title.text
+
+        for buffer in blocks:
+            text = buffer.text
+            if text:
+                content['main_content'].append({'type': buffer.tag.name, 'content': text})
+        for buffer in services:
+            text = buffer.text
+            if text:
+                content['main_content'].append({'type': 'service', 'content': text})
+
+        for buffer in addresses:
+            self._append_unique(contact_info['address'], buffer.text, seen_addresses)
+        content['contact_info'] = contact_info
+
+        for full_url, buffer in links:
+            content['links'].append({
+                'url': full_url,
+                'text': buffer.text or buffer.tag.get('title', '')
+            })
+
+        return content
@@ -0,0 +1,313 @@
+import time
+import logging
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from lexical_index import fold_accents
+
+# Mots désignant l'ensemble des coordonnées (« vos coordonnées »)
+CONTACT_KEYWORDS = ['contact', 'coordonnées']
+
+# Mots désignant une information de contact précise (« votre numéro »)
+CONTACT_FIELDS = {
+    'phone': ['téléphone', 'numéro', 'numéro de téléphone', 'tél'],
+    'email': ['email', 'e-mail', 'mail', 'courriel', 'adresse mail', 'adresse e-mail', 'adresse email'],
+    'address': ['adresse', 'adresse postale', 'locaux']
+}
+
+# Verbes d'une demande de contact (« comment vous joindre »), par information demandée
+CONTACT_VERBS = {
+    '': ['contacter', 'joindre'],
+    'phone': ['appeler', 'téléphoner'],
+    'email': ['écrire'],
+    'address': ['trouver']
+}
+
+# Seules les demandes adressées à l'entreprise sont des questions de contact :
+# « votre numéro », « vous joindre », « numéro d'IT-Work », « où êtes-vous ».
+# « Mon téléphone ne marche plus » ou « joindre mon imprimante » passent par le LLM.
+CONTACT_OWNERS = ['votre', 'vos']
+CONTACT_PHRASES = {'address': ['où êtes-vous', 'où se trouvent vos locaux']}
+
+# Demandes explicites d'un lien vers une page
+LINK_REQUESTS = ['lien vers', 'lien de la page', 'lien de votre', 'lien du site', 'url de la page',
+                 'url de votre', 'adresse de la page', 'adresse du site', 'adresse de votre site']
+
+# Sinon, un verbe de demande et un lien ou une page du site (« donnez-moi le lien »,
+# « où est la page cloud ») ; les pages de l'utilisateur (« ma page », « mon site »)
+# ne comptent pas. « Ma page web ne s'affiche plus sur mon serveur », « Sur la page
+# cloud, combien coûte le stockage ? » ou « Le lien de mon site ne marche plus avec
+# le wifi » passent par le LLM.
+LINK_VERBS = ['donner', 'donnez', 'donne', 'envoyer', 'envoyez', 'envoie', 'montrer', 'montrez', 'montre',
+              'indiquer', 'indiquez', 'indique', 'partager', 'partagez', 'avez', 'auriez', 'avoir', 'voir',
+              'consulter', 'trouver', 'trouve', 'acceder', 'cherche', 'chercher', 'où est', 'où se trouve']
+LINK_NOUNS = ['lien', 'page', 'url', 'site']
+LINK_DETERMINERS = ['le', 'la', "l'", 'les', 'un', 'une', 'du', 'des', 'votre', 'vos']
+
+class AhoCorasick:
+    """
+    Automate d'Aho-Corasick : recherche de tous les mots-clés en un seul
+    parcours du texte, quel que soit leur nombre.
+    """
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[Tuple[int, str]]] = [[]]
+
+    def add(self, pattern: str, value: str):
+        state = 0
+        for char in pattern:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.outputs[state].append((len(pattern), value))
+
+    def build(self):
+        """Calcule les liens d'échec (parcours en largeur de l'arbre)"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """Toutes les occurrences : (début, fin, valeur)"""
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, value in self.outputs[state]:
+                matches.append((position - length + 1, position + 1, value))
+        return matches
+
+class IntentMatch:
+    """Intentions repérées dans une question"""
+
+    def __init__(self):
+        self.contact = False
+        self.contact_fields: Set[str] = set()
+        self.needs: List[str] = []
+        self.link = False
+
+class IntentRouter:
+    """
+    Réponses directes aux questions simples, sans appel au LLM.
+
+    Tous les mots-clés (contact, besoins, demandes de lien) sont compilés une
+    seule fois dans un automate d'Aho-Corasick et ne reconnaissent que des mots
+    entiers (pluriel compris). Les intentions sans ambiguïté (coordonnées de
+    l'entreprise explicitement demandées, lien vers une page du site
+    explicitement demandé) reçoivent une réponse préparée ; tout le reste passe
+    par le LLM.
+    """
+
+    def __init__(self, knowledge_base, contact_keywords: Iterable[str], max_words: int = 15,
+                 company_name: str = 'IT-Work'):
+        self.setup_logging()
+        self.contact_keywords = list(contact_keywords)
+        self.company_name = company_name
+        self.max_words = max_words
+
+        # Compteurs de trafic
+        self.requests = 0
+        self.routed = Counter()
+        self.route_time = 0.0
+
+        self.load(knowledge_base)
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('IntentRouter')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return fold_accents(text.lower().replace('’', "'"))
+
+    @staticmethod
+    def is_word(text: str, start: int, end: int) -> bool:
+        """Occurrence délimitée par des frontières de mot (marque du pluriel tolérée)"""
+        if start > 0 and text[start - 1].isalnum():
+            return False
+        if end < len(text) and text[end] in 'sx':
+            end += 1
+        return end == len(text) or not text[end].isalnum()
+
+    def contact_phrases(self) -> List[Tuple[str, str]]:
+        """Formulations d'une demande des coordonnées de l'entreprise, avec l'information demandée"""
+        company = self.normalize(self.company_name)
+        companies = {company, company.replace('-', ' '), company.replace('-', '')}
+        words = [('', keyword) for keyword in self.contact_keywords]
+        words += [(field, keyword) for field, keywords in CONTACT_FIELDS.items() for keyword in keywords]
+        verbs = [(field, verb) for field, verbs in CONTACT_VERBS.items() for verb in verbs]
+
+        phrases = [(field, phrase) for field, phrases in CONTACT_PHRASES.items() for phrase in phrases]
+        for field, word in words:
+            phrases += [(field, f"{owner} {word}") for owner in CONTACT_OWNERS]
+            for name in companies:
+                elided = f"d'{name}" if name[:1] in "aeiouyh" else f"de {name}"
+                phrases += [(field, f"{word} {elided}"), (field, f"{word} {name}")]
+        for field, verb in verbs:
+            phrases.append((field, f"vous {verb}"))
+            phrases += [(field, f"{verb} {name}") for name in companies]
+        return phrases
+
+    def load(self, knowledge_base):
+        """Compile les mots-clés et charge les informations de la base de connaissances"""
+        self.urls_map = dict(knowledge_base.urls_map)
+        self.page_titles = dict(knowledge_base.page_titles)
+        self.contact_info = knowledge_base.get_contact_info()
+
+        self.matcher = AhoCorasick()
+        for field, phrase in self.contact_phrases():
+            self.matcher.add(self.normalize(phrase), f'contact:{field}')
+        for need, keywords in knowledge_base.needs_keywords.items():
+            for keyword in keywords:
+                self.matcher.add(self.normalize(keyword), f'need:{need}')
+        for phrase in LINK_REQUESTS:
+            self.matcher.add(self.normalize(phrase), 'link:request')
+        for verb in LINK_VERBS:
+            self.matcher.add(self.normalize(verb), 'link:verb')
+        for noun in LINK_NOUNS:
+            for determiner in LINK_DETERMINERS:
+                separator = '' if determiner.endswith("'") else ' '
+                self.matcher.add(self.normalize(f"{determiner}{separator}{noun}"), 'link:noun')
+        self.matcher.build()
+
+    def match(self, text: str) -> IntentMatch:
+        """Repère les intentions de la question (mots entiers, le mot-clé le plus long l'emporte)"""
+        text = self.normalize(text)
+        matches = [
+            (start, end, value) for start, end, value in self.matcher.find(text)
+            if self.is_word(text, start, end)
+        ]
+
+        # Les marqueurs de demande de lien se cumulent sans masquer les autres mots-clés
+        link_markers = {value for start, end, value in matches if value.startswith('link:')}
+        matches = [match for match in matches if not match[2].startswith('link:')]
+
+        # Entre deux mots-clés qui se chevauchent, le plus long est retenu
+        matches.sort(key=lambda item: (item[0], -(item[1] - item[0])))
+        kept = []
+        for start, end, value in matches:
+            if kept and start < kept[-1][1] and (start, end) != kept[-1][:2]:
+                continue
+            kept.append((start, end, value))
+
+        # Un mot-clé de contact (« téléphone ») l'emporte sur le besoin homonyme
+        contact_spans = {(start, end) for start, end, value in kept if value.startswith('contact:') and value != 'contact:'}
+
+        result = IntentMatch()
+        for start, end, value in kept:
+            kind, _, name = value.partition(':')
+            if kind == 'contact':
+                result.contact = True
+                if name:
+                    result.contact_fields.add(name)
+            elif kind == 'need' and name not in result.needs and (start, end) not in contact_spans:
+                result.needs.append(name)
+        result.link = 'link:request' in link_markers or {'link:verb', 'link:noun'} <= link_markers
+        return result
+
+    def contact_answer(self, fields: Set[str]) -> Optional[str]:
+        """Réponse préparée pour les informations de contact demandées"""
+        info = self.contact_info
+        phones, emails, addresses = info.get('phone') or [], info.get('email') or [], info.get('address') or []
+
+        # Informations générales si aucun champ précis n'est demandé
+        if not fields:
+            lines = []
+            if phones:
+                lines.append(f"- par téléphone : {' ou '.join(phones)}")
+            if emails:
+                lines.append(f"- par email : {', '.join(emails)}")
+            if addresses:
+                lines.append(f"- à l'adresse : {addresses[0]}")
+            if not lines:
+                return None
+            contact_url = self.urls_map.get('contact')
+            footer = f"\n\nVous pouvez aussi passer par la page contact : {contact_url}" if contact_url else ''
+            return f"Vous pouvez joindre {self.company_name} :\n" + "\n".join(lines) + footer
+
+        # Élision devant une voyelle : « d'IT-Work », « de Acme » -> « d'Acme »
+        of_company = f"d'{self.company_name}" if self.company_name[:1].lower() in "aeiouyéèh" else f"de {self.company_name}"
+        parts = []
+        if 'phone' in fields:
+            if not phones:
+                return None
+            parts.append(f"Vous pouvez joindre {self.company_name} par téléphone au {' ou au '.join(phones)}.")
+        if 'email' in fields:
+            if not emails:
+                return None
+            parts.append(f"Vous pouvez écrire à {self.company_name} à l'adresse {', '.join(emails)}.")
+        if 'address' in fields:
+            if not addresses:
+                return None
+            parts.append(f"Les locaux {of_company} se trouvent au {addresses[0]}.")
+        return " ".join(parts) + " N'hésitez pas, l'équipe vous répondra avec plaisir !"
+
+    def link_answer(self, need: str) -> Optional[str]:
+        """Réponse préparée avec le lien vers la page d'un besoin"""
+        url = self.urls_map.get(need)
+        if not url:
+            return None
+        title = self.page_titles.get(url)
+        label = f"« {title} »" if title else need.capitalize()
+        return f"Voici la page {label} : {url}"
+
+    def answer(self, match: IntentMatch) -> Tuple[Optional[str], Optional[str]]:
+        """Réponse préparée et nom de l'intention, si la question est sans ambiguïté"""
+        topics = [need for need in match.needs if need != 'contact']
+
+        # Lien vers une page : une seule page possible
+        if match.link:
+            if len(topics) == 1:
+                return self.link_answer(topics[0]), f"link:{topics[0]}"
+            if not topics and (match.contact or 'contact' in match.needs):
+                return self.link_answer('contact'), 'link:contact'
+            return None, None
+
+        # Coordonnées : la question ne porte sur aucun autre sujet
+        if match.contact and not topics:
+            fields = match.contact_fields
+            name = 'contact:' + ('+'.join(sorted(fields)) if fields else 'all')
+            return self.contact_answer(fields), name
+        return None, None
+
+    def route(self, text: str) -> Optional[str]:
+        """Réponse directe à la question, ou None pour passer par le LLM"""
+        start_time = time.perf_counter()
+        self.requests += 1
+        response = None
+        if len(text.split()) <= self.max_words:
+            response, intent = self.answer(self.match(text))
+            if response is not None:
+                self.routed[intent] += 1
+        self.route_time += time.perf_counter() - start_time
+        return response
+
+    def get_stats(self) -> Dict:
+        """Part du trafic absorbée par les réponses directes"""
+        routed = sum(self.routed.values())
+        return {
+            'requests': self.requests,
+            'routed': routed,
+            'fallback': self.requests - routed,
+            'fast_path_ratio': round(routed / self.requests, 3) if self.requests else 0.0,
+            'by_intent': dict(self.routed),
+            'average_route_time_us': round(1e6 * self.route_time / self.requests, 1) if self.requests else 0.0
+        }
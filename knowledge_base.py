@@ -1,70 +1,140 @@
 import os
+import sys
 import json
+import time
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional
+from collections import Counter
+from typing import Callable, List, Dict, Optional, Tuple
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from pathlib import Path
+from embedding_cache import EmbeddingCache
+from chunker import PassageChunker
+from crawl_manifest import load_changes
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from document_store import SharedSnapshot
+from corpus_store import CorpusStore
+from dedup import NearDuplicateDetector, chunk_unique_pages
+from vector_index import VectorIndexSpec, normalize
+from embedders import DEFAULT_MODEL_NAME, MODEL_CACHE_DIR, Embedder, create_embedder
+from metrics import span
+
+# Pages du site IT-Work proposées selon les besoins détectés
+DEFAULT_URLS_MAP = {
+    "cloud": "https://it-work.fr/cloud/",
+    "voip": "https://it-work.fr/voip/",
+    "medical": "https://it-work.fr/medical/",
+    "retail": "https://it-work.fr/retails/",
+    "entreprises": "https://it-work.fr/entreprises/",
+    "associations": "https://it-work.fr/associations/",
+    "hotellerie": "https://it-work.fr/hotellerie/",
+    "reseaux": "https://it-work.fr/reseaux/",
+    "contact": "https://it-work.fr/contact/",
+    "offres": "https://it-work.fr/nos-offres/",
+    "about": "https://it-work.fr/qui-sommes-nous/"
+}
+
+# Mots-clés associés aux besoins
+DEFAULT_NEEDS_KEYWORDS = {
+    "cloud": ["cloud", "hébergement", "serveur", "stockage", "sauvegarde", "données"],
+    "voip": ["téléphonie", "voip", "communication", "téléphone", "appel"],
+    "medical": ["médical", "santé", "cabinet", "clinique", "hôpital"],
+    "retail": ["commerce", "magasin", "retail", "boutique", "point de vente"],
+    "entreprises": ["entreprise", "société", "business", "pme", "pmi"],
+    "associations": ["association", "asso", "non-profit", "but non lucratif"],
+    "hotellerie": ["hôtel", "restaurant", "tourisme", "hébergement"],
+    "reseaux": ["réseau", "infrastructure", "wifi", "internet", "câblage"],
+    "contact": ["contact", "joindre", "appeler", "rendez-vous", "devis"],
+    "offres": ["offre", "service", "prix", "tarif", "pack"],
+    "about": ["entreprise it-work", "à propos", "qui sommes-nous", "présentation"]
+}
 
 class KnowledgeBase:
-    def __init__(self):
+    def __init__(self, embedder: Optional[Embedder] = None, data_dir: str = "scraped_data",
+                 urls_map: Optional[Dict[str, str]] = None,
+                 needs_keywords: Optional[Dict[str, List[str]]] = None,
+                 cache_dir: str = 'index_cache'):
         self.setup_logging()
+        start_time = time.perf_counter()
+        self.model_name = DEFAULT_MODEL_NAME
+        self.snapshot_dir = None
         
-        # Configuration du cache local
-        cache_dir = Path.home() / '.cache' / 'it-work-chatbot'
-        cache_dir.mkdir(parents=True, exist_ok=True)
+        if embedder is None:
+            # Configuration du cache local
+            model_cache_dir = MODEL_CACHE_DIR
+            model_cache_dir.mkdir(parents=True, exist_ok=True)
+            
+            # Configuration de Hugging Face
+            os.environ['TRANSFORMERS_CACHE'] = str(model_cache_dir)
+            os.environ['HF_HOME'] = str(model_cache_dir)
+            
+            # Initialisation du backend d'embedding (EMBEDDING_BACKEND)
+            embedder = create_embedder(self.model_name, cache_folder=str(model_cache_dir))
         
-        # Configuration de Hugging Face
-        os.environ['TRANSFORMERS_CACHE'] = str(cache_dir)
-        os.environ['HF_HOME'] = str(cache_dir)
+        # Backend partagé lors d'un rechargement ; en mode partagé, l'encodage
+        # est délégué au service d'embedding et aucun modèle n'est chargé ici
+        self.embedder = embedder
+        model_time = time.perf_counter()
         
-        # Initialisation du modèle d'embedding
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2',
-                                       cache_folder=str(cache_dir))
+        # Cache disque des embeddings et de l'index, à côté de scraped_data
+        self.cache_dir = cache_dir
+        self.embedding_cache = EmbeddingCache(self.embedder.name, cache_dir=cache_dir)
         
-        # Création de l'index FAISS
-        self.dimension = 384  # Dimension des embeddings du modèle MiniLM
-        self.index = faiss.IndexFlatL2(self.dimension)
+        # Création de l'index FAISS (type choisi par VECTOR_INDEX, similarité cosinus)
+        self.dimension = self.embedder.dimension  # 384 pour le modèle MiniLM
+        self.vector_index = VectorIndexSpec.from_env()
+        self.index = faiss.IndexFlatIP(self.dimension)
+        self.index_version = 0  # Incrémentée à chaque construction de l'index
         
-        # Stockage des données
+        # Index lexical BM25, fusionné avec la recherche vectorielle (RRF)
+        self.lexical_index = BM25Index()
+        self.hybrid_search = os.getenv('HYBRID_SEARCH', '1') != '0'
+        self.decisive_ratio = float(os.getenv('HYBRID_DECISIVE_RATIO', '0'))
+        self.rrf_k = 60
+        self.min_relevance = 30  # Score minimal (cosinus × 100) d'un résultat vectoriel
+        
+        # Découpage des pages en passages et détection des pages quasi identiques
+        self.chunker = PassageChunker.from_env()
+        self.duplicate_detector = NearDuplicateDetector.from_env()
+        self.duplicates = []  # Pages écartées au dernier chargement
+        
+        # Stockage des données (un document par passage)
+        self.data_dir = data_dir
+        self.corpus = None  # Corpus SQLite : liens et coordonnées lus à la demande
         self.documents = []
         self.urls = []
         self.contact_info = {}
         self.page_titles = {}
-        self.urls_map = {
-            "cloud": "https://it-work.fr/cloud/",
-            "voip": "https://it-work.fr/voip/",
-            "medical": "https://it-work.fr/medical/",
-            "retail": "https://it-work.fr/retails/",
-            "entreprises": "https://it-work.fr/entreprises/",
-            "associations": "https://it-work.fr/associations/",
-            "hotellerie": "https://it-work.fr/hotellerie/",
-            "reseaux": "https://it-work.fr/reseaux/",
-            "contact": "https://it-work.fr/contact/",
-            "offres": "https://it-work.fr/nos-offres/",
-            "about": "https://it-work.fr/qui-sommes-nous/"
-        }
+        self.urls_map = dict(DEFAULT_URLS_MAP if urls_map is None else urls_map)
+        self.needs_keywords = dict(DEFAULT_NEEDS_KEYWORDS if needs_keywords is None else needs_keywords)
         
-        # Mots-clés associés aux besoins
-        self.needs_keywords = {
-            "cloud": ["cloud", "hébergement", "serveur", "stockage", "sauvegarde", "données"],
-            "voip": ["téléphonie", "voip", "communication", "téléphone", "appel"],
-            "medical": ["médical", "santé", "cabinet", "clinique", "hôpital"],
-            "retail": ["commerce", "magasin", "retail", "boutique", "point de vente"],
-            "entreprises": ["entreprise", "société", "business", "pme", "pmi"],
-            "associations": ["association", "asso", "non-profit", "but non lucratif"],
-            "hotellerie": ["hôtel", "restaurant", "tourisme", "hébergement"],
-            "reseaux": ["réseau", "infrastructure", "wifi", "internet", "câblage"],
-            "contact": ["contact", "joindre", "appeler", "rendez-vous", "devis"],
-            "offres": ["offre", "service", "prix", "tarif", "pack"],
-            "about": ["entreprise it-work", "à propos", "qui sommes-nous", "présentation"]
+        # Chargement des données (le dernier crawl est alors déjà pris en compte)
+        self.applied_crawl_id = self.latest_crawl_id()
+        if self.embedder.remote:
+            load_time = time.perf_counter()
+            with span('load_shared'):
+                self.load_shared()
+        else:
+            with span('load_knowledge'):
+                self.load_knowledge()
+            load_time = time.perf_counter()
+            with span('build_index'):
+                self.build_index()
+        end_time = time.perf_counter()
+
+        # Durées des phases de construction, reprises dans la chronologie du démarrage
+        self.build_times = {
+            'embedding_model': model_time - start_time,
+            'load_knowledge': load_time - model_time,
+            'build_index': end_time - load_time
         }
-        
-        # Chargement des données
-        self.load_knowledge()
-        self.build_index()
+        self.logger.info(
+            f"Base de connaissances prête en {end_time - start_time:.2f}s "
+            f"(modèle : {model_time - start_time:.2f}s, "
+            f"chargement : {load_time - model_time:.2f}s, "
+            f"index : {end_time - load_time:.2f}s)"
+        )
 
     def setup_logging(self):
         self.logger = logging.getLogger('KnowledgeBase')
@@ -78,60 +148,120 @@ class KnowledgeBase:
     def load_knowledge(self):
         """Charge toutes les données scrapées dans la base de connaissances"""
         try:
-            data_dir = "scraped_data"
+            self.corpus = CorpusStore.open(self.data_dir)
+            if self.corpus is not None:
+                self.load_corpus()
+                return
+
+            # Ancien format : un fichier JSON par page
+            data_dir = self.data_dir
             if not os.path.exists(data_dir):
                 self.logger.warning("Dossier de données non trouvé")
                 return
 
+            pages = []
             for file in os.listdir(data_dir):
                 if file.endswith('.json'):
                     file_path = os.path.join(data_dir, file)
                     try:
                         with open(file_path, 'r', encoding='utf-8') as f:
                             data = json.load(f)
+                        
+                        # Fichiers annexes (ex. contact_info.json) sans page associée
+                        if 'url' not in data:
+                            continue
                             
-                            # Stockage des informations de contact
-                            if data.get('contact_info'):
-                                self.contact_info[data['url']] = data['contact_info']
-                            
-                            # Stockage des titres de pages
-                            if data.get('title'):
-                                self.page_titles[data['url']] = data['title']
-                            
-                            # Traitement du contenu principal
-                            content_parts = []
-                            
-                            # Ajout du titre et de la meta description
-                            if data.get('title'):
-                                content_parts.append(f"Titre: {data['title']}")
-                            if data.get('meta_description'):
-                                content_parts.append(f"Description: {data['meta_description']}")
-                            
-                            # Traitement du contenu principal
-                            if data.get('main_content'):
-                                for item in data['main_content']:
-                                    if isinstance(item, dict):
-                                        content_parts.append(item.get('content', ''))
-                            
-                            # Création du document
-                            document = {
-                                'content': ' '.join(content_parts),
-                                'url': data['url'],
-                                'title': data.get('title', ''),
-                                'links': data.get('links', []),
-                                'contact_info': data.get('contact_info', {})
-                            }
-                            
-                            self.documents.append(document)
-                            self.urls.append(data['url'])
+                        # Stockage des informations de contact
+                        if data.get('contact_info'):
+                            self.contact_info[data['url']] = data['contact_info']
+                        
+                        # Stockage des titres de pages
+                        if data.get('title'):
+                            self.page_titles[data['url']] = data['title']
+                        
+                        pages.append(data)
                             
                     except Exception as e:
                         self.logger.error(f"Erreur lors du chargement de {file_path}: {str(e)}")
             
-            self.logger.info(f"Base de connaissances chargée : {len(self.documents)} documents")
+            # Repérage des blocs répétés sur de nombreuses pages (menus, en-têtes)
+            self.chunker.fit(pages)
+            
+            # Découpage de chaque page en passages rattachés à leur URL, sans les quasi-doublons
+            kept, self.duplicates = chunk_unique_pages(pages, self.chunker, self.duplicate_detector)
+            for item in kept:
+                data = item['page']
+                for passage in item['passages']:
+                    passage['links'] = data.get('links', [])
+                    passage['contact_info'] = data.get('contact_info', {})
+                    self.documents.append(passage)
+                    self.urls.append(data['url'])
+            
+            self.logger.info(f"Base de connaissances chargée : {len(pages)} pages "
+                             f"({len(self.duplicates)} quasi-doublons écartés), {len(self.documents)} passages")
         except Exception as e:
             self.logger.error(f"Erreur lors du chargement de la base de connaissances: {str(e)}")
 
+    def load_corpus(self):
+        """Charge les pages depuis le corpus SQLite, une page à la fois"""
+        # Premier parcours : blocs répétés sur de nombreuses pages (menus, en-têtes)
+        self.chunker.fit(self.corpus.iter_pages())
+
+        # Second parcours : découpage en passages sans les quasi-doublons,
+        # seul l'identifiant de la page est conservé
+        kept, self.duplicates = chunk_unique_pages(self.corpus.iter_pages(), self.chunker, self.duplicate_detector)
+        for item in kept:
+            page = item['page']
+            if page.get('contact_info'):
+                self.contact_info[page['url']] = page['contact_info']
+            if page.get('title'):
+                self.page_titles[page['url']] = page['title']
+            for passage in item['passages']:
+                passage['page_id'] = page['id']
+                self.documents.append(passage)
+                self.urls.append(page['url'])
+
+        self.logger.info(f"Base de connaissances chargée depuis {self.corpus.path} : "
+                         f"{len(kept) + len(self.duplicates)} pages ({len(self.duplicates)} quasi-doublons écartés), "
+                         f"{len(self.documents)} passages")
+
+    def load_shared(self):
+        """Ouvre l'instantané partagé exporté par le service d'embedding (fichiers mappés)"""
+        snapshot_dir = Path(self.embedder.info()['snapshot'])
+        self.index, self.documents, metadata = SharedSnapshot.load(snapshot_dir)
+        self.vector_index.configure(self.index)
+        self.page_titles = metadata.get('page_titles', {})
+        self.contact_info = metadata.get('contact_info', {})
+        self.corpus = CorpusStore.open(self.data_dir)
+        self.lexical_index.build([doc['content'] for doc in self.documents])
+        self.snapshot_dir = snapshot_dir
+        self.index_version += 1
+        self.logger.info(f"Instantané partagé chargé depuis {snapshot_dir} ({len(self.documents)} passages)")
+
+    def reload_snapshot(self) -> "KnowledgeBase":
+        """Construit un nouvel instantané avec les mêmes ressources (modèle ou service d'embedding)"""
+        if self.embedder.remote:
+            self.embedder.rebuild(self.snapshot_dir)
+        return KnowledgeBase(embedder=self.embedder, data_dir=self.data_dir, urls_map=self.urls_map,
+                             needs_keywords=self.needs_keywords, cache_dir=self.cache_dir)
+
+    def memory_bytes(self) -> int:
+        """Estimation de la mémoire occupée : index vectoriel, passages et index lexical"""
+        index_bytes = faiss.serialize_index(self.index).nbytes if self.index.ntotal else 0
+        document_bytes = sum(
+            sys.getsizeof(doc) + sum(sys.getsizeof(value) for value in doc.values() if isinstance(value, str))
+            for doc in self.documents
+        )
+        return index_bytes + document_bytes + self.lexical_index.memory_bytes()
+
+    def latest_crawl_id(self) -> Optional[str]:
+        try:
+            changes = load_changes(self.data_dir)
+            return changes.get('crawl_id') if changes else None
+        except Exception as e:
+            self.logger.warning(f"Liste des changements illisible : {str(e)}")
+            return None
+
     def build_index(self):
         """Construit l'index vectoriel des documents"""
         try:
@@ -139,52 +269,151 @@ class KnowledgeBase:
                 self.logger.warning("Aucun document à indexer")
                 return
 
-            # Création des embeddings pour chaque document
+            # Création des embeddings, seuls les documents nouveaux ou modifiés sont encodés
             texts = [doc['content'] for doc in self.documents]
-            embeddings = self.model.encode(texts, convert_to_tensor=True)
-            embeddings = embeddings.cpu().numpy()
+            self.lexical_index.build(texts)
+            embeddings, changed = self.embedding_cache.get_embeddings(texts, self.encode_documents)
 
-            # Ajout à l'index FAISS
-            self.index = faiss.IndexFlatL2(self.dimension)
-            self.index.add(embeddings.astype(np.float32))
-            self.logger.info(f"Index vectoriel construit avec {len(texts)} documents")
+            # Réutilisation de l'index en cache (déjà entraîné) si le corpus n'a pas changé
+            key = self.vector_index.key
+            index = None if changed else self.embedding_cache.load_index(key)
+            if index is not None and index.ntotal == len(texts):
+                self.index = self.vector_index.configure(index)
+                self.index_version += 1
+                self.logger.info(f"Index vectoriel {key} chargé depuis le cache ({len(texts)} documents)")
+                return
+
+            # Construction (et entraînement) de l'index FAISS sur les vecteurs normalisés
+            self.index = self.vector_index.build(embeddings)
+            self.embedding_cache.save_index(self.index, key)
+            self.index_version += 1
+            self.logger.info(f"Index vectoriel {key} construit avec {len(texts)} documents")
 
         except Exception as e:
             self.logger.error(f"Erreur lors de la construction de l'index: {str(e)}")
             raise
 
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        """Encode une liste de textes avec le modèle d'embedding"""
+        return self.embedder.encode_documents(texts)
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode un lot de requêtes en vecteurs float32"""
+        return np.asarray(self.embedder.encode_queries(queries), dtype=np.float32).reshape(len(queries), -1)
+
+    def dense_relevance(self, similarity: float) -> float:
+        """Score de pertinence (0 à 100) d'une similarité cosinus"""
+        return max(0, min(100, similarity * 100))
+
+    def page_details(self, doc: Dict) -> Tuple[List[Dict], Dict]:
+        """Liens et coordonnées de la page d'un passage"""
+        if 'page_id' in doc and self.corpus is not None:
+            return self.corpus.links(doc['page_id']), self.corpus.contact_info(doc['page_id'])
+        return doc.get('links', []), doc.get('contact_info', {})
+
+    def make_result(self, idx: int, relevance_score: float) -> Dict:
+        doc = self.documents[idx]
+        links, contact_info = self.page_details(doc)
+        return {
+            'content': doc['content'],
+            'text': doc.get('text', doc['content']),
+            'url': doc['url'],
+            'title': doc['title'],
+            'relevance_score': relevance_score,
+            'links': links,
+            'contact_info': contact_info
+        }
+
+    def collect_results(self, similarities: np.ndarray, indices: np.ndarray) -> List[Dict]:
+        """Convertit les résultats FAISS d'une requête en documents pertinents"""
+        relevant_content = []
+        for idx, similarity in zip(indices, similarities):
+            if idx >= 0 and idx < len(self.documents):
+                # Ne garder que les résultats suffisamment pertinents
+                relevance_score = self.dense_relevance(similarity)
+                if relevance_score >= self.min_relevance:
+                    relevant_content.append(self.make_result(idx, relevance_score))
+
+        return relevant_content
+
+    def fuse_results(self, similarities: Optional[np.ndarray], indices: Optional[np.ndarray],
+                     lexical_hits: List[Tuple[int, float, int]], k: int) -> List[Dict]:
+        """Fusionne les candidats vectoriels et lexicaux par rang réciproque (RRF)"""
+        rankings = [[doc_id for doc_id, _, _ in lexical_hits]]
+        if indices is not None:
+            rankings.append([
+                int(idx) for idx, similarity in zip(indices, similarities)
+                if 0 <= idx < len(self.documents) and self.dense_relevance(similarity) >= self.min_relevance
+            ])
+
+        # Score ramené sur 100 : 100 pour un document classé premier partout
+        best_score = len(rankings) / (self.rrf_k + 1)
+        fused = reciprocal_rank_fusion(rankings, k=self.rrf_k)[:k]
+        return [self.make_result(idx, 100 * score / best_score) for idx, score in fused]
+
+    def search_batch(self, queries: List[str], ks: List[int],
+                     encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+                     timings: Optional[Counter] = None) -> List[Tuple[List[Dict], Optional[np.ndarray]]]:
+        """
+        Recherche hybride d'un lot de requêtes : BM25 puis FAISS, fusionnés par RRF.
+
+        La recherche vectorielle (et l'encodage) est évitée pour les requêtes
+        dont la correspondance lexicale est décisive ; leur embedding est alors
+        None. Les durées de chaque étape sont ajoutées à `timings`.
+        """
+        encode = encode or self.encode_queries
+        timings = timings if timings is not None else Counter()
+        hybrid = self.hybrid_search and len(self.lexical_index) > 0
+        candidates = max(ks) * 4 if hybrid else max(ks)
+
+        # Étape lexicale : quelques listes de postings par requête
+        start_time = time.perf_counter()
+        lexical_hits = [[] for _ in queries]
+        dense_rows = list(range(len(queries)))
+        if hybrid:
+            dense_rows = []
+            for i, query in enumerate(queries):
+                terms = self.lexical_index.query_terms(query)
+                lexical_hits[i] = self.lexical_index.search_terms(terms, candidates)
+                if not BM25Index.is_decisive(lexical_hits[i], len(terms), self.decisive_ratio):
+                    dense_rows.append(i)
+        timings['lexical'] += time.perf_counter() - start_time
+
+        # Étape vectorielle pour les requêtes restantes
+        vectors = [None] * len(queries)
+        similarities = indices = None
+        if dense_rows:
+            start_time = time.perf_counter()
+            query_vectors = normalize(encode([queries[i] for i in dense_rows]))
+            timings['encode'] += time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            similarities, indices = self.index.search(query_vectors, k=candidates)
+            timings['dense'] += time.perf_counter() - start_time
+            for row, i in enumerate(dense_rows):
+                vectors[i] = query_vectors[row]
+
+        # Fusion des deux listes de candidats
+        start_time = time.perf_counter()
+        rows = {i: row for row, i in enumerate(dense_rows)}
+        results = []
+        for i, k in enumerate(ks):
+            row = rows.get(i)
+            dense_similarities = similarities[row] if row is not None else None
+            dense_indices = indices[row] if row is not None else None
+            if hybrid:
+                results.append((self.fuse_results(dense_similarities, dense_indices, lexical_hits[i], k), vectors[i]))
+            else:
+                results.append((self.collect_results(dense_similarities[:k], dense_indices[:k]), vectors[i]))
+        timings['fusion'] += time.perf_counter() - start_time
+        return results
+
     def search_knowledge(self, query: str, k: int = 5) -> List[Dict]:
         """
         Recherche les documents les plus pertinents pour une requête donnée
         """
         try:
-            # Création de l'embedding de la requête
-            query_vector = self.model.encode([query])[0].reshape(1, -1)
-
-            # Recherche des documents les plus proches
-            distances, indices = self.index.search(query_vector.astype(np.float32), k=k)
-            
-            relevant_content = []
-            for idx, distance in zip(indices[0], distances[0]):
-                if idx >= 0 and idx < len(self.documents):
-                    doc = self.documents[idx]
-                    
-                    # Calcul du score de pertinence (0 à 100)
-                    relevance_score = max(0, min(100, (1 - distance/10) * 100))
-                    
-                    # Ne garder que les résultats suffisamment pertinents
-                    if relevance_score >= 30:
-                        result = {
-                            'content': doc['content'],
-                            'url': doc['url'],
-                            'title': doc['title'],
-                            'relevance_score': relevance_score,
-                            'links': doc.get('links', []),
-                            'contact_info': doc.get('contact_info', {})
-                        }
-                        relevant_content.append(result)
-
-            return relevant_content
+            return self.search_batch([query], [k])[0][0]
 
         except Exception as e:
             self.logger.error(f"Erreur lors de la recherche: {str(e)}")
@@ -193,7 +422,7 @@ class KnowledgeBase:
     def get_contact_info(self) -> Dict[str, List[str]]:
         """Récupère les informations de contact depuis le fichier contact_info.json"""
         try:
-            contact_file = os.path.join('scraped_data', 'contact_info.json')
+            contact_file = os.path.join(self.data_dir, 'contact_info.json')
             if os.path.exists(contact_file):
                 with open(contact_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
@@ -209,11 +438,18 @@ class KnowledgeBase:
         if not relevant_content:
             return "Je n'ai pas trouvé d'information pertinente pour votre demande."
 
+        # Regroupement des passages par page d'origine, la plus pertinente en premier
+        pages = {}
+        for item in sorted(relevant_content, key=lambda x: x['relevance_score'], reverse=True):
+            pages.setdefault(item['url'], []).append(item)
+
         response_parts = []
         
-        for item in sorted(relevant_content, key=lambda x: x['relevance_score'], reverse=True):
-            response_parts.append(f"\nSource: {item['title']} ({item['url']})")
-            response_parts.append(f"Contenu pertinent: {item['content'][:500]}...")
+        for url, items in pages.items():
+            item = items[0]
+            response_parts.append(f"\nSource: {item['title']} ({url})")
+            for passage in items:
+                response_parts.append(f"Contenu pertinent: {passage.get('text', passage['content'])}")
             
             # Ajout des liens pertinents
             if item['links']:
@@ -244,3 +480,10 @@ class KnowledgeBase:
                 })
         
         return detected_needs
+
+def create_knowledge_base() -> KnowledgeBase:
+    """Crée la base de connaissances selon SHARED_INDEX (instantané partagé ou locale)"""
+    if os.getenv('SHARED_INDEX', '0') == '1':
+        from embedding_service import RemoteEmbedder
+        return KnowledgeBase(embedder=RemoteEmbedder.from_env())
+    return KnowledgeBase()
@@ -0,0 +1,223 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+from crawl_manifest import load_changes
+# Import différé : faiss et le backend d'embedding ne sont chargés qu'à la construction de la base
+if TYPE_CHECKING:
+    from knowledge_base import KnowledgeBase
+
+class KnowledgeBaseManager:
+    """
+    Rechargement à chaud de la base de connaissances.
+
+    Un nouvel instantané (`KnowledgeBase`) est construit en arrière-plan avec
+    les ressources déjà chargées (modèle ou service d'embedding), puis
+    remplace l'actuel par une simple affectation.
+    Les requêtes en cours gardent la référence vers l'ancien instantané et se
+    terminent normalement ; les suivantes utilisent le nouveau.
+    """
+
+    def __init__(self, knowledge_base: "KnowledgeBase", watch_interval: float = 0.0,
+                 on_swap: Optional[Callable[["KnowledgeBase"], None]] = None):
+        self.setup_logging()
+        self.current = knowledge_base
+        self.watch_interval = watch_interval
+        self.on_swap = on_swap
+
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.skipped_crawls = 0
+        self.last_reload: Optional[Dict] = None
+
+        # Dernier crawl pris en compte (crawl_changes.json)
+        self.applied_crawl_id = knowledge_base.applied_crawl_id
+
+        # Créés dans la boucle d'événements
+        self._lock = None
+        self._watcher = None
+        self._reload_task = None  # Rechargement lancé par start_reload()
+
+    @classmethod
+    def from_env(cls, knowledge_base: "KnowledgeBase",
+                 on_swap: Optional[Callable[["KnowledgeBase"], None]] = None) -> "KnowledgeBaseManager":
+        """Crée le gestionnaire à partir des variables d'environnement"""
+        return cls(
+            knowledge_base,
+            watch_interval=float(os.getenv('KB_WATCH_INTERVAL', '0')),
+            on_swap=on_swap
+        )
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('KnowledgeBaseManager')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @property
+    def reloading(self) -> bool:
+        # La tâche planifiée compte avant même d'avoir pris le verrou
+        pending = self._reload_task is not None and not self._reload_task.done()
+        return pending or (self._lock is not None and self._lock.locked())
+
+    def build_snapshot(self) -> "KnowledgeBase":
+        """Construit un nouvel instantané (exécuté hors de la boucle d'événements)"""
+        return self.current.reload_snapshot()
+
+    async def reload(self, reason: str = 'admin') -> Dict:
+        """Construit un nouvel instantané en arrière-plan puis le met en service"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        if self._lock.locked():
+            return {'status': 'in_progress'}
+
+        async with self._lock:
+            start_time = time.perf_counter()
+            self.logger.info(f"Rechargement de la base de connaissances ({reason})")
+            try:
+                loop = asyncio.get_event_loop()
+                snapshot = await loop.run_in_executor(None, self.build_snapshot)
+                if not snapshot.documents:
+                    raise ValueError("aucun document chargé, instantané actuel conservé")
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_reload = {
+                    'status': 'error',
+                    'reason': reason,
+                    'error': str(e),
+                    'duration': round(time.perf_counter() - start_time, 3),
+                    'finished_at': datetime.now().isoformat()
+                }
+                self.logger.error(f"Erreur lors du rechargement de la base de connaissances : {str(e)}")
+                return self.last_reload
+
+            # Version strictement croissante : invalide les caches liés à l'index
+            snapshot.index_version = self.current.index_version + 1
+            self.current = snapshot
+            self.applied_crawl_id = snapshot.applied_crawl_id
+            if self.on_swap is not None:
+                self.on_swap(snapshot)
+
+            self.reloads += 1
+            self.last_reload = {
+                'status': 'success',
+                'reason': reason,
+                'version': snapshot.index_version,
+                'documents': len(snapshot.documents),
+                'duration': round(time.perf_counter() - start_time, 3),
+                'finished_at': datetime.now().isoformat()
+            }
+            self.logger.info(f"Base de connaissances rechargée en {self.last_reload['duration']}s "
+                             f"(version {snapshot.index_version}, {len(snapshot.documents)} passages)")
+            return self.last_reload
+
+    def start_reload(self, reason: str = 'admin') -> bool:
+        """Lance un rechargement en tâche de fond ; False si un rechargement est déjà en cours"""
+        if self.reloading:
+            return False
+        self._reload_task = asyncio.ensure_future(self.reload(reason))
+        return True
+
+    def data_signature(self) -> Tuple:
+        """Signature des pages scrapées : corpus SQLite et fichiers JSON (nom, taille, date de modification)"""
+        data_dir = self.current.data_dir
+        if not os.path.exists(data_dir):
+            return ()
+        signature = []
+        for entry in os.scandir(data_dir):
+            # Le manifeste est réécrit à chaque crawl ; la liste des changements
+            # est lue par watch() (le fichier -shm du corpus est aussi modifié par les lectures)
+            page_file = entry.name.endswith('.json') and not entry.name.startswith('crawl_')
+            tracked = ('corpus.db', 'corpus.db-wal', 'crawl_changes.json')
+            if entry.is_file() and (page_file or entry.name in tracked):
+                stat = entry.stat()
+                signature.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(sorted(signature))
+
+    def pending_crawl(self) -> Optional[Dict]:
+        """Liste des changements d'un crawl pas encore pris en compte (None sinon)"""
+        try:
+            changes = load_changes(self.current.data_dir)
+        except Exception as e:
+            self.logger.warning(f"Liste des changements illisible : {str(e)}")
+            return None
+        if not changes or changes.get('crawl_id') == self.applied_crawl_id:
+            return None
+        return changes
+
+    async def watch(self):
+        """
+        Surveille scraped_data et recharge la base quand les pages changent.
+
+        Un nouveau crawl sans page ajoutée, modifiée ou supprimée (d'après
+        crawl_changes.json) ne déclenche aucun rechargement. Sinon, un nouvel
+        instantané est construit (seuls les passages nouveaux ou modifiés sont
+        encodés grâce au cache des embeddings) puis remplace l'actuel.
+        """
+        loop = asyncio.get_event_loop()
+        signature = await loop.run_in_executor(None, self.data_signature)
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                new_signature = await loop.run_in_executor(None, self.data_signature)
+                if new_signature == signature:
+                    continue
+                # Attente d'une signature stable : le crawl peut être encore en cours
+                await asyncio.sleep(self.watch_interval)
+                stable_signature = await loop.run_in_executor(None, self.data_signature)
+                if stable_signature != new_signature:
+                    continue
+
+                reason = 'watch'
+                changes = await loop.run_in_executor(None, self.pending_crawl)
+                if changes is not None:
+                    crawl_id = changes.get('crawl_id')
+                    counts = {kind: len(changes.get(kind, [])) for kind in ('added', 'modified', 'removed')}
+                    if not any(counts.values()):
+                        self.applied_crawl_id = crawl_id
+                        self.skipped_crawls += 1
+                        signature = stable_signature
+                        self.logger.info(f"Crawl {crawl_id} sans changement, index conservé")
+                        continue
+                    reason = f"crawl {crawl_id}"
+                    self.logger.info(f"Crawl {crawl_id} : {counts['added']} pages ajoutées, "
+                                     f"{counts['modified']} modifiées, {counts['removed']} supprimées")
+                result = await self.reload(reason)
+                if result.get('status') == 'success':
+                    signature = stable_signature
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la surveillance de scraped_data : {str(e)}")
+
+    def start_watching(self):
+        """Démarre la surveillance si un intervalle est configuré"""
+        if self.watch_interval > 0 and self._watcher is None:
+            self.logger.info(f"Surveillance de scraped_data toutes les {self.watch_interval:g}s")
+            self._watcher = asyncio.ensure_future(self.watch())
+
+    def get_stats(self) -> Dict:
+        """Version active de l'index et derniers rechargements"""
+        return {
+            'version': self.current.index_version,
+            'documents': len(self.current.documents),
+            'vector_index': self.current.vector_index.describe(self.current.index),
+            'duplicates_removed': len(self.current.duplicates),
+            'reloading': self.reloading,
+            'reloads': self.reloads,
+            'failed_reloads': self.failed_reloads,
+            'applied_crawl_id': self.applied_crawl_id,
+            'skipped_crawls': self.skipped_crawls,
+            'last_reload': self.last_reload,
+            'watch_interval': self.watch_interval
+        }
+
+    async def aclose(self):
+        """Arrête la surveillance"""
+        if self._watcher is not None:
+            self._watcher.cancel()
@@ -0,0 +1,120 @@
+import re
+import sys
+import math
+import heapq
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+# Mots vides français (sans accents, après élision)
+FRENCH_STOPWORDS = {
+    'a', 'au', 'aux', 'avec', 'c', 'ce', 'ces', 'cet', 'cette', 'd', 'dans', 'de', 'des', 'du',
+    'elle', 'elles', 'en', 'est', 'et', 'etre', 'eux', 'il', 'ils', 'j', 'je', 'l', 'la', 'le',
+    'les', 'leur', 'leurs', 'lui', 'm', 'ma', 'mais', 'me', 'mes', 'moi', 'mon', 'n', 'ne',
+    'ni', 'nos', 'notre', 'nous', 'on', 'ou', 'par', 'pas', 'pour', 'qu', 'que', 'quel',
+    'quelle', 'quelles', 'quels', 'qui', 's', 'sa', 'sans', 'se', 'ses', 'son', 'sont',
+    'sur', 't', 'ta', 'te', 'tes', 'toi', 'ton', 'tu', 'un', 'une', 'vos', 'votre', 'vous',
+    'y', 'comment', 'quoi', 'car', 'donc', 'si', 'plus', 'tres', 'fait', 'faire', 'peut',
+    'ai', 'as', 'avez', 'avons', 'suis', 'etes', 'sommes'
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def fold_accents(text: str) -> str:
+    """Supprime les accents (é -> e, ç -> c)"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def stem(token: str) -> str:
+    """Racinisation légère : marque du pluriel (réseaux -> reseau, services -> service)"""
+    if len(token) > 3 and not token.isdigit() and token[-1] in 'sx' and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Découpe un texte français en termes normalisés (minuscules, sans accents ni mots vides)"""
+    tokens = TOKEN_PATTERN.findall(fold_accents(text.lower()))
+    return [stem(token) for token in tokens if token not in FRENCH_STOPWORDS]
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fusionne plusieurs classements : score = somme des 1 / (k + rang)"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class BM25Index:
+    """
+    Index inversé en mémoire avec score BM25.
+
+    Construit une fois à côté de l'index FAISS ; une recherche ne parcourt
+    que les listes de postings des termes de la requête.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.idf: Dict[str, float] = {}
+        self.doc_lengths: List[int] = []
+        self.average_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def build(self, texts: List[str]):
+        """Construit l'index à partir des textes (un document par texte)"""
+        postings = defaultdict(list)
+        self.doc_lengths = []
+        for doc_id, text in enumerate(texts):
+            terms = tokenize(text)
+            self.doc_lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                postings[term].append((doc_id, frequency))
+
+        self.postings = dict(postings)
+        count = len(texts)
+        self.average_length = sum(self.doc_lengths) / count if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def memory_bytes(self) -> int:
+        """Estimation de la mémoire des listes de postings et du vocabulaire"""
+        posting_size = sys.getsizeof((0, 0))
+        return sum(
+            sys.getsizeof(term) + sys.getsizeof(docs) + len(docs) * posting_size
+            for term, docs in self.postings.items()
+        ) + sys.getsizeof(self.doc_lengths)
+
+    def query_terms(self, query: str) -> List[str]:
+        """Termes distincts de la requête présents dans le vocabulaire"""
+        return [term for term in dict.fromkeys(tokenize(query)) if term in self.postings]
+
+    def search_terms(self, terms: List[str], k: int) -> List[Tuple[int, float, int]]:
+        """Les k meilleurs documents : (identifiant, score BM25, nombre de termes trouvés)"""
+        scores = defaultdict(float)
+        matched = Counter()
+        for term in terms:
+            idf = self.idf[term]
+            for doc_id, frequency in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+                matched[doc_id] += 1
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(doc_id, score, matched[doc_id]) for doc_id, score in best]
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float, int]]:
+        return self.search_terms(self.query_terms(query), k)
+
+    @staticmethod
+    def is_decisive(hits: List[Tuple[int, float, int]], term_count: int, ratio: float) -> bool:
+        """
+        La correspondance lexicale suffit-elle ? Le meilleur document contient
+        tous les termes de la requête et devance nettement le suivant.
+        """
+        if ratio <= 0 or not hits or term_count == 0 or hits[0][2] < term_count:
+            return False
+        return len(hits) == 1 or hits[0][1] >= ratio * hits[1][1]
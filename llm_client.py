@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import hashlib
+import random
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+import groq
+from groq import AsyncGroq
+from admission import PRIORITY_NEW, AdmissionController, SingleFlight
+from metrics import STAGE_SECONDS, UPSTREAM_ERRORS, UPSTREAM_FALLBACKS, UPSTREAM_RETRIES, record_usage, span
+
+# Erreurs transitoires pour lesquelles une nouvelle tentative a du sens
+RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.InternalServerError,
+    groq.APIConnectionError,  # Inclut APITimeoutError
+)
+
+class LLMDeadlineExceeded(Exception):
+    """Le délai maximal alloué à la requête est dépassé"""
+
+class LLMClient:
+    """
+    Client asynchrone de l'API Groq.
+
+    Partage un pool de connexions HTTP entre toutes les requêtes, limite le
+    nombre d'appels simultanés (file d'attente bornée, par priorité), regroupe
+    les appels identiques en cours, réessaie les erreurs transitoires (429/5xx)
+    avec un backoff exponentiel qui respecte Retry-After, applique un délai
+    maximal par requête et peut basculer sur un modèle de secours.
+    """
+
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 base_url: Optional[str] = None,
+                 model: str = "mixtral-8x7b-32768",
+                 fallback_model: Optional[str] = None,
+                 max_concurrency: int = 8,
+                 max_queue: int = 32,
+                 max_queue_wait: float = 10.0,
+                 single_flight: bool = True,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 deadline: float = 30.0,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 20.0,
+                 max_connections: int = 20):
+        self.setup_logging()
+        self.model = model
+        self.fallback_model = fallback_model
+        self.max_concurrency = max_concurrency
+        self.single_flight = single_flight
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+
+        # Pool de connexions HTTP partagé (keep-alive) entre toutes les requêtes
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.http_client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections)
+        )
+        # Les nouvelles tentatives sont gérées ici, pas par le SDK
+        self.client = AsyncGroq(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,
+            http_client=self.http_client
+        )
+
+        # Admission des appels (file bornée) et regroupement des appels identiques
+        self.admission = AdmissionController(max_concurrency, max_queue, max_queue_wait)
+        self.flights = SingleFlight()
+
+    @classmethod
+    def from_env(cls, default_model: str = "mixtral-8x7b-32768") -> "LLMClient":
+        """Crée le client à partir des variables d'environnement"""
+        return cls(
+            api_key=os.getenv('GROQ_API_KEY'),
+            base_url=os.getenv('GROQ_BASE_URL') or None,
+            model=os.getenv('GROQ_MODEL', default_model),
+            fallback_model=os.getenv('GROQ_FALLBACK_MODEL') or None,
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '8')),
+            max_queue=int(os.getenv('LLM_MAX_QUEUE', '32')),
+            max_queue_wait=float(os.getenv('LLM_MAX_QUEUE_WAIT', '10')),
+            single_flight=os.getenv('LLM_SINGLE_FLIGHT', '1') == '1',
+            max_retries=int(os.getenv('LLM_MAX_RETRIES', '3')),
+            deadline=float(os.getenv('LLM_DEADLINE', '30')),
+            connect_timeout=float(os.getenv('LLM_CONNECT_TIMEOUT', '5')),
+            read_timeout=float(os.getenv('LLM_READ_TIMEOUT', '20')),
+            max_connections=int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+        )
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('LLMClient')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        """Délai avant la prochaine tentative : Retry-After si fourni, sinon backoff exponentiel"""
+        response = getattr(error, 'response', None)
+        if response is not None:
+            retry_after = response.headers.get('retry-after')
+            if retry_after:
+                try:
+                    return max(0.0, float(retry_after))
+                except ValueError:
+                    try:
+                        retry_date = parsedate_to_datetime(retry_after)
+                        return max(0.0, retry_date.timestamp() - time.time())
+                    except (TypeError, ValueError):
+                        pass
+
+        # Backoff exponentiel avec « full jitter »
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _remaining(self, deadline: float) -> float:
+        remaining = deadline - asyncio.get_event_loop().time()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded(f"Délai de {self.deadline:g}s dépassé")
+        return remaining
+
+    async def _create_with_retries(self, model: str, deadline: float, **params):
+        """Appelle l'API en réessayant les erreurs transitoires jusqu'au délai maximal"""
+        attempt = 0
+        while True:
+            try:
+                return await asyncio.wait_for(
+                    self.client.chat.completions.create(model=model, **params),
+                    timeout=self._remaining(deadline)
+                )
+            except asyncio.TimeoutError:
+                raise LLMDeadlineExceeded(f"Délai de {self.deadline:g}s dépassé")
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self.retry_delay(e, attempt)
+                if delay >= self._remaining(deadline):
+                    raise
+                UPSTREAM_RETRIES.inc(model=model, error=type(e).__name__)
+                self.logger.warning(
+                    f"Erreur transitoire de l'API ({type(e).__name__}) sur {model}, "
+                    f"tentative {attempt}/{self.max_retries} dans {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def _create(self, deadline: float, **params):
+        """Appelle le modèle principal puis, en cas d'échec transitoire, le modèle de secours"""
+        try:
+            return await self._create_with_retries(self.model, deadline, **params)
+        except RETRYABLE_ERRORS as e:
+            if not self.fallback_model:
+                raise
+            self.logger.warning(f"Bascule sur le modèle de secours {self.fallback_model} ({type(e).__name__})")
+            UPSTREAM_FALLBACKS.inc(model=self.fallback_model)
+            return await self._create_with_retries(self.fallback_model, deadline, **params)
+
+    async def acquire_slot(self, deadline: float, priority: int):
+        """Attend un créneau d'appel (durée mesurée dans l'étape llm_queue), Overloaded si saturé"""
+        with span('llm_queue'):
+            await self.admission.acquire(priority, timeout=self._remaining(deadline))
+
+    def flight_key(self, mode: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+        """Clé des appels identiques : mêmes messages et mêmes paramètres de génération"""
+        payload = json.dumps([mode, self.model, messages, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    async def complete(self, messages: List[Dict[str, str]], priority: int = PRIORITY_NEW, **params: Any):
+        """Génère une complétion complète (un seul appel pour les requêtes identiques simultanées)"""
+        if not self.single_flight:
+            return await self._complete(messages, priority, **params)
+        return await self.flights.do(
+            self.flight_key('complete', messages, params),
+            lambda: self._complete(messages, priority, **params)
+        )
+
+    async def _complete(self, messages: List[Dict[str, str]], priority: int, **params: Any):
+        deadline = asyncio.get_event_loop().time() + self.deadline
+        await self.acquire_slot(deadline, priority)
+        start_time = time.perf_counter()
+        try:
+            with span('llm'):
+                completion = await self._create(deadline, messages=messages, **params)
+            record_usage(completion.model or self.model, completion.usage)
+            return completion
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(error=type(e).__name__)
+            raise
+        finally:
+            self.admission.release(time.perf_counter() - start_time)
+
+    def stream(self, messages: List[Dict[str, str]], priority: int = PRIORITY_NEW,
+               **params: Any) -> AsyncIterator[str]:
+        """Génère une complétion fragment par fragment (un seul flux pour les requêtes identiques simultanées)"""
+        if not self.single_flight:
+            return self._stream(messages, priority, **params)
+        return self.flights.stream(
+            self.flight_key('stream', messages, params),
+            lambda: self._stream(messages, priority, **params)
+        )
+
+    async def _stream(self, messages: List[Dict[str, str]], priority: int, **params: Any) -> AsyncIterator[str]:
+        """Seule l'ouverture du flux est réessayée"""
+        deadline = asyncio.get_event_loop().time() + self.deadline
+        await self.acquire_slot(deadline, priority)
+        start_time = time.perf_counter()
+        first_token = True
+        stream = None
+        try:
+            stream = await self._create(deadline, messages=messages, stream=True, **params)
+            iterator = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=self._remaining(deadline))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise LLMDeadlineExceeded(f"Délai de {self.deadline:g}s dépassé")
+                # Groq renvoie l'usage dans le dernier fragment (x_groq.usage)
+                x_groq = getattr(chunk, 'x_groq', None)
+                record_usage(chunk.model or self.model, getattr(chunk, 'usage', None) or getattr(x_groq, 'usage', None))
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if first_token:
+                        first_token = False
+                        STAGE_SECONDS.observe(time.perf_counter() - start_time, stage='llm_first_token')
+                    yield delta
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(error=type(e).__name__)
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start_time, stage='llm_stream')
+            if stream is not None:
+                await stream.close()
+            self.admission.release(time.perf_counter() - start_time)
+
+    def get_stats(self) -> Dict:
+        return {
+            'admission': self.admission.get_stats(),
+            'single_flight': self.flights.get_stats() if self.single_flight else None
+        }
+
+    async def aclose(self):
+        """Ferme le pool de connexions HTTP"""
+        await self.http_client.aclose()
@@ -0,0 +1,478 @@
+import os
+import sys
+import time
+import asyncio
+import random
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Bornes des histogrammes de durée (secondes), de la milliseconde à l'appel LLM lent
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric(ABC):
+    """Métrique étiquetée, mise à jour depuis la boucle d'événements comme depuis les threads"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Lignes de valeurs au format d'exposition Prometheus"""
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}', *self.samples()]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            values = list(self.values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in values]
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # Par jeu d'étiquettes : [comptes par borne (non cumulés), somme, nombre]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self.series.items()]
+        lines = []
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+class Gauge(Metric):
+    """Valeur lue au moment de l'export (taille de l'index, sessions, etc.)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        try:
+            return [f'{self.name} {_format_value(self.callback())}']
+        except Exception:
+            return []
+
+class MetricsRegistry:
+    """Ensemble des métriques du processus, exportées au format texte de Prometheus"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        # Remplacée à chaque appel : la fonction suit l'instance courante
+        gauge = Gauge(name, documentation, callback)
+        with self.lock:
+            self.metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+# Durée de chaque étape d'une réponse et du démarrage
+STAGE_SECONDS = REGISTRY.histogram(
+    'chatbot_stage_duration_seconds', "Durée des étapes (encodage, recherche, formatage, appel LLM, chargement)",
+    ('stage',)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'chatbot_http_request_duration_seconds', "Durée des requêtes HTTP jusqu'à l'envoi des en-têtes",
+    ('method', 'path', 'status')
+)
+RESPONSES = REGISTRY.counter(
+    'chatbot_responses_total', "Réponses produites, par origine (routeur, cache, llm, erreur, refus)", ('source',)
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'chatbot_upstream_errors_total', "Erreurs de l'API Groq remontées après les nouvelles tentatives", ('error',)
+)
+UPSTREAM_RETRIES = REGISTRY.counter(
+    'chatbot_upstream_retries_total', "Nouvelles tentatives d'appel à l'API Groq", ('model', 'error')
+)
+UPSTREAM_FALLBACKS = REGISTRY.counter(
+    'chatbot_upstream_fallbacks_total', "Bascules sur le modèle de secours", ('model',)
+)
+TOKENS = REGISTRY.counter(
+    'chatbot_llm_tokens_total', "Tokens consommés, d'après l'usage renvoyé par l'API Groq", ('model', 'kind')
+)
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    'chatbot_event_loop_lag_seconds', "Retard de la boucle d'événements sur un réveil programmé",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+def resident_memory_bytes() -> float:
+    """Mémoire résidente du processus (pic de RSS hors Linux)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+REGISTRY.gauge('process_resident_memory_bytes', "Mémoire résidente du processus (octets)", resident_memory_bytes)
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Mesure la durée d'un bloc dans l'histogramme des étapes (erreurs comprises)"""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start_time, stage=stage)
+
+def record_usage(model: str, usage) -> None:
+    """Ajoute l'usage (prompt_tokens, completion_tokens) d'une réponse Groq aux compteurs"""
+    if usage is None:
+        return
+    for kind in ('prompt', 'completion'):
+        tokens = getattr(usage, f'{kind}_tokens', None)
+        if tokens:
+            TOKENS.inc(tokens, model=model, kind=kind)
+
+class EventLoopLagMonitor:
+    """
+    Mesure du retard de la boucle d'événements.
+
+    Une tâche se réveille toutes les `interval_ms` millisecondes ; l'écart
+    entre l'heure prévue et l'heure effective du réveil est le temps pendant
+    lequel la boucle était occupée (code bloquant, callbacks trop longs).
+    """
+
+    def __init__(self, interval_ms: float = 100.0):
+        self.interval = interval_ms / 1000
+        self._task = None  # Créée au démarrage, dans la boucle d'uvicorn
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+
+    @classmethod
+    def from_env(cls) -> "EventLoopLagMonitor":
+        """Crée la mesure à partir des variables d'environnement"""
+        return cls(interval_ms=float(os.getenv('LOOP_LAG_INTERVAL_MS', '100')))
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'interval_ms': self.interval * 1000,
+            'last_lag_ms': round(1000 * self.last_lag, 3),
+            'max_lag_ms': round(1000 * self.max_lag, 3)
+        }
+
+class SlowRequestProfiler:
+    """
+    Profileur par échantillonnage des requêtes lentes (désactivé par défaut).
+
+    Pendant une requête échantillonnée, un thread relève toutes les
+    `interval_ms` millisecondes la pile de chaque thread (boucle d'événements,
+    thread d'encodage). Si la requête dépasse `threshold_ms`, les piles
+    agrégées sont écrites au format « folded » (flamegraph.pl, speedscope) dans
+    `output_dir`. Les requêtes simultanées partageant la boucle d'événements,
+    le profil d'une requête peut contenir des piles des autres.
+    """
+
+    def __init__(self, threshold_ms: float = 0.0, interval_ms: float = 5.0, sample_rate: float = 1.0,
+                 output_dir: str = 'profiles', max_depth: int = 40):
+        self.setup_logging()
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.max_depth = max_depth
+
+        self.lock = threading.Lock()
+        self.sessions: List[StackCounter] = []
+        self.thread: Optional[threading.Thread] = None
+
+        self.profiled = 0
+        self.slow = 0
+        self.last_profile = None
+
+    @classmethod
+    def from_env(cls) -> "SlowRequestProfiler":
+        """Crée le profileur à partir des variables d'environnement"""
+        return cls(
+            threshold_ms=float(os.getenv('PROFILE_SLOW_MS', '0')),
+            interval_ms=float(os.getenv('PROFILE_INTERVAL_MS', '5')),
+            sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', '1')),
+            output_dir=os.getenv('PROFILE_DIR', 'profiles')
+        )
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('SlowRequestProfiler')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _stack(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _sample(self):
+        """Relève les piles tant qu'une requête est profilée"""
+        own_id = threading.get_ident()
+        names = {}
+        while True:
+            with self.lock:
+                if not self.sessions:
+                    self.thread = None
+                    return
+                sessions = list(self.sessions)
+            for thread in threading.enumerate():
+                names.setdefault(thread.ident, thread.name)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = f"{names.get(thread_id, thread_id)};{self._stack(frame)}"
+                for samples in sessions:
+                    samples[stack] += 1
+            time.sleep(self.interval)
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Profile le bloc si le profileur est actif et la requête échantillonnée"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            yield
+            return
+
+        samples = StackCounter()
+        with self.lock:
+            self.sessions.append(samples)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._sample, name='profiler', daemon=True)
+                self.thread.start()
+        self.profiled += 1
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start_time
+            with self.lock:
+                self.sessions.remove(samples)
+            if duration >= self.threshold and samples:
+                self.slow += 1
+                self.save(name, duration, samples)
+
+    def save(self, name: str, duration: float, samples: StackCounter):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{name}.folded")
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.last_profile = path
+            self.logger.warning(f"Requête lente ({name}, {duration:.2f}s) : profil enregistré dans {path} "
+                                f"({sum(samples.values())} piles échantillonnées)")
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'enregistrement du profil : {str(e)}")
+
+    def get_stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'threshold_ms': self.threshold * 1000,
+            'sample_rate': self.sample_rate,
+            'profiled_requests': self.profiled,
+            'slow_requests': self.slow,
+            'last_profile': self.last_profile
+        }
+
+def process_start_time() -> float:
+    """Heure (epoch) de lancement du processus, lue dans /proc (heure courante hors Linux)"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # Champ 22 (starttime), en tops d'horloge depuis le démarrage de la machine
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat', 'r') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot_time + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+class StartupTimeline:
+    """
+    Chronologie du démarrage, depuis le lancement du processus.
+
+    Chaque phase (imports, ouverture du port, modèle, index, préchauffage)
+    est journalisée à sa fin avec sa durée et son heure relative ; le
+    récapitulatif est journalisé quand l'application est prête.
+    """
+
+    def __init__(self):
+        self.setup_logging()
+        self.origin = process_start_time()
+        self.last_mark = self.origin
+        self.phases: List[Tuple[str, float, float]] = []  # (phase, début relatif, durée)
+        self.ready_at: Optional[float] = None
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('StartupTimeline')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    @property
+    def elapsed(self) -> float:
+        """Durée du démarrage : jusqu'à l'état prêt, ou écoulée jusqu'ici"""
+        return (self.ready_at or time.time()) - self.origin
+
+    def record(self, phase: str, duration: float, start: Optional[float] = None):
+        """Enregistre une phase (début par défaut : maintenant moins sa durée, en heure epoch)"""
+        start = time.time() - duration if start is None else start
+        self.phases.append((phase, start - self.origin, duration))
+        self.last_mark = max(self.last_mark, start + duration)
+        self.logger.info(f"Démarrage - {phase} : {duration:.2f}s (t+{start + duration - self.origin:.2f}s)")
+
+    def mark(self, phase: str):
+        """Phase du fil principal : depuis la fin de la phase précédente jusqu'à maintenant"""
+        now = time.time()
+        self.record(phase, now - self.last_mark, start=self.last_mark)
+
+    @contextmanager
+    def phase(self, phase: str) -> Iterator[None]:
+        """Mesure la durée d'un bloc comme une phase du démarrage"""
+        start = time.time()
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start_time, start=start)
+
+    def mark_ready(self):
+        self.ready_at = time.time()
+        summary = ', '.join(f"{phase} {duration:.2f}s" for phase, _, duration in self.phases)
+        self.logger.info(f"Application prête en {self.elapsed:.2f}s ({summary})")
+
+    def get_stats(self) -> Dict:
+        return {
+            'ready': self.ready,
+            'elapsed_s': round(self.elapsed, 3),
+            'phases': [
+                {'phase': phase, 'start_s': round(start, 3), 'duration_s': round(duration, 3)}
+                for phase, start, duration in self.phases
+            ]
+        }
+
+# Chronologie du démarrage du processus (un démarrage par worker)
+STARTUP = StartupTimeline()
@@ -0,0 +1,329 @@
+import os
+import re
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from metrics import REGISTRY
+from embedders import DEFAULT_MODEL_NAME, local_tokenizer_path
+
+# Découpage approximatif en tokens : mots et signes de ponctuation
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Tokens ajoutés par l'API pour chaque message (rôle, délimiteurs)
+MESSAGE_OVERHEAD = 4
+
+PROMPT_TOKENS = REGISTRY.histogram(
+    'chatbot_prompt_tokens', "Tokens envoyés au LLM par section du prompt", ('section',),
+    buckets=(25, 50, 100, 200, 400, 800, 1600, 3200, 6400)
+)
+
+class TokenCounter:
+    """
+    Comptage local et approximatif des tokens.
+
+    Le compte utilise le tokenizer du modèle d'embedding disponible localement
+    (export ONNX ou cache Hugging Face, paquet `tokenizers`), ou le fichier
+    tokenizer.json `tokenizer_path`. Ce n'est pas le tokenizer du LLM de Groq :
+    le compte n'est qu'une approximation de celui de l'API, et le budget du
+    prompt doit garder une marge sous la fenêtre de contexte du modèle. Sans
+    tokenizer, le compte est estimé à partir des mots (un token pour quatre
+    caractères environ, un par signe de ponctuation), ce qui surestime
+    légèrement les tokenizers BPE sur du français.
+    """
+
+    def __init__(self, tokenizer_path: Optional[str] = None):
+        self.setup_logging()
+        self.tokenizer = None
+        self.name = 'estimation'
+        if tokenizer_path:
+            name = os.path.basename(os.path.dirname(os.path.abspath(tokenizer_path))) or tokenizer_path
+        else:
+            tokenizer_path, name = local_tokenizer_path(), DEFAULT_MODEL_NAME
+        if not tokenizer_path:
+            self.logger.warning(f"Tokenizer de {DEFAULT_MODEL_NAME} absent du cache local, comptage estimé")
+            return
+        try:
+            from tokenizers import Tokenizer
+            self.tokenizer = Tokenizer.from_file(tokenizer_path)
+            # Les tokenizer.json de sentence-transformers tronquent (128 tokens pour
+            # MiniLM) voire complètent les textes : le compte doit porter sur le texte entier
+            self.tokenizer.no_truncation()
+            self.tokenizer.no_padding()
+            self.name = name
+            self.logger.info(f"Comptage des tokens avec {tokenizer_path}")
+        except Exception as e:
+            self.logger.warning(f"Tokenizer {tokenizer_path} indisponible, comptage estimé : {str(e)}")
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('TokenCounter')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @staticmethod
+    def _estimate(piece: str) -> int:
+        return 1 + (len(piece) - 1) // 4
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+        return sum(self._estimate(match.group()) for match in TOKEN_PATTERN.finditer(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Tronque le texte à `max_tokens` tokens, sur une limite de mot"""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.tokenizer is not None:
+            offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+            end = offsets[max_tokens - 1][1] if max_tokens > 0 else 0
+        else:
+            end, total = 0, 0
+            for match in TOKEN_PATTERN.finditer(text):
+                total += self._estimate(match.group())
+                if total > max_tokens:
+                    break
+                end = match.end()
+        cut = text[:end]
+        # Pas de mot coupé en deux
+        if end < len(text) and text[end].isalnum() and ' ' in cut:
+            cut = cut.rsplit(' ', 1)[0]
+        return cut.rstrip() + ' […]'
+
+def shingles(text: str, size: int = 5) -> Set[Tuple[str, ...]]:
+    """Suites de `size` mots (en minuscules) du texte"""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class PromptBuilder:
+    """
+    Assemblage des messages envoyés au LLM dans un budget de tokens.
+
+    Les sections sont ajoutées par priorité : prompt système, question et
+    contexte imposé (coordonnées, pages du site), extraits retrouvés par
+    pertinence décroissante (tronqués, sans ceux déjà présents dans
+    l'historique), résumé des échanges anciens, puis derniers échanges du plus
+    récent au plus ancien. Les échanges plus anciens que les
+    `history_turns` derniers sont condensés dans un résumé glissant, mis en
+    cache par session et complété au fil de la conversation.
+    """
+
+    def __init__(self, counter: Optional[TokenCounter] = None, budget: int = 3000, snippet_tokens: int = 200,
+                 history_turns: int = 2, summary_tokens: int = 250, dedupe_threshold: float = 0.8,
+                 max_sessions: int = 1000):
+        self.setup_logging()
+        self.counter = counter or TokenCounter()
+        self.budget = budget
+        self.snippet_tokens = snippet_tokens
+        self.history_turns = history_turns
+        self.summary_tokens = summary_tokens
+        self.dedupe_threshold = dedupe_threshold
+        self.max_sessions = max_sessions
+
+        # Résumé glissant par session : {'upto': horodatage du dernier message résumé, 'lines': [...]}
+        self.summaries: "OrderedDict[str, Dict]" = OrderedDict()
+
+        # Statistiques
+        self.prompts = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self.over_budget = 0
+        self.snippets_deduplicated = 0
+        self.snippets_dropped = 0
+        self.turns_dropped = 0
+
+    @classmethod
+    def from_env(cls) -> "PromptBuilder":
+        """Crée l'assembleur à partir des variables d'environnement"""
+        return cls(
+            counter=TokenCounter(os.getenv('PROMPT_TOKENIZER') or None),
+            budget=int(os.getenv('PROMPT_TOKEN_BUDGET', '3000')),
+            snippet_tokens=int(os.getenv('PROMPT_SNIPPET_TOKENS', '200')),
+            history_turns=int(os.getenv('PROMPT_HISTORY_TURNS', '2')),
+            summary_tokens=int(os.getenv('PROMPT_SUMMARY_TOKENS', '250'))
+        )
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('PromptBuilder')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    def message_tokens(self, content: str) -> int:
+        return self.counter.count(content) + MESSAGE_OVERHEAD
+
+    @staticmethod
+    def split_turns(history: List[Dict]) -> List[List[Dict]]:
+        """Regroupe l'historique en échanges (question puis réponse)"""
+        turns = []
+        for message in history:
+            if message['role'] == 'user' or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+        return turns
+
+    def first_sentence(self, text: str, max_tokens: int) -> str:
+        sentence = next((part for part in SENTENCE_END.split(' '.join(text.split())) if part), '')
+        return self.counter.truncate(sentence, max_tokens)
+
+    def summarize(self, session_id: str, turns: List[List[Dict]]) -> str:
+        """Résumé glissant des échanges anciens (seuls les nouveaux échanges sont ajoutés)"""
+        entry = self.summaries.get(session_id)
+        if entry is None:
+            if not turns:
+                return ''
+            entry = {'upto': '', 'lines': []}
+
+        for turn in turns:
+            timestamp = turn[-1].get('timestamp', '')
+            if timestamp and timestamp <= entry['upto']:
+                continue
+            question = next((m['content'] for m in turn if m['role'] == 'user'), '')
+            answer = next((m['content'] for m in turn if m['role'] == 'assistant'), '')
+            line = f"- Question : {self.first_sentence(question, 40)}"
+            if answer:
+                line += f" / Réponse : {self.first_sentence(answer, 50)}"
+            entry['lines'].append(line)
+            entry['upto'] = max(entry['upto'], timestamp)
+
+        # Les échanges les plus anciens sortent du résumé en premier
+        while len(entry['lines']) > 1 and self.counter.count('\n'.join(entry['lines'])) > self.summary_tokens:
+            entry['lines'].pop(0)
+
+        self.summaries[session_id] = entry
+        self.summaries.move_to_end(session_id)
+        while len(self.summaries) > self.max_sessions:
+            self.summaries.popitem(last=False)
+        return '\n'.join(entry['lines'])
+
+    def forget(self, session_id: str):
+        """Oublie le résumé d'une session (historique effacé)"""
+        self.summaries.pop(session_id, None)
+
+    def select_snippets(self, snippets: List[Dict], history_text: str) -> Tuple[List[Dict], int]:
+        """Extraits tronqués par pertinence décroissante, sans ceux déjà présents dans l'historique ou entre eux"""
+        seen = shingles(history_text)
+        selected, duplicates = [], 0
+        for item in sorted(snippets, key=lambda x: x.get('relevance_score', 0), reverse=True):
+            text = self.counter.truncate(item.get('text', item['content']), self.snippet_tokens)
+            item_shingles = shingles(text)
+            if item_shingles and len(item_shingles & seen) / len(item_shingles) >= self.dedupe_threshold:
+                duplicates += 1
+                continue
+            seen |= item_shingles
+            selected.append(dict(item, text=text))
+        return selected, duplicates
+
+    def build(self, system_prompt: str, history: List[Dict], render_prompt: Callable[[str], str],
+              snippets: Optional[List[Dict]] = None,
+              format_context: Optional[Callable[[List[Dict]], str]] = None,
+              extra_context: str = '', session_id: str = '') -> List[Dict[str, str]]:
+        """
+        Construit les messages : système, résumé, derniers échanges puis la
+        question (rendue par `render_prompt` avec le contexte). `snippets` est
+        None quand aucune recherche n'a été faite (question de contact).
+        """
+        turns = self.split_turns(history)
+        split = max(0, len(turns) - self.history_turns)
+        recent, older = turns[split:], turns[:split]
+        summary = self.summarize(session_id, older) if older or session_id in self.summaries else ''
+
+        sections = {'system': self.message_tokens(system_prompt)}
+
+        # Question et contexte imposé : toujours présents
+        def context_text(items: List[Dict]) -> str:
+            parts = [extra_context] if extra_context else []
+            if snippets is not None and format_context is not None:
+                parts.append(format_context(items))
+            return '\n\n'.join(parts)
+
+        base_prompt = render_prompt(context_text([]))
+        sections['question'] = self.message_tokens(base_prompt)
+        remaining = self.budget - sections['system'] - sections['question']
+
+        # Extraits par pertinence ; ceux qui dépassent le budget restant sont écartés
+        history_text = '\n'.join([summary] + [m['content'] for turn in recent for m in turn])
+        candidates, duplicates = self.select_snippets(snippets or [], history_text)
+        selected = []
+        prompt = base_prompt
+        for item in candidates:
+            candidate_prompt = render_prompt(context_text(selected + [item]))
+            if self.message_tokens(candidate_prompt) - sections['question'] > remaining:
+                continue
+            selected.append(item)
+            prompt = candidate_prompt
+        sections['context'] = self.message_tokens(prompt) - sections['question']
+        remaining -= sections['context']
+
+        # Résumé des échanges anciens puis derniers échanges, du plus récent au plus ancien
+        summary_message = None
+        sections['summary'] = 0
+        if summary:
+            content = f"Résumé des échanges précédents avec l'utilisateur :\n{summary}"
+            if self.message_tokens(content) <= remaining:
+                summary_message = {'role': 'system', 'content': content}
+                sections['summary'] = self.message_tokens(content)
+                remaining -= sections['summary']
+
+        included = []
+        sections['history'] = 0
+        for turn in reversed(recent):
+            tokens = sum(self.message_tokens(m['content']) for m in turn)
+            if tokens > remaining:
+                break
+            included.insert(0, turn)
+            sections['history'] += tokens
+            remaining -= tokens
+
+        messages = [{'role': 'system', 'content': system_prompt}]
+        if summary_message is not None:
+            messages.append(summary_message)
+        messages.extend({'role': m['role'], 'content': m['content']} for turn in included for m in turn)
+        messages.append({'role': 'user', 'content': prompt})
+
+        self.record(sections, len(selected), len(snippets or []), duplicates, len(included), len(recent))
+        return messages
+
+    def record(self, sections: Dict[str, int], snippets_used: int, snippets_total: int, duplicates: int,
+               turns_used: int, turns_recent: int):
+        total = sum(sections.values())
+        self.prompts += 1
+        self.total_tokens += total
+        self.max_tokens = max(self.max_tokens, total)
+        self.over_budget += total > self.budget
+        self.snippets_deduplicated += duplicates
+        self.snippets_dropped += snippets_total - snippets_used - duplicates
+        self.turns_dropped += turns_recent - turns_used
+        for section, tokens in sections.items():
+            PROMPT_TOKENS.observe(tokens, section=section)
+        self.logger.info(
+            f"Prompt de {total} tokens (budget {self.budget}) : système {sections['system']}, "
+            f"résumé {sections['summary']}, historique {sections['history']} ({turns_used} échanges), "
+            f"contexte {sections['context']} ({snippets_used}/{snippets_total} extraits, "
+            f"{duplicates} déjà dans l'historique), question {sections['question']}"
+        )
+
+    def get_stats(self) -> Dict:
+        return {
+            'tokenizer': self.counter.name,
+            'budget': self.budget,
+            'prompts': self.prompts,
+            'average_tokens': round(self.total_tokens / self.prompts, 1) if self.prompts else 0.0,
+            'max_tokens': self.max_tokens,
+            'over_budget': self.over_budget,
+            'snippets_deduplicated': self.snippets_deduplicated,
+            'snippets_dropped': self.snippets_dropped,
+            'turns_dropped': self.turns_dropped,
+            'summaries': len(self.summaries)
+        }
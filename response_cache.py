@@ -0,0 +1,178 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+import numpy as np
+
+def normalize_query(query: str) -> str:
+    """Normalise une requête pour la correspondance exacte (casse et espaces)"""
+    return ' '.join(query.lower().split())
+
+class QueryEmbeddingCache:
+    """Cache LRU à correspondance exacte : requête normalisée -> embedding"""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        key = normalize_query(query)
+        vector = self._entries.get(key)
+        if vector is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def put(self, query: str, vector: np.ndarray):
+        if self.max_size <= 0:
+            return
+        key = normalize_query(query)
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+class SemanticResponseCache:
+    """
+    Cache de réponses indexé par similarité cosinus des embeddings de requêtes.
+
+    Une réponse n'est réutilisée que pour les mêmes documents retrouvés
+    (portée) ; le cache est vidé quand la version de l'index change.
+    """
+
+    def __init__(self, max_size: int = 500, ttl: float = 3600, threshold: float = 0.92):
+        self.setup_logging()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.version = None
+
+        # clé -> (vecteur normalisé, portée, réponse, date de création)
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, Hashable, str, float]]" = OrderedDict()
+        self._scopes: Dict[Hashable, set] = {}
+        self._next_key = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "SemanticResponseCache":
+        """Crée le cache à partir des variables d'environnement"""
+        return cls(
+            max_size=int(os.getenv('RESPONSE_CACHE_SIZE', '500')),
+            ttl=float(os.getenv('RESPONSE_CACHE_TTL', '3600')),
+            threshold=float(os.getenv('RESPONSE_CACHE_THRESHOLD', '0.92'))
+        )
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('SemanticResponseCache')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _remove(self, key: int):
+        _, scope, _, _ = self._entries.pop(key)
+        keys = self._scopes.get(scope)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._scopes[scope]
+
+    def _purge_expired(self):
+        # Les entrées les plus anciennes (LRU) sont en tête
+        now = time.monotonic()
+        expired = [key for key, (_, _, _, created) in self._entries.items() if now - created >= self.ttl]
+        for key in expired:
+            self._remove(key)
+            self.evictions += 1
+
+    def check_version(self, version):
+        """Vide le cache si la base de connaissances a été reconstruite"""
+        if version != self.version:
+            if self._entries:
+                self.logger.info(f"Index reconstruit (version {version}), cache de réponses invalidé")
+                self.invalidations += 1
+            self.invalidate()
+            self.version = version
+
+    def invalidate(self):
+        """Vide le cache"""
+        self._entries.clear()
+        self._scopes.clear()
+
+    def lookup(self, query_vector: np.ndarray, scope: Hashable) -> Optional[str]:
+        """Retourne une réponse en cache pour une requête similaire avec la même portée"""
+        if not self.enabled:
+            return None
+        self._purge_expired()
+
+        keys = list(self._scopes.get(scope, ()))
+        if keys:
+            vectors = np.vstack([self._entries[key][0] for key in keys])
+            similarities = vectors @ self._normalize(query_vector)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                key = keys[best]
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][2]
+
+        self.misses += 1
+        return None
+
+    def store(self, query_vector: np.ndarray, scope: Hashable, response: str):
+        """Ajoute une réponse au cache"""
+        if not self.enabled:
+            return
+        key = self._next_key
+        self._next_key += 1
+        self._entries[key] = (self._normalize(query_vector), scope, response, time.monotonic())
+        self._scopes.setdefault(scope, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
@@ -1,24 +1,50 @@
 import requests
 from bs4 import BeautifulSoup
-import json
 import os
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional
 import time
-from urllib.parse import urljoin, urlparse
+import argparse
+from crawl_manifest import CrawlManifest, ChangeSet
+from crawl_frontier import CrawlFrontier
+from corpus_store import CorpusStore
+from chunker import PassageChunker
+from dedup import NearDuplicateDetector, chunk_unique_pages
+from extraction import PageExtractor
 
 class ITWorkScraper:
-    def __init__(self):
+    def __init__(self, base_urls: Optional[List[str]] = None, data_dir: str = 'scraped_data',
+                 delay: float = 2.0, max_depth: int = 3, incremental: bool = True):
         self.setup_logging()
-        self.base_urls = [
+        self.base_urls = base_urls or [
             'https://it-work.fr/',
             'https://blog.it-work.fr/'
         ]
         self.visited_urls = set()
-        self.data_dir = 'scraped_data'
+        self.data_dir = data_dir
+        self.delay = delay  # Pause entre deux pages en mode séquentiel
+        self.max_depth = max_depth
+        self.user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         os.makedirs(self.data_dir, exist_ok=True)
 
+        # Extraction en un seul parcours (lxml si disponible, HTML_PARSER sinon)
+        self.extractor = PageExtractor.from_env(self.base_urls)
+
+        # Pages écrites une à une dans le corpus SQLite (scraped_data/corpus.db)
+        self.store = CorpusStore.open(self.data_dir, readonly=False)
+
+        # Crawl incrémental : requêtes conditionnelles et liste des changements
+        self.incremental = incremental
+        self.manifest = CrawlManifest(self.data_dir, store=self.store)
+        self.changes = ChangeSet()
+        self.fetched_urls = set()  # URLs ayant répondu (200 ou 304)
+        self.failed_urls = set()   # Erreurs transitoires : pages conservées
+        self.gone_urls = set()     # Réponses 404 / 410
+
+        # File d'URLs persistée, avec points de contrôle (reprise avec --resume)
+        self.frontier = CrawlFrontier(os.path.join(self.data_dir, 'crawl_frontier.db'))
+
     def setup_logging(self):
         self.logger = logging.getLogger('ITWorkScraper')
         self.logger.setLevel(logging.INFO)
@@ -34,130 +60,158 @@ class ITWorkScraper:
             file_handler.setFormatter(formatter)
             self.logger.addHandler(file_handler)
 
-    def get_page_content(self, url: str) -> Optional[BeautifulSoup]:
+    def start_frontier(self, resume: bool = False) -> bool:
+        """Initialise la file d'URLs ; en cas de reprise, restaure l'état du crawl interrompu"""
+        resumed = self.frontier.start(self.base_urls, resume=resume)
+        if resumed:
+            state = self.frontier.load_state()
+            if state.get('changes'):
+                self.changes = ChangeSet.from_dict(state['changes'])
+            self.fetched_urls = self.frontier.urls('done')
+            self.gone_urls = self.frontier.urls('gone')
+            self.visited_urls.update(self.fetched_urls | self.gone_urls)
+        return resumed
+
+    def enqueue(self, url: str, depth: int) -> Optional[str]:
+        """Ajoute une URL à la file si elle doit être crawlée ; retourne sa forme normalisée"""
+        if depth > self.max_depth or not self.should_scrape_url(url):
+            return None
+        return self.frontier.add(url, depth)
+
+    def complete_url(self, url: str):
+        """Enregistre le résultat d'une URL dans la file, avec un point de contrôle périodique"""
+        if url in self.gone_urls:
+            status = 'gone'
+        elif url in self.failed_urls:
+            status = 'failed'
+        else:
+            status = 'done'
+        self.frontier.mark(url, status)
+        if self.frontier.checkpoint_due():
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Enregistre le manifeste et l'état de la file"""
+        self.manifest.save()
+        self.frontier.checkpoint({'changes': self.changes.to_dict()})
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """En-têtes If-None-Match / If-Modified-Since issus du manifeste"""
+        return self.manifest.conditional_headers(url) if self.incremental else {}
+
+    def get_page_response(self, url: str) -> Optional[requests.Response]:
         try:
             headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+                'User-Agent': self.user_agent
             }
+            headers.update(self.conditional_headers(url))
             response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            return BeautifulSoup(response.text, 'html.parser')
+            if response.status_code in (404, 410):
+                # Page disparue : elle sera retirée en fin de crawl
+                self.logger.info(f"Page supprimée ({response.status_code}) : {url}")
+                self.gone_urls.add(url)
+                return None
+            if response.status_code != 304:
+                response.raise_for_status()
+            return response
         except Exception as e:
+            self.failed_urls.add(url)
             self.logger.error(f"Erreur lors de la récupération de {url}: {str(e)}")
             return None
 
-    def extract_contact_info(self, soup: BeautifulSoup) -> Dict:
-        contact_info = {
-            'phone': [],
-            'email': [],
-            'address': [],
-            'social_media': []
-        }
-        
-        # Extraction des numéros de téléphone
-        phone_elements = soup.find_all(string=lambda text: text and any(x in text for x in ['0', '+33']))
-        for element in phone_elements:
-            if any(char.isdigit() for char in element):
-                contact_info['phone'].append(element.strip())
-
-        # Extraction des emails
-        email_elements = soup.find_all('a', href=lambda href: href and 'mailto:' in href)
-        for element in email_elements:
-            email = element['href'].replace('mailto:', '').strip()
-            contact_info['email'].append(email)
-
-        # Extraction des adresses
-        address_elements = soup.find_all(['address', 'div'], class_=lambda x: x and 'address' in x.lower())
-        for element in address_elements:
-            contact_info['address'].append(element.get_text().strip())
-
-        # Extraction des liens sociaux
-        social_patterns = ['facebook', 'twitter', 'linkedin', 'instagram']
-        social_links = soup.find_all('a', href=lambda href: href and any(pattern in href.lower() for pattern in social_patterns))
-        for link in social_links:
-            contact_info['social_media'].append({
-                'platform': next(p for p in social_patterns if p in link['href'].lower()),
-                'url': link['href']
-            })
-
-        return contact_info
-
-    def extract_page_content(self, url: str, soup: BeautifulSoup) -> Dict:
-        content = {
-            'url': url,
-            'title': '',
-            'main_content': '',
-            'meta_description': '',
-            'contact_info': {},
-            'links': [],
-            'timestamp': datetime.now().isoformat()
-        }
-
-        # Extraction du titre
-        title_tag = soup.find('title')
-        if title_tag:
-            content['title'] = title_tag.get_text().strip()
-
-        # Extraction de la meta description
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        if meta_desc:
-            content['meta_description'] = meta_desc.get('content', '').strip()
-
-        # Extraction du contenu principal
-        main_content = []
-        
-        # Articles de blog
-        articles = soup.find_all(['article', 'div'], class_=lambda x: x and any(c in str(x) for c in ['post', 'article', 'content']))
-        for article in articles:
-            # Extraction du texte et conservation de la structure
-            for element in article.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'ul', 'ol']):
-                text = element.get_text().strip()
-                if text:
-                    main_content.append({
-                        'type': element.name,
-                        'content': text
-                    })
-
-        # Pages de service
-        services = soup.find_all('div', class_=lambda x: x and 'service' in str(x))
-        for service in services:
-            service_content = service.get_text().strip()
-            if service_content:
-                main_content.append({
-                    'type': 'service',
-                    'content': service_content
-                })
-
-        content['main_content'] = main_content
-
-        # Extraction des informations de contact
-        content['contact_info'] = self.extract_contact_info(soup)
-
-        # Extraction des liens internes
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            if href.startswith('/') or any(base_url in href for base_url in self.base_urls):
-                full_url = urljoin(url, href)
-                content['links'].append({
-                    'url': full_url,
-                    'text': link.get_text().strip() or link.get('title', '')
-                })
+    def get_page_content(self, url: str) -> Optional[BeautifulSoup]:
+        response = self.get_page_response(url)
+        if response is None or response.status_code == 304:
+            return None
+        return BeautifulSoup(response.text, self.extractor.parser)
+
+    def process_response(self, url: str, status_code: int, html: str, headers) -> Optional[Dict]:
+        """
+        Traite la réponse d'une page : une réponse 304 ou un contenu identique
+        n'entraîne aucune écriture, seules les pages nouvelles ou modifiées
+        sont enregistrées et ajoutées à la liste des changements.
+        """
+        self.fetched_urls.add(url)
+        if status_code == 304:
+            content = self.manifest.load_content(url)
+            if content is not None:
+                self.changes.unchanged += 1
+                self.logger.info(f"Page inchangée (304) : {url}")
+                return content
+            self.logger.warning(f"Contenu enregistré manquant pour {url}, page ignorée")
+            return None
 
+        content = self.extractor.extract(url, html)
+        content_hash = CrawlManifest.content_hash(content)
+        entry = self.manifest.get(url)
+
+        if entry and entry.get('content_hash') == content_hash and self.manifest.has_content(url):
+            self.changes.unchanged += 1
+            self.logger.info(f"Contenu inchangé : {url}")
+            filepath = entry['file']
+        else:
+            filepath = self.save_content(content)
+            if filepath is None:
+                return content
+            change = {'url': url, 'file': filepath}
+            (self.changes.modified if entry else self.changes.added).append(change)
+
+        self.manifest.update(url, content_hash, filepath,
+                             etag=headers.get('ETag'), last_modified=headers.get('Last-Modified'))
         return content
 
-    def save_content(self, content: Dict):
+    def finish_crawl(self):
+        """Repère les pages disparues, enregistre le manifeste et la liste des changements"""
+        # Après une erreur, une partie du site a pu ne pas être parcourue :
+        # seules les pages explicitement disparues (404 / 410) sont retirées
+        complete = not self.failed_urls
+        for url in list(self.manifest.entries):
+            if url in self.fetched_urls or (not complete and url not in self.gone_urls):
+                continue
+            entry = self.manifest.remove(url)
+            filepath = entry.get('file')
+            self.store.remove(url)
+            # Fichier JSON d'une page enregistrée avant le passage au corpus SQLite
+            if filepath and filepath.endswith('.json') and os.path.exists(filepath):
+                os.remove(filepath)
+            self.changes.removed.append({'url': url, 'file': filepath})
+
+        self.manifest.save()
+        self.store.checkpoint()
+        self.frontier.finish()
+        self.find_duplicates()
         try:
-            # Création d'un nom de fichier basé sur l'URL
-            parsed_url = urlparse(content['url'])
-            filename = parsed_url.path.strip('/').replace('/', '_') or 'index'
-            filepath = os.path.join(self.data_dir, f"{filename}.json")
+            self.changes.save(os.path.join(self.data_dir, 'crawl_changes.json'))
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'écriture de la liste des changements: {str(e)}")
+        self.logger.info(f"Changements : {len(self.changes.added)} ajoutées, "
+                         f"{len(self.changes.modified)} modifiées, {len(self.changes.removed)} supprimées, "
+                         f"{self.changes.unchanged} inchangées, {len(self.changes.duplicates)} quasi-doublons")
 
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(content, f, ensure_ascii=False, indent=2)
-            
-            self.logger.info(f"Contenu sauvegardé dans {filepath}")
+    def find_duplicates(self):
+        """
+        Repère les pages quasi identiques du corpus, avec les mêmes règles que
+        la base de connaissances (qui les écarte de l'index), et les ajoute à
+        la liste des changements.
+        """
+        try:
+            chunker = PassageChunker.from_env()
+            chunker.fit(self.store.iter_pages())
+            _, self.changes.duplicates = chunk_unique_pages(
+                self.store.iter_pages(), chunker, NearDuplicateDetector.from_env()
+            )
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la détection des quasi-doublons: {str(e)}")
+
+    def save_content(self, content: Dict) -> Optional[str]:
+        try:
+            # Écriture immédiate de la page dans le corpus
+            page_id = self.store.put(content)
+            self.logger.info(f"Contenu sauvegardé dans {self.store.path} (page {page_id})")
+            return self.store.path
         except Exception as e:
             self.logger.error(f"Erreur lors de la sauvegarde du contenu: {str(e)}")
+            return None
 
     def should_scrape_url(self, url: str) -> bool:
         # Vérifie si l'URL doit être scrapée
@@ -167,36 +221,55 @@ class ITWorkScraper:
             not any(ext in url for ext in ['.pdf', '.jpg', '.png', '.gif'])
         )
 
-    def scrape_url(self, url: str, depth: int = 0, max_depth: int = 3):
-        if not self.should_scrape_url(url) or depth > max_depth:
-            return
-
+    def scrape_url(self, url: str, depth: int = 0):
         self.logger.info(f"Scraping de {url}")
         self.visited_urls.add(url)
+        try:
+            response = self.get_page_response(url)
+            if response is None:
+                return
 
-        soup = self.get_page_content(url)
-        if not soup:
-            return
-
-        # Extraction et sauvegarde du contenu
-        content = self.extract_page_content(url, soup)
-        self.save_content(content)
+            # Extraction et sauvegarde du contenu (pages modifiées uniquement)
+            content = self.process_response(url, response.status_code, response.text, response.headers)
+            if content is None:
+                return
 
-        # Pause pour éviter de surcharger le serveur
-        time.sleep(2)
+            # Pause pour éviter de surcharger le serveur
+            time.sleep(self.delay)
 
-        # Scraping récursif des liens
-        for link_info in content['links']:
-            next_url = link_info['url']
-            if self.should_scrape_url(next_url):
-                self.scrape_url(next_url, depth + 1, max_depth)
+            # Liens ajoutés à la file persistée
+            for link_info in content['links']:
+                self.enqueue(link_info['url'], depth + 1)
+        finally:
+            self.complete_url(url)
 
-    def run(self):
+    def run(self, resume: bool = False):
         self.logger.info("Démarrage du scraping")
-        for base_url in self.base_urls:
-            self.scrape_url(base_url)
+        self.start_frontier(resume)
+        while True:
+            item = self.frontier.pop()
+            if item is None:
+                break
+            self.scrape_url(*item)
+        self.finish_crawl()
         self.logger.info("Scraping terminé")
 
 if __name__ == "__main__":
-    scraper = ITWorkScraper()
-    scraper.run()
+    parser = argparse.ArgumentParser(description="Scraping des sites IT-Work")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Crawl asynchrone concurrent (file de travail, débit limité par hôte)")
+    parser.add_argument('--workers', type=int, default=8, help="Nombre de workers en mode asynchrone")
+    parser.add_argument('--rate', type=float, default=2.0, help="Requêtes par seconde et par hôte en mode asynchrone")
+    parser.add_argument('--max-depth', type=int, default=3, help="Profondeur maximale du crawl")
+    parser.add_argument('--full', action='store_true',
+                        help="Recrawl complet sans requêtes conditionnelles")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reprend le crawl interrompu là où il s'est arrêté")
+    args = parser.parse_args()
+
+    scraper = ITWorkScraper(max_depth=args.max_depth, incremental=not args.full)
+    if args.use_async:
+        from async_scraper import AsyncCrawler
+        AsyncCrawler(scraper, workers=args.workers, rate_per_host=args.rate, max_depth=args.max_depth).run(args.resume)
+    else:
+        scraper.run(args.resume)
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+class SessionStore(ABC):
+    """
+    Stockage de l'historique des conversations par session.
+
+    Les implémentations gèrent la persistance et l'éviction des sessions ;
+    les verrous par session restent locaux au processus. Les accès sont
+    asynchrones pour ne jamais bloquer la boucle d'événements.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: int = 3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._locks = weakref.WeakValueDictionary()
+        self.setup_logging()
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('SessionStore')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """Retourne le verrou de la session (libéré automatiquement quand il n'est plus utilisé)"""
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[session_id] = lock
+        return lock
+
+    @abstractmethod
+    async def get(self, session_id: str) -> List[Dict]:
+        """Retourne l'historique de la session (liste vide si inconnue ou expirée)"""
+
+    @abstractmethod
+    async def save(self, session_id: str, history: List[Dict]):
+        """Enregistre l'historique de la session"""
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        """Supprime la session"""
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Nombre de sessions actives"""
+
+    async def aclose(self):
+        """Ferme la connexion au stockage"""
+
+class InMemorySessionStore(SessionStore):
+    """Sessions en mémoire du processus avec éviction LRU et expiration après inactivité"""
+
+    def __init__(self, max_sessions: int = 1000, ttl: int = 3600):
+        super().__init__(max_sessions, ttl)
+        self._sessions: "OrderedDict[str, Tuple[float, List[Dict]]]" = OrderedDict()
+        self.evictions = 0
+
+    def _purge_expired(self):
+        # Les sessions les moins récemment utilisées sont en tête
+        now = time.monotonic()
+        while self._sessions:
+            session_id, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access < self.ttl:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    async def get(self, session_id: str) -> List[Dict]:
+        self._purge_expired()
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return []
+        self._sessions[session_id] = (time.monotonic(), entry[1])
+        self._sessions.move_to_end(session_id)
+        return list(entry[1])
+
+    async def save(self, session_id: str, history: List[Dict]):
+        self._purge_expired()
+        self._sessions[session_id] = (time.monotonic(), list(history))
+        self._sessions.move_to_end(session_id)
+
+        # Éviction LRU au-delà du nombre maximum de sessions
+        while len(self._sessions) > self.max_sessions:
+            evicted, _ = self._sessions.popitem(last=False)
+            self.evictions += 1
+            self.logger.info(f"Session {evicted} évincée (limite de {self.max_sessions} sessions)")
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def count(self) -> int:
+        self._purge_expired()
+        return len(self._sessions)
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions stockées dans un serveur compatible Redis (Redis, Valkey, KeyDB...).
+
+    Le client doit exposer l'API asynchrone de redis-py (`redis.asyncio`) ;
+    un substitut local comme `fakeredis.FakeAsyncRedis` convient pour le
+    développement.
+    """
+
+    def __init__(self, client, max_sessions: int = 1000, ttl: int = 3600,
+                 prefix: str = 'itbot:session:'):
+        super().__init__(max_sessions, ttl)
+        self.client = client
+        self.prefix = prefix
+        self.index_key = f"{prefix}index"  # Sorted set : session -> dernier accès
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    async def get(self, session_id: str) -> List[Dict]:
+        data = await self.client.get(self._key(session_id))
+        if data is None:
+            await self.client.zrem(self.index_key, session_id)
+            return []
+        # Rafraîchissement de l'expiration et de l'ordre LRU
+        pipe = self.client.pipeline()
+        pipe.expire(self._key(session_id), self.ttl)
+        pipe.zadd(self.index_key, {session_id: time.time()})
+        await pipe.execute()
+        return json.loads(data)
+
+    async def save(self, session_id: str, history: List[Dict]):
+        pipe = self.client.pipeline()
+        pipe.setex(self._key(session_id), self.ttl, json.dumps(history, ensure_ascii=False))
+        pipe.zadd(self.index_key, {session_id: time.time()})
+        # Nettoyage des sessions expirées
+        pipe.zremrangebyscore(self.index_key, '-inf', time.time() - self.ttl)
+        pipe.zcard(self.index_key)
+        size = (await pipe.execute())[-1]
+
+        # Éviction LRU
+        overflow = size - self.max_sessions
+        if overflow > 0:
+            evicted = await self.client.zrange(self.index_key, 0, overflow - 1)
+            if evicted:
+                pipe = self.client.pipeline()
+                for member in evicted:
+                    member = member.decode() if isinstance(member, bytes) else member
+                    pipe.delete(self._key(member))
+                    pipe.zrem(self.index_key, member)
+                await pipe.execute()
+
+    async def delete(self, session_id: str):
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(session_id))
+        pipe.zrem(self.index_key, session_id)
+        await pipe.execute()
+
+    async def count(self) -> int:
+        await self.client.zremrangebyscore(self.index_key, '-inf', time.time() - self.ttl)
+        return await self.client.zcard(self.index_key)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+def create_session_store() -> SessionStore:
+    """Crée le stockage de sessions selon la configuration (variables d'environnement)"""
+    backend = os.getenv('SESSION_BACKEND', 'memory').lower()
+    max_sessions = int(os.getenv('SESSION_MAX', '1000'))
+    ttl = int(os.getenv('SESSION_TTL', '3600'))
+
+    if backend == 'redis':
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise ImportError("SESSION_BACKEND=redis nécessite le paquet redis >= 4.2 (pip install 'redis>=4.2')") from e
+        client = aioredis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+        return RedisSessionStore(client, max_sessions=max_sessions, ttl=ttl)
+
+    return InMemorySessionStore(max_sessions=max_sessions, ttl=ttl)
@@ -86,6 +86,57 @@ document.addEventListener('DOMContentLoaded', function() {
         chatMessages.scrollTop = chatMessages.scrollHeight;
     }
 
+    // Fonction pour afficher la réponse du chatbot au fur et à mesure (Server-Sent Events)
+    async function renderStream(response) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let content = '';
+        let bubble = null;
+
+        function render(text) {
+            if (!bubble) {
+                // Remplacer l'animation de chargement par la bulle de réponse
+                const loadingMessage = document.querySelector('.loading-message');
+                if (loadingMessage) loadingMessage.remove();
+                chatMessages.insertAdjacentHTML('beforeend', createBotMessage(''));
+                const bubbles = chatMessages.querySelectorAll('.bot-bubble');
+                bubble = bubbles[bubbles.length - 1];
+            }
+            bubble.innerHTML = convertUrlsToLinks(text);
+            scrollToBottom();
+        }
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Les événements SSE sont séparés par une ligne vide
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const event of events) {
+                const lines = event.split('\n');
+                const isDone = lines.some(line => line === 'event: done');
+                const dataLine = lines.find(line => line.startsWith('data: '));
+                if (!dataLine) continue;
+                const data = JSON.parse(dataLine.slice(6));
+
+                if (isDone) {
+                    // Réponse vide : signalée comme une erreur après la boucle
+                    if (!data.content && !bubble) continue;
+                    content = data.content;
+                } else {
+                    content += data.delta;
+                }
+                render(content);
+            }
+        }
+
+        if (!bubble) throw new Error('Réponse vide');
+    }
+
     // Gestionnaire de soumission du formulaire
     messageForm.addEventListener('submit', async function(e) {
         e.preventDefault();
@@ -102,11 +153,8 @@ document.addEventListener('DOMContentLoaded', function() {
         scrollToBottom();
 
         try {
-            // Attendre 1.5 secondes avant d'envoyer la requête
-            await new Promise(resolve => setTimeout(resolve, 1500));
-
-            // Envoyer la requête au serveur
-            const response = await fetch('/chat', {
+            // Envoyer la requête au serveur en mode streaming
+            const response = await fetch('/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/x-www-form-urlencoded',
@@ -114,17 +162,21 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: `message=${encodeURIComponent(message)}`
             });
 
-            if (!response.ok) throw new Error('Erreur réseau');
-            
-            const data = await response.json();
+            // Service saturé : la question peut être reposée après Retry-After
+            if (response.status === 503) {
+                const retryAfter = response.headers.get('Retry-After') || '5';
+                const loadingMessage = document.querySelector('.loading-message');
+                if (loadingMessage) loadingMessage.remove();
+                chatMessages.insertAdjacentHTML('beforeend', createBotMessage(
+                    `Je suis très sollicité en ce moment, pouvez-vous réessayer dans ${retryAfter} secondes ?`
+                ));
+                scrollToBottom();
+                return;
+            }
 
-            // Supprimer l'animation de chargement
-            const loadingMessage = document.querySelector('.loading-message');
-            if (loadingMessage) loadingMessage.remove();
+            if (!response.ok || !response.body) throw new Error('Erreur réseau');
 
-            // Afficher la réponse du chatbot
-            chatMessages.insertAdjacentHTML('beforeend', createBotMessage(data.botResponse.content));
-            scrollToBottom();
+            await renderStream(response);
         } catch (error) {
             console.error('Erreur:', error);
             const loadingMessage = document.querySelector('.loading-message');
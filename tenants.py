@@ -0,0 +1,261 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional
+from knowledge_base_manager import KnowledgeBaseManager
+from intent_router import CONTACT_KEYWORDS, IntentRouter
+from response_cache import SemanticResponseCache
+from metrics import span
+# Import différé : faiss et le backend d'embedding ne sont chargés qu'à la construction de la base
+if TYPE_CHECKING:
+    from knowledge_base import KnowledgeBase
+
+DEFAULT_TENANT = 'default'
+TENANT_NAME_PATTERN = re.compile(r"^[a-z0-9_-]{1,64}$")
+
+class UnknownTenant(Exception):
+    """Aucun site client de ce nom n'est configuré"""
+
+class TenantConfig:
+    """Site client : corpus scrapé, pages proposées par besoin, nom de l'entreprise et prompt système"""
+
+    def __init__(self, name: str, data_dir: str, urls_map: Optional[Dict[str, str]] = None,
+                 needs_keywords: Optional[Dict[str, List[str]]] = None,
+                 cache_dir: Optional[str] = None, system_prompt: Optional[str] = None,
+                 company_name: str = 'IT-Work'):
+        self.name = name
+        self.company_name = company_name
+        self.data_dir = data_dir
+        self.urls_map = urls_map
+        self.needs_keywords = needs_keywords
+        # Cache des embeddings et des index propre au site
+        self.cache_dir = cache_dir or os.path.join('index_cache', 'tenants', name)
+        self.system_prompt = system_prompt
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict) -> "TenantConfig":
+        if not TENANT_NAME_PATTERN.match(name):
+            raise ValueError(f"Nom de site client invalide : {name!r}")
+        if 'data_dir' not in data:
+            raise ValueError(f"Site client {name} : data_dir manquant")
+        return cls(
+            name,
+            data_dir=data['data_dir'],
+            urls_map=data.get('urls_map'),
+            needs_keywords=data.get('needs_keywords'),
+            cache_dir=data.get('cache_dir'),
+            system_prompt=data.get('system_prompt'),
+            company_name=data.get('company_name', name.capitalize())
+        )
+
+    def create_knowledge_base(self, embedder) -> "KnowledgeBase":
+        from knowledge_base import KnowledgeBase
+        return KnowledgeBase(embedder=embedder, data_dir=self.data_dir, urls_map=self.urls_map,
+                             needs_keywords=self.needs_keywords, cache_dir=self.cache_dir)
+
+class Tenant:
+    """Composants propres à un site client : base de connaissances rechargeable, routeur et cache de réponses"""
+
+    def __init__(self, config: TenantConfig, knowledge_base: "KnowledgeBase", watch_interval: float = 0.0,
+                 load_time: float = 0.0):
+        self.config = config
+        self.name = config.name
+        self.knowledge_base_manager = KnowledgeBaseManager(
+            knowledge_base, watch_interval=watch_interval, on_swap=self.on_knowledge_base_swap
+        )
+        self.intent_router = IntentRouter(knowledge_base, CONTACT_KEYWORDS, company_name=config.company_name)
+        self.response_cache = SemanticResponseCache.from_env()
+
+        self.memory_bytes = knowledge_base.memory_bytes()
+        self.load_time = load_time
+        self.loaded_at = datetime.now().isoformat()
+        self.last_used = time.time()
+        self.requests = 0
+
+    @property
+    def knowledge_base(self) -> "KnowledgeBase":
+        """Instantané actif de la base de connaissances du site"""
+        return self.knowledge_base_manager.current
+
+    def on_knowledge_base_swap(self, knowledge_base: "KnowledgeBase"):
+        """Le routeur et l'estimation mémoire suivent le nouvel instantané"""
+        self.intent_router.load(knowledge_base)
+        self.memory_bytes = knowledge_base.memory_bytes()
+
+    def touch(self):
+        self.requests += 1
+        self.last_used = time.time()
+
+    def get_stats(self) -> Dict:
+        return {
+            'documents': len(self.knowledge_base.documents),
+            'data_dir': self.config.data_dir,
+            'memory_mb': round(self.memory_bytes / 2**20, 2),
+            'load_time_s': round(self.load_time, 3),
+            'loaded_at': self.loaded_at,
+            'last_used': datetime.fromtimestamp(self.last_used).isoformat(),
+            'requests': self.requests
+        }
+
+class TenantRegistry:
+    """
+    Bases de connaissances des sites clients.
+
+    Le site par défaut (it-work.fr, `scraped_data`) est chargé au démarrage
+    et reste en mémoire. Les autres, décrits dans TENANTS_FILE, sont chargés
+    à la première requête avec le modèle d'embedding déjà chargé, puis
+    évincés du moins récemment utilisé au plus récent quand leur mémoire
+    estimée dépasse `memory_budget_mb`.
+    """
+
+    def __init__(self, default: Tenant, configs: Optional[Dict[str, TenantConfig]] = None,
+                 memory_budget_mb: float = 1024, watch_interval: float = 0.0):
+        self.setup_logging()
+        self.default = default
+        self.configs = dict(configs or {})
+        self.memory_budget = memory_budget_mb * 2**20
+        self.watch_interval = watch_interval
+        self.embedder = default.knowledge_base.embedder
+
+        # Sites chargés, du moins récemment utilisé au plus récent
+        self.loaded: "OrderedDict[str, Tenant]" = OrderedDict()
+        self.loading: Dict[str, asyncio.Task] = {}
+
+        self.loads = 0
+        self.failed_loads = 0
+        self.evictions = 0
+
+        if self.configs and self.embedder.remote:
+            # L'instantané du service d'embedding ne couvre que le site par défaut
+            self.logger.warning(f"SHARED_INDEX actif : {len(self.configs)} site(s) client ignoré(s)")
+            self.configs = {}
+
+    @classmethod
+    def from_env(cls, default: Tenant) -> "TenantRegistry":
+        """Crée le registre à partir des variables d'environnement (TENANTS_FILE)"""
+        configs = {}
+        tenants_file = os.getenv('TENANTS_FILE')
+        if tenants_file:
+            with open(tenants_file, 'r', encoding='utf-8') as f:
+                for name, data in json.load(f).items():
+                    if name == DEFAULT_TENANT:
+                        raise ValueError(f"Le nom {DEFAULT_TENANT} est réservé au site par défaut")
+                    configs[name] = TenantConfig.from_dict(name, data)
+        return cls(
+            default,
+            configs,
+            memory_budget_mb=float(os.getenv('TENANT_MEMORY_BUDGET_MB', '1024')),
+            watch_interval=float(os.getenv('KB_WATCH_INTERVAL', '0'))
+        )
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('TenantRegistry')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @staticmethod
+    def session_key(tenant_name: str, session_id: str) -> str:
+        """Identifiant de session propre au site (inchangé pour le site par défaut)"""
+        return session_id if tenant_name == DEFAULT_TENANT else f"{tenant_name}:{session_id}"
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.default.memory_bytes + sum(tenant.memory_bytes for tenant in self.loaded.values())
+
+    def build(self, config: TenantConfig) -> Tenant:
+        """Charge la base de connaissances d'un site (exécuté hors de la boucle d'événements)"""
+        start_time = time.perf_counter()
+        with span('load_tenant'):
+            knowledge_base = config.create_knowledge_base(self.embedder)
+        if not knowledge_base.documents:
+            raise ValueError(f"aucun document chargé depuis {config.data_dir}")
+        return Tenant(config, knowledge_base, self.watch_interval, time.perf_counter() - start_time)
+
+    async def get(self, name: str = DEFAULT_TENANT) -> Tenant:
+        """Site client demandé, chargé à la première requête (un seul chargement à la fois par site)"""
+        if name == DEFAULT_TENANT:
+            tenant = self.default
+        elif name in self.loaded:
+            tenant = self.loaded[name]
+            self.loaded.move_to_end(name)
+        elif name in self.configs:
+            tenant = await self.load(name)
+        else:
+            raise UnknownTenant(f"Site client inconnu : {name}")
+        tenant.touch()
+        return tenant
+
+    async def load(self, name: str) -> Tenant:
+        # Le chargement tourne dans sa propre tâche : une requête annulée (client
+        # déconnecté) ne l'interrompt pas et les autres requêtes reçoivent le site
+        task = self.loading.get(name)
+        if task is None:
+            task = self.loading[name] = asyncio.ensure_future(self._load(name))
+            # Marquée comme lue : aucune autre requête n'attend forcément ce chargement
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return await asyncio.shield(task)
+
+    async def _load(self, name: str) -> Tenant:
+        try:
+            self.logger.info(f"Chargement du site client {name}")
+            tenant = await asyncio.get_event_loop().run_in_executor(None, self.build, self.configs[name])
+        except Exception as e:
+            self.failed_loads += 1
+            self.logger.error(f"Erreur lors du chargement du site client {name} : {str(e)}")
+            raise
+        finally:
+            del self.loading[name]
+
+        self.loaded[name] = tenant
+        self.loads += 1
+        tenant.knowledge_base_manager.start_watching()
+        self.logger.info(
+            f"Site client {name} chargé en {tenant.load_time:.2f}s "
+            f"({len(tenant.knowledge_base.documents)} passages, {tenant.memory_bytes / 2**20:.1f} Mo estimés)"
+        )
+        await self.evict(keep=name)
+        return tenant
+
+    async def evict(self, keep: str):
+        """Évince les sites les moins récemment utilisés tant que le budget mémoire est dépassé"""
+        while self.memory_bytes > self.memory_budget:
+            name = next((name for name in self.loaded if name != keep), None)
+            if name is None:
+                break
+            tenant = self.loaded.pop(name)
+            await tenant.knowledge_base_manager.aclose()
+            self.evictions += 1
+            # Les requêtes en cours gardent leur référence et se terminent normalement
+            self.logger.info(
+                f"Site client {name} évincé ({tenant.memory_bytes / 2**20:.1f} Mo, "
+                f"inutilisé depuis {time.time() - tenant.last_used:.0f}s)"
+            )
+
+    def tenants(self) -> List[Tenant]:
+        return [self.default, *self.loaded.values()]
+
+    def get_stats(self) -> Dict:
+        return {
+            'configured': len(self.configs) + 1,
+            'loaded': len(self.loaded) + 1,
+            'memory_mb': round(self.memory_bytes / 2**20, 2),
+            'memory_budget_mb': round(self.memory_budget / 2**20, 2),
+            'loads': self.loads,
+            'failed_loads': self.failed_loads,
+            'evictions': self.evictions,
+            'tenants': {tenant.name: tenant.get_stats() for tenant in self.tenants()}
+        }
+
+    async def aclose(self):
+        """Arrête la surveillance des corpus"""
+        for tenant in self.tenants():
+            await tenant.knowledge_base_manager.aclose()
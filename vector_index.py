@@ -0,0 +1,153 @@
+import os
+import logging
+from typing import Dict
+import faiss
+import numpy as np
+
+INDEX_TYPES = ('flat', 'ivf', 'hnsw', 'pq')
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normalise les vecteurs (norme L2 = 1) : le produit scalaire devient le cosinus"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+def read_index_mapped(path: str) -> faiss.Index:
+    """
+    Lit un index FAISS en laissant ses vecteurs dans le fichier mappé en mémoire
+    (IO_FLAG_MMAP_IFC, faiss >= 1.11) : les pages sont partagées entre processus
+    au lieu d'être copiées dans le tas de chaque worker. IO_FLAG_MMAP seul ne
+    mappe que les listes inversées des index IVF. L'index lu est en lecture seule.
+    """
+    flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', None)
+    if flag is not None:
+        try:
+            return faiss.read_index(path, flag)
+        except RuntimeError as e:
+            logging.getLogger('VectorIndexSpec').warning(f"Index {path} non mappable, chargé en mémoire : {str(e)}")
+    else:
+        logging.getLogger('VectorIndexSpec').warning(
+            f"faiss {faiss.__version__} ne mappe pas les vecteurs (IO_FLAG_MMAP_IFC), index {path} chargé en mémoire"
+        )
+    return faiss.read_index(path)
+
+class VectorIndexSpec:
+    """
+    Type et paramètres de l'index vectoriel FAISS.
+
+    Tous les index comparent des vecteurs normalisés par produit scalaire
+    (similarité cosinus) :
+    - `flat` : recherche exhaustive, exacte ;
+    - `ivf` : partitionnement en `nlist` cellules, `nprobe` visitées par requête ;
+    - `hnsw` : graphe de voisinage (M liens par nœud), sans entraînement ;
+    - `pq` : IVF avec vecteurs compressés par quantification produit
+      (`pq_m` octets par vecteur).
+    Les index à entraîner retombent sur `flat` quand le corpus est trop petit.
+    """
+
+    def __init__(self, kind: str = 'flat', nlist: int = 256, nprobe: int = 16,
+                 hnsw_m: int = 32, ef_construction: int = 80, ef_search: int = 64,
+                 pq_m: int = 48, pq_bits: int = 8):
+        self.setup_logging()
+        kind = kind.lower()
+        if kind not in INDEX_TYPES:
+            raise ValueError(f"Type d'index vectoriel inconnu : {kind} (attendu : {', '.join(INDEX_TYPES)})")
+        self.kind = kind
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_bits = pq_bits
+
+    @classmethod
+    def from_env(cls) -> "VectorIndexSpec":
+        """Crée la configuration à partir des variables d'environnement"""
+        return cls(
+            kind=os.getenv('VECTOR_INDEX', 'flat'),
+            nlist=int(os.getenv('VECTOR_INDEX_NLIST', '256')),
+            nprobe=int(os.getenv('VECTOR_INDEX_NPROBE', '16')),
+            hnsw_m=int(os.getenv('VECTOR_INDEX_HNSW_M', '32')),
+            ef_search=int(os.getenv('VECTOR_INDEX_EF_SEARCH', '64')),
+            pq_m=int(os.getenv('VECTOR_INDEX_PQ_M', '48'))
+        )
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('VectorIndexSpec')
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    @property
+    def key(self) -> str:
+        """Identifiant des paramètres de construction, utilisé dans le nom du cache"""
+        if self.kind == 'ivf':
+            return f"ivf{self.nlist}-ip"
+        if self.kind == 'hnsw':
+            return f"hnsw{self.hnsw_m}-ef{self.ef_construction}-ip"
+        if self.kind == 'pq':
+            return f"ivf{self.nlist}-pq{self.pq_m}x{self.pq_bits}-ip"
+        return 'flat-ip'
+
+    def nlist_for(self, count: int) -> int:
+        # FAISS recommande au moins 39 vecteurs d'entraînement par cellule
+        return max(1, min(self.nlist, count // 39))
+
+    def min_training_size(self) -> int:
+        if self.kind == 'pq':
+            # 2^pq_bits centroïdes par sous-quantificateur
+            return 39 * 2 ** self.pq_bits
+        if self.kind == 'ivf':
+            return 39
+        return 0
+
+    def build(self, embeddings: np.ndarray) -> faiss.Index:
+        """Construit (et entraîne si nécessaire) l'index sur des vecteurs normalisés"""
+        vectors = normalize(embeddings)
+        count, dimension = vectors.shape
+        kind = self.kind
+        if count < self.min_training_size():
+            self.logger.info(f"Corpus trop petit pour un index {kind} ({count} vecteurs), index exact utilisé")
+            kind = 'flat'
+
+        metric = faiss.METRIC_INNER_PRODUCT
+        if kind == 'ivf':
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFFlat(quantizer, dimension, self.nlist_for(count), metric)
+        elif kind == 'pq':
+            if dimension % self.pq_m:
+                raise ValueError(f"VECTOR_INDEX_PQ_M ({self.pq_m}) doit diviser la dimension ({dimension})")
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, self.nlist_for(count), self.pq_m, self.pq_bits, metric)
+        elif kind == 'hnsw':
+            index = faiss.IndexHNSWFlat(dimension, self.hnsw_m, metric)
+            index.hnsw.efConstruction = self.ef_construction
+        else:
+            index = faiss.IndexFlatIP(dimension)
+
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        return self.configure(index)
+
+    def configure(self, index: faiss.Index) -> faiss.Index:
+        """Applique les paramètres de recherche (non persistés) à un index chargé"""
+        if hasattr(index, 'nprobe'):
+            index.nprobe = min(self.nprobe, index.nlist)
+        if hasattr(index, 'hnsw'):
+            index.hnsw.efSearch = self.ef_search
+        return index
+
+    def describe(self, index: faiss.Index) -> Dict:
+        """Type réel et paramètres de l'index, pour les statistiques"""
+        stats = {'type': self.kind, 'key': self.key, 'class': type(index).__name__, 'vectors': index.ntotal}
+        if hasattr(index, 'nlist'):
+            stats['nlist'] = index.nlist
+            stats['nprobe'] = index.nprobe
+        if hasattr(index, 'hnsw'):
+            stats['ef_search'] = index.hnsw.efSearch
+        return stats